@@ -0,0 +1,209 @@
+"""
+Module-to-Core Alignment Table for MPP RAG System
+Offline job: scores every module chunk against every core chunk and keeps the top-k core passages,
+so /cross_reference can look up authoritative passages instead of running a second live retrieval
+"""
+
+import os
+import json
+import pickle
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_TABLE_PATH = "./alignment_table.pkl"
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_similarities(queries: np.ndarray, corpus: np.ndarray, top_k: int = 5,
+                       tile_size: int = 1024) -> tuple:
+    """
+    Cosine top-k of every query row against every corpus row
+
+    Both axes are tiled so peak memory is tile_size x tile_size scores, regardless of
+    corpus size. Returns (indices, scores), each shaped (len(queries), top_k), best first.
+    """
+    queries = _normalize_rows(queries.astype(np.float32))
+    corpus = _normalize_rows(corpus.astype(np.float32))
+    top_k = min(top_k, len(corpus))
+
+    all_idx = np.empty((len(queries), top_k), dtype=np.int32)
+    all_scores = np.empty((len(queries), top_k), dtype=np.float32)
+
+    for q_start in range(0, len(queries), tile_size):
+        q_tile = queries[q_start:q_start + tile_size]
+        best_scores = np.full((len(q_tile), 0), -np.inf, dtype=np.float32)
+        best_idx = np.empty((len(q_tile), 0), dtype=np.int32)
+
+        for c_start in range(0, len(corpus), tile_size):
+            scores = q_tile @ corpus[c_start:c_start + tile_size].T
+            idx = np.broadcast_to(
+                np.arange(c_start, c_start + scores.shape[1], dtype=np.int32), scores.shape
+            )
+
+            # Merge this tile's scores into the running top-k
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_idx = np.concatenate([best_idx, idx], axis=1)
+            keep = min(top_k, merged_scores.shape[1])
+            part = np.argpartition(-merged_scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(merged_scores, part, axis=1)
+            best_idx = np.take_along_axis(merged_idx, part, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        all_scores[q_start:q_start + len(q_tile)] = np.take_along_axis(best_scores, order, axis=1)
+        all_idx[q_start:q_start + len(q_tile)] = np.take_along_axis(best_idx, order, axis=1)
+
+    return all_idx, all_scores
+
+class AlignmentTable:
+    """Top-k core passages per module chunk id, held in memory for O(1) lookups"""
+
+    def __init__(self, module_chunks: Dict[str, Dict], core_chunks: List[Dict],
+                 neighbors: Dict[str, List[tuple]], top_k: int):
+        self.module_chunks = module_chunks  # module id -> {"document", "page"}
+        self.core_chunks = core_chunks      # [{"id", "text", "metadata"}]
+        self.neighbors = neighbors          # module id -> [(core row, similarity), ...]
+        self.top_k = top_k
+
+    @classmethod
+    def build(cls, collection, top_k: int = 10, tile_size: int = 1024) -> "AlignmentTable":
+        """Build from the embeddings already stored in ChromaDB at ingest"""
+        include = ["embeddings", "documents", "metadatas"]
+        modules = collection.get(where={"doc_type": "module"}, include=include)
+        core = collection.get(where={"doc_type": "core"}, include=include)
+
+        if not len(modules['ids']) or not len(core['ids']):
+            raise ValueError("Need both module and core chunks in the collection")
+
+        idx, scores = top_k_similarities(
+            np.asarray(modules['embeddings']), np.asarray(core['embeddings']),
+            top_k=top_k, tile_size=tile_size
+        )
+
+        return cls(
+            module_chunks={
+                doc_id: {"document": meta['document'], "page": meta['page']}
+                for doc_id, meta in zip(modules['ids'], modules['metadatas'])
+            },
+            core_chunks=[
+                {"id": doc_id, "text": text, "metadata": meta}
+                for doc_id, text, meta in zip(core['ids'], core['documents'], core['metadatas'])
+            ],
+            neighbors={
+                doc_id: [(int(i), float(s)) for i, s in zip(idx[row], scores[row])]
+                for row, doc_id in enumerate(modules['ids'])
+            },
+            top_k=top_k
+        )
+
+    def save(self, path: str = DEFAULT_TABLE_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> "AlignmentTable":
+        with open(path, "rb") as f:
+            return cls(**pickle.load(f))
+
+    def core_passages_for(self, module_ids: List[str], top_k: int = 5) -> List[Dict]:
+        """
+        Core passages best aligned with the given module chunks, in the shape
+        hybrid_search returns. A core passage matched by several module chunks keeps
+        its best similarity. Returns [] if none of the ids are in the table.
+        """
+        best: Dict[int, float] = {}
+        for module_id in module_ids:
+            for core_row, similarity in self.neighbors.get(module_id, []):
+                best[core_row] = max(similarity, best.get(core_row, -1.0))
+
+        ranked = sorted(best, key=best.get, reverse=True)[:top_k]
+        return [
+            {
+                **self.core_chunks[row],
+                'distance': 2.0 - 2.0 * best[row],  # Squared L2 of unit vectors, as Chroma reports
+                'similarity': best[row]
+            }
+            for row in ranked
+        ]
+
+    def report(self, weak_threshold: float = 0.5) -> Dict:
+        """Bulk "all modules vs core" report: per module, how well its chunks are backed by core docs"""
+        per_module: Dict[str, Dict] = {}
+        for module_id, info in self.module_chunks.items():
+            matches = self.neighbors.get(module_id, [])
+            if not matches:
+                continue
+            core_row, similarity = matches[0]
+            core_meta = self.core_chunks[core_row]['metadata']
+
+            entry = per_module.setdefault(info['document'], {
+                "chunks": 0, "similarities": [], "weak_chunks": [], "core_pages": {}
+            })
+            entry["chunks"] += 1
+            entry["similarities"].append(similarity)
+            cited = f"{core_meta['document']} p.{core_meta['page']}"
+            entry["core_pages"][cited] = entry["core_pages"].get(cited, 0) + 1
+            if similarity < weak_threshold:
+                entry["weak_chunks"].append({
+                    "page": info['page'],
+                    "best_core_match": cited,
+                    "similarity": round(similarity, 4)
+                })
+
+        modules = {}
+        for document, entry in sorted(per_module.items()):
+            sims = np.array(entry["similarities"])
+            modules[document] = {
+                "chunks": entry["chunks"],
+                "mean_best_similarity": round(float(sims.mean()), 4),
+                "min_best_similarity": round(float(sims.min()), 4),
+                "weak_chunks": sorted(entry["weak_chunks"], key=lambda x: x["page"]),
+                "top_core_pages": [
+                    {"source": source, "module_chunks": count}
+                    for source, count in sorted(entry["core_pages"].items(), key=lambda x: -x[1])[:10]
+                ]
+            }
+
+        return {
+            "weak_threshold": weak_threshold,
+            "module_chunks": len(self.module_chunks),
+            "core_chunks": len(self.core_chunks),
+            "modules": modules
+        }
+
+def load_table(path: Optional[str] = None) -> Optional[AlignmentTable]:
+    """Load the persisted table, or None if the offline job has not run yet"""
+    path = path or os.getenv("ALIGNMENT_TABLE_PATH", DEFAULT_TABLE_PATH)
+    if not Path(path).exists():
+        print(f"[WARN] Alignment table not found at {path} - /cross_reference will search core docs live")
+        return None
+    return AlignmentTable.load(path)
+
+if __name__ == "__main__":
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Build the module-to-core alignment table")
+    parser.add_argument("--top-k", type=int, default=10, help="Core passages kept per module chunk")
+    parser.add_argument("--tile-size", type=int, default=1024, help="Rows per similarity tile")
+    parser.add_argument("--report", metavar="PATH", help="Also write the all-modules report as JSON")
+    parser.add_argument("--weak-threshold", type=float, default=0.5,
+                        help="Best-match similarity below which a module chunk is flagged")
+    args = parser.parse_args()
+
+    chroma_client = chromadb.PersistentClient(path="./chroma_db")
+    collection = chroma_client.get_collection(name="mpp_documents")
+
+    table = AlignmentTable.build(collection, top_k=args.top_k, tile_size=args.tile_size)
+    table_path = os.getenv("ALIGNMENT_TABLE_PATH", DEFAULT_TABLE_PATH)
+    table.save(table_path)
+    print(f"[OK] Aligned {len(table.module_chunks)} module chunks against "
+          f"{len(table.core_chunks)} core chunks -> {table_path}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(table.report(args.weak_threshold), f, indent=2)
+        print(f"[OK] Report written to {args.report}")
@@ -0,0 +1,173 @@
+"""
+Semantic Answer Cache for MPP RAG System
+Reuses /query answers for repeated questions (and, when enabled, reworded ones matched
+by embedding similarity), invalidated when ingestion bumps the corpus version
+"""
+
+import os
+import json
+import time
+import uuid
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from embedding_cache import normalize_text
+
+DEFAULT_VERSION_PATH = "./corpus_version.json"
+
+def bump_corpus_version(path: str = DEFAULT_VERSION_PATH, **details) -> str:
+    """Called by ingestion: every cached answer built on the old corpus becomes stale"""
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": version, **details}, f, indent=2)
+    os.replace(tmp, path)
+    return version
+
+class CorpusVersion:
+    """Current corpus version, re-read only when the version file changes"""
+
+    def __init__(self, path: str = DEFAULT_VERSION_PATH):
+        self.path = Path(path)
+        self._mtime = None
+        self._version = "unversioned"
+
+    def current(self) -> str:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return self._version
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._version = json.load(f).get("version", "unversioned")
+            self._mtime = mtime
+        return self._version
+
+class SemanticAnswerCache:
+    """
+    Bounded cache of answers keyed by question text, or by question embedding
+
+    By default only the same question (whitespace aside) is a hit: questions a few words
+    apart ("252.232-7003" vs "252.232-7004", "must" vs "must not") embed above any
+    useful threshold. With semantic on, vectors live in one preallocated
+    (max_entries x dim) matrix, so a lookup is one matrix-vector product. Entries are
+    scoped (e.g. by doc_type and top_k), evicted least-recently-used when full, and
+    dropped when past their TTL or built on an older corpus version.
+    """
+
+    def __init__(self, max_entries: int = 2000, threshold: float = 0.92, ttl_seconds: float = 86400,
+                 semantic: bool = False):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+
+        self._vectors: Optional[np.ndarray] = None
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()  # slot -> entry, LRU order
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.stale = 0
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, slot: int):
+        del self._entries[slot]
+        self._occupied[slot] = False
+
+    def _candidates(self, question: str, embedding):
+        """(slot, similarity) pairs that may answer the question, best first"""
+        if not self.semantic:
+            text = normalize_text(question)
+            return [(slot, 1.0) for slot, entry in self._entries.items() if entry["text"] == text]
+
+        similarities = self._vectors @ self._unit(embedding)
+        similarities[~self._occupied] = -np.inf
+        candidates = []
+        for slot in np.argsort(-similarities):
+            if similarities[slot] < self.threshold:
+                break
+            candidates.append((int(slot), float(similarities[slot])))
+        return candidates
+
+    def lookup(self, question: str, embedding, scope: Tuple, corpus_version: str) -> Optional[Dict]:
+        """Cached entry for the question in the same scope, or None"""
+        if not self.max_entries or not self._entries:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        for slot, similarity in self._candidates(question, embedding):
+            entry = self._entries[slot]
+            if entry["scope"] != scope:
+                continue
+            if entry["corpus_version"] != corpus_version:
+                self._drop(slot)
+                self.stale += 1
+                continue
+            if now - entry["created_at"] > self.ttl_seconds:
+                self._drop(slot)
+                self.expired += 1
+                continue
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return {**entry, "similarity": similarity}
+
+        self.misses += 1
+        return None
+
+    def store(self, question: str, embedding, scope: Tuple, corpus_version: str, response: Dict):
+        if not self.max_entries:
+            return
+        vector = self._unit(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+        free = np.flatnonzero(~self._occupied)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = next(iter(self._entries))  # Least recently used
+            self._drop(slot)
+            self.evictions += 1
+
+        self._vectors[slot] = vector
+        self._occupied[slot] = True
+        self._entries[slot] = {
+            "question": question,
+            "text": normalize_text(question),
+            "scope": scope,
+            "corpus_version": corpus_version,
+            "created_at": time.time(),
+            "response": response
+        }
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def answer_cache_from_env() -> SemanticAnswerCache:
+    """Build from ANSWER_CACHE_* settings (ANSWER_CACHE_SIZE=0 disables the cache)"""
+    return SemanticAnswerCache(
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 2000)),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92)),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", 86400)),
+        semantic=os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true"
+    )
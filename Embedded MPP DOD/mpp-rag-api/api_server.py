@@ -3,17 +3,21 @@ FastAPI Server for MPP RAG System
 Provides endpoints for querying, extracting, and cross-referencing DoD MPP documentation
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
-import chromadb
-from openai import OpenAI
+from typing import List, Optional, Dict, AsyncIterator
 from dotenv import load_dotenv
 import os
-from rank_bm25 import BM25Okapi
-import numpy as np
+import asyncio
+import json
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from concurrency import BlockingExecutor, ConcurrencyLimiter, SingleFlight, SlotStreamingResponse, request_key
+from context_packing import pack_context
+from metrics import registry, time_stage, record_tokens, start_request_timings
+from query_log import recorder_from_env, start_entry, annotate
 
 # Explicitly load .env from current directory
 env_path = Path(__file__).parent / '.env'
@@ -25,10 +29,41 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize clients
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = chroma_client.get_collection(name="mpp_documents")
+# Clients and indexes are loaded by load_resources() in a startup hook, so the worker
+# answers /health at once; /ready reports when they are warm
+client = None
+collection = None
+bm25_index = None
+alignment_table = None
+page_store = None
+quote_index = None
+reranker = None
+embedding_cache = None
+answer_cache = None
+corpus_version = None
+
+# Vector backend: ChromaDB, or the exported memory-mapped matrix (python vector_index.py export),
+# optionally searched through its quantized compact copy first
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+EXPORT_PAGE_BATCH = int(os.getenv("EXPORT_PAGE_BATCH", 50))
+RRF_K = int(os.getenv("RRF_K", 60))
+# Fused candidates rescored by the second-stage reranker (python reranker.py init / train)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 10))
+startup = {"ready": False, "error": None, "seconds": None, "steps_ms": {}}
+_warm_up_task: Optional[asyncio.Task] = None
+
+# Blocking ChromaDB calls and CPU-bound ranking (BM25, rerank, context packing, citation
+# checks) run on a bounded pool; in-flight requests beyond the limit get 429
+chroma_executor = BlockingExecutor(max_workers=int(os.getenv("CHROMA_WORKERS", 8)))
+request_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", 64)),
+    queue_timeout=float(os.getenv("REQUEST_QUEUE_TIMEOUT", 5))
+)
+single_flight = SingleFlight()
+query_log = recorder_from_env()  # Opt-in: QUERY_LOG_PATH
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 256))
+BATCH_ANSWER_CONCURRENCY = int(os.getenv("BATCH_ANSWER_CONCURRENCY", 8))
 
 # Models
 class QueryRequest(BaseModel):
@@ -36,22 +71,42 @@ class QueryRequest(BaseModel):
     top_k: int = Field(5, description="Number of sources to retrieve")
     doc_type: Optional[str] = Field(None, description="Filter by 'core' or 'module'")
     include_context: bool = Field(True, description="Include full context in response")
+    include_timings: bool = Field(False, description="Add a per-stage timing breakdown (ms) to metadata")
+    bypass_cache: bool = Field(False, description="Skip the semantic answer cache and generate a fresh answer")
 
 class ExtractRequest(BaseModel):
     document: str = Field(..., description="Document name (e.g., 'MPP SOP.pdf')")
-    page: Optional[int] = Field(None, description="Specific page number")
+    page: Optional[int] = Field(None, description="Specific page number (first page of a range with page_end)")
+    page_end: Optional[int] = Field(None, description="Last page of a range, inclusive")
     search_term: Optional[str] = Field(None, description="Search for specific term")
 
 class CrossReferenceRequest(BaseModel):
     query: str = Field(..., description="What to cross-reference")
     module_name: Optional[str] = Field(None, description="Specific module to check")
 
+class CitationMatch(BaseModel):
+    quote: str  # As written in the answer
+    text: str  # Matching span of the source passage
+    start: int  # Character offsets of text in the source passage
+    end: int
+    score: float  # 1.0 = exact word sequence, lower = share of matching word trigrams
+    answer_start: int  # Character offsets of quote in the answer
+    answer_end: int
+
+class PageLocation(BaseModel):
+    document: str
+    page: int
+
 class Source(BaseModel):
     quote: str
     document: str
     page: int
     confidence: float
     doc_type: str
+    verified: Optional[bool] = None  # None = not quoted in the answer
+    matches: List[CitationMatch] = []
+    also_in: List[PageLocation] = []  # Near-duplicate copies of this passage, not indexed separately
+    merged_ids: List[str] = []  # Indexed chunks joined into this passage by context packing
 
 class QueryResponse(BaseModel):
     query: str
@@ -59,46 +114,277 @@ class QueryResponse(BaseModel):
     sources: List[Source]
     metadata: Dict
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE,
+                                 description="Questions to ask, answered in order")
+    top_k: int = Field(5, description="Number of sources to retrieve per question")
+    doc_type: Optional[str] = Field(None, description="Filter by 'core' or 'module'")
+
+class BatchQueryItem(BaseModel):
+    index: int
+    result: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]
+    metadata: Dict
+
+# Request metrics
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    if query_log is not None:
+        entry = start_entry()
+        entry["stage_ms"] = start_request_timings()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    # Label by route template, not raw path, to keep series bounded
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    registry.observe("rag_request_duration_seconds", elapsed, endpoint=endpoint)
+    registry.inc("rag_requests_total", endpoint=endpoint, status=str(response.status_code))
+
+    # Only endpoints that annotated a body are worth replaying (not /health, /metrics).
+    # For streaming endpoints duration_ms is the time until the stream starts.
+    if query_log is not None and "body" in entry:
+        entry.update(endpoint=endpoint, status=response.status_code, duration_ms=round(elapsed * 1000, 2))
+        query_log.write(entry)
+    return response
+
+# Startup
+@contextmanager
+def startup_step(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup["steps_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+
+def load_resources():
+    """Import heavy dependencies and open clients and indexes (runs once, off the event loop)"""
+    global client, collection, bm25_index, alignment_table, page_store, quote_index, reranker
+    global embedding_cache, answer_cache, corpus_version
+
+    with startup_step("openai"):
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    with startup_step("vector_store"):
+        if VECTOR_BACKEND in ("mmap", "quantized"):
+            from vector_index import MmapVectorIndex, QuantizedVectorIndex, DEFAULT_INDEX_DIR
+            index_dir = os.getenv("VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR)
+            if VECTOR_BACKEND == "mmap":
+                collection = MmapVectorIndex.load(index_dir)
+            else:
+                collection = QuantizedVectorIndex.load(
+                    index_dir,
+                    rescore_factor=int(os.getenv("VECTOR_RESCORE_FACTOR", 4))
+                )
+        else:
+            import chromadb
+            from partitions import partitioned_collection
+            chroma_client = chromadb.PersistentClient(path="./chroma_db")
+            # Filtered queries are routed to per-doc_type partitions when ingestion built them
+            collection = partitioned_collection(chroma_client, chroma_client.get_collection(name="mpp_documents"))
+
+    with startup_step("bm25_index"):
+        from bm25_index import load_index
+        bm25_index = load_index()
+
+    with startup_step("alignment_table"):
+        from alignment_table import load_table
+        alignment_table = load_table()
+
+    with startup_step("page_store"):
+        from page_store import load_page_store
+        page_store = load_page_store()
+
+    with startup_step("quote_index"):
+        from citations import load_quote_index
+        quote_index = load_quote_index()
+
+    with startup_step("reranker"):
+        from reranker import load_reranker
+        reranker = load_reranker()
+
+    with startup_step("caches"):
+        from embedding_cache import cache_from_env
+        from answer_cache import answer_cache_from_env, CorpusVersion, DEFAULT_VERSION_PATH
+        embedding_cache = cache_from_env()
+        answer_cache = answer_cache_from_env()
+        corpus_version = CorpusVersion(os.getenv("CORPUS_VERSION_PATH", DEFAULT_VERSION_PATH))
+
+async def warm_up():
+    """Run load_resources on a thread and log the time spent against the startup budget"""
+    start = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_resources)
+        startup["ready"] = True
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+    startup["seconds"] = round(time.perf_counter() - start, 3)
+
+    steps = ", ".join(f"{name} {ms:.0f}ms" for name, ms in startup["steps_ms"].items())
+    if startup["error"]:
+        print(f"[ERROR] Startup failed after {startup['seconds']}s: {startup['error']} ({steps})")
+    elif startup["seconds"] > STARTUP_BUDGET_SECONDS:
+        print(f"[WARN] Startup took {startup['seconds']}s, over the {STARTUP_BUDGET_SECONDS:g}s budget ({steps})")
+    else:
+        print(f"[OK] Startup took {startup['seconds']}s of the {STARTUP_BUDGET_SECONDS:g}s budget ({steps})")
+
+def start_warm_up() -> asyncio.Task:
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.create_task(warm_up())
+    return _warm_up_task
+
+@app.on_event("startup")
+async def begin_warm_up():
+    """Load in the background; the first requests wait for it instead of failing"""
+    start_warm_up()
+
+async def ensure_ready():
+    """Hold a request until warm-up finishes; 503 if startup failed"""
+    if not startup["ready"]:
+        await asyncio.shield(start_warm_up())
+    if not startup["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service not ready: {startup['error']}",
+            headers={"Retry-After": "5"}
+        )
+
 # Helper Functions
-def get_embedding(text: str) -> List[float]:
-    """Get embedding from OpenAI"""
-    response = client.embeddings.create(
-        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
-        input=text
-    )
-    return response.data[0].embedding
+async def limit_concurrency():
+    """Dependency holding an in-flight slot for the duration of a request"""
+    await ensure_ready()
+    async with request_limiter:
+        yield
 
-def hybrid_search(query: str, top_k: int = 10, doc_type: Optional[str] = None) -> List[Dict]:
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings for several texts, sending all cache misses in one OpenAI call"""
+    from embedding_cache import embedding_options
+
+    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
+
+    embeddings = [await chroma_executor.run(embedding_cache.get, model, text, dimensions) for text in texts]
+    misses = list(dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None))
+
+    if misses:
+        with time_stage("embedding"):
+            response = await client.embeddings.create(
+                model=model,
+                input=misses,
+                **embedding_options(dimensions)
+            )
+        record_tokens("embedding", getattr(response, "usage", None))
+        fetched = {text: item.embedding for text, item in zip(misses, response.data)}
+        for text, embedding in fetched.items():
+            await chroma_executor.run(embedding_cache.put, model, text, embedding, dimensions)
+        embeddings = [emb if emb is not None else fetched[text] for text, emb in zip(texts, embeddings)]
+
+    return embeddings
+
+async def get_embedding(text: str) -> List[float]:
+    """Get embedding from OpenAI, served from the query embedding cache when possible"""
+    return (await get_embeddings([text]))[0]
+
+async def hybrid_search(query: str, top_k: int = 10, doc_type: Optional[str] = None) -> List[Dict]:
     """Combine semantic and keyword search for better accuracy"""
+    return (await hybrid_search_many([query], top_k=top_k, doc_type=doc_type))[0]
+
+async def hybrid_search_many(queries: List[str], top_k: int = 10,
+                             doc_type: Optional[str] = None) -> List[List[Dict]]:
+    """Hybrid search for several queries with one embedding call and one ChromaDB multi-query"""
 
     # Semantic search with ChromaDB
-    query_embedding = get_embedding(query)
+    query_embeddings = await get_embeddings(queries)
 
     where_filter = {"doc_type": doc_type} if doc_type else None
+    # With a reranker, a larger fused pool goes to the second stage and top_k come back
+    pool = max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+
+    with time_stage("vector_query"):
+        results = await chroma_executor.run(
+            collection.query,
+            query_embeddings=query_embeddings,
+            n_results=max(top_k * 2, pool),  # Get more for reranking
+            where=where_filter
+        )
+
+    all_results = []
+    for q, query in enumerate(queries):
+        # Format results
+        semantic_results = []
+        for i in range(len(results['ids'][q])):
+            semantic_results.append({
+                'text': results['documents'][q][i],
+                'metadata': results['metadatas'][q][i],
+                'distance': results['distances'][q][i] if 'distances' in results else 0,
+                'id': results['ids'][q][i]
+            })
+
+        fused = await fuse_with_keyword_results(query, query_embeddings[q], semantic_results, pool, doc_type)
+        all_results.append(await chroma_executor.run(rerank, query, fused, top_k))
+
+    return all_results
+
+async def fuse_with_keyword_results(query: str, query_embedding: List[float], semantic_results: List[Dict],
+                                    top_k: int, doc_type: Optional[str]) -> List[Dict]:
+    """Merge one query's vector hits with BM25 hits by reciprocal-rank fusion"""
+    import numpy as np
+    from bm25_index import reciprocal_rank_fusion
+
+    if bm25_index is None:
+        # No lexical index yet - rank by distance only (lower is better)
+        semantic_results.sort(key=lambda x: x['distance'])
+        return semantic_results[:top_k]
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k * 2,  # Get more for reranking
-        where=where_filter
+    # Keyword search with the in-memory BM25 index (exact clause numbers, acronyms)
+    keyword_results = await chroma_executor.run(bm25_index.search, query, top_k=top_k * 2, doc_type=doc_type)
+
+    # Reciprocal-rank fusion of both rankings
+    fused = reciprocal_rank_fusion(
+        [[r['id'] for r in semantic_results], [r['id'] for r in keyword_results]],
+        k=RRF_K
     )
+    candidates = {r['id']: r for r in keyword_results}
+    for r in semantic_results:
+        candidates[r['id']] = {**candidates.get(r['id'], {}), **r}
 
-    # Format results
-    semantic_results = []
-    for i in range(len(results['ids'][0])):
-        semantic_results.append({
-            'text': results['documents'][0][i],
-            'metadata': results['metadatas'][0][i],
-            'distance': results['distances'][0][i] if 'distances' in results else 0,
-            'id': results['ids'][0][i]
-        })
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
 
-    # Simple reranking by distance (lower is better)
-    semantic_results.sort(key=lambda x: x['distance'])
+    # Keyword-only hits have no vector distance - compute it so confidence stays comparable
+    missing = [doc_id for doc_id in ranked if 'distance' not in candidates[doc_id]]
+    if missing:
+        with time_stage("vector_get"):
+            stored = await chroma_executor.run(collection.get, ids=missing, include=["embeddings"])
+        query_vec = np.array(query_embedding)
+        for doc_id, embedding in zip(stored['ids'], stored['embeddings']):
+            candidates[doc_id]['distance'] = float(np.sum((np.array(embedding) - query_vec) ** 2))
 
-    return semantic_results[:top_k]
+    hybrid_results = []
+    for doc_id in ranked:
+        result = candidates[doc_id]
+        result.setdefault('distance', 2.0)  # Not in Chroma (stale BM25 index) - zero confidence
+        result['rrf_score'] = fused[doc_id]
+        hybrid_results.append(result)
 
-def generate_answer(question: str, sources: List[Dict]) -> str:
-    """Generate answer using GPT with strict citation requirements"""
+    return hybrid_results
+
+def rerank(query: str, candidates: List[Dict], top_k: int) -> List[Dict]:
+    """Second-stage rescoring of the fused candidates; first-stage order if it runs over budget"""
+    if reranker is None:
+        return candidates[:top_k]
+
+    with time_stage("rerank"):
+        reranked = reranker.rerank(query, candidates, bm25_index)
+    registry.inc("rag_rerank_total", outcome="fallback" if reranked is None else "reranked")
+    return (reranked or candidates)[:top_k]
+
+def build_answer_messages(question: str, sources: List[Dict]) -> List[Dict]:
+    """Build the chat messages for an answer with strict citation requirements"""
 
     context = "\n\n".join([
         f"[{i+1}] Document: {s['metadata']['document']}, Page: {s['metadata']['page']}\n{s['text']}"
@@ -124,59 +410,222 @@ Context from MPP Documentation:
 
 Provide a detailed answer with exact citations."""
 
-    response = client.chat.completions.create(
-        model=os.getenv("LLM_MODEL", "gpt-4"),
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        # GPT-5 only supports default temperature of 1
-    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def generate_answer(question: str, sources: List[Dict]) -> str:
+    """Generate answer using GPT with strict citation requirements"""
+    with time_stage("llm"):
+        response = await client.chat.completions.create(
+            model=os.getenv("LLM_MODEL", "gpt-4"),
+            messages=build_answer_messages(question, sources)
+            # GPT-5 only supports default temperature of 1
+        )
+    record_tokens("llm", getattr(response, "usage", None))
 
     return response.choices[0].message.content
 
+async def stream_answer(question: str, sources: List[Dict]) -> AsyncIterator[str]:
+    """Yield answer tokens as the chat completion streams them"""
+    with time_stage("llm_stream"):
+        stream = await client.chat.completions.create(
+            model=os.getenv("LLM_MODEL", "gpt-4"),
+            messages=build_answer_messages(question, sources),
+            stream=True
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+def verify_answer(answer: str, sources: List[Dict]):
+    """Check the answer's quotes against the passages it cites (no LLM call)"""
+    from citations import verify_citations
+
+    with time_stage("citations"):
+        return verify_citations(answer, sources, quote_index)
+
+def format_sources(sources: List[Dict], citations: Optional[List[Dict]] = None) -> List[Source]:
+    """Convert retrieved chunks to response Sources, with verification results when given"""
+    from near_duplicates import duplicate_locations
+
+    citations = citations or [{"verified": None, "matches": []}] * len(sources)
+    return [
+        Source(
+            # Match offsets point into the whole passage, so matched sources keep all of it
+            quote=s['text'][:500] + "..." if len(s['text']) > 500 and not c['matches'] else s['text'],
+            document=s['metadata']['document'],
+            page=s['metadata']['page'],
+            confidence=1.0 - (s['distance'] / 2.0),  # Convert distance to confidence
+            doc_type=s['metadata']['doc_type'],
+            verified=c['verified'],
+            matches=[CitationMatch(**m) for m in c['matches']],
+            also_in=[PageLocation(**loc) for loc in duplicate_locations(s['metadata'])],
+            merged_ids=s.get('merged_ids') or [s['id']]
+        )
+        for s, c in zip(sources, citations)
+    ]
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # API Endpoints
 
 @app.get("/")
 async def root():
     """API information"""
+    await ensure_ready()
     return {
         "name": "MPP RAG API",
         "version": "1.0.0",
         "status": "operational",
-        "documents_indexed": collection.count(),
+        "documents_indexed": await chroma_executor.run(collection.count),
         "endpoints": {
             "query": "/query - Ask questions with citations",
+            "query_stream": "/query/stream - Same as /query, streamed as server-sent events",
+            "query_batch": "/query/batch - Answer many questions in one call",
             "extract": "/extract - Get exact quotes from documents",
+            "extract_stream": "/extract/stream - Export document pages as NDJSON",
             "cross_reference": "/cross_reference - Compare modules vs core docs",
-            "health": "/health - System status"
+            "cross_reference_report": "/cross_reference/report - All modules vs core docs",
+            "health": "/health - Liveness check",
+            "ready": "/ready - Readiness: indexes loaded, startup timings",
+            "metrics": "/metrics - Prometheus metrics"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """System health check"""
+    """Liveness check: cheap, and answers while indexes are still loading"""
+    return {
+        "status": "healthy",
+        "ready": startup["ready"],
+        "vector_backend": VECTOR_BACKEND,
+        "requests_in_flight": request_limiter.in_flight,
+        "requests_rejected": request_limiter.rejected,
+        "requests_coalesced": single_flight.coalesced
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once clients and indexes are loaded, 503 while warming up or after a failed startup"""
+    start_warm_up()
+    status = {
+        "ready": startup["ready"],
+        "error": startup["error"],
+        "startup_seconds": startup["seconds"],
+        "startup_budget_seconds": STARTUP_BUDGET_SECONDS,
+        "startup_steps_ms": startup["steps_ms"]
+    }
+    if not startup["ready"]:
+        return JSONResponse(status_code=503, content=status)
+
     try:
-        count = collection.count()
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "documents_indexed": count,
-            "openai_api": "configured"
-        }
+        count = await chroma_executor.run(collection.count)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return JSONResponse(status_code=503, content={**status, "ready": False, "error": str(e)})
+
+    return {
+        **status,
+        "database": "connected",
+        "vector_backend": VECTOR_BACKEND,
+        "documents_indexed": count,
+        "openai_api": "configured",
+        "indexes": {
+            "bm25": bm25_index is not None,
+            "alignment_table": alignment_table is not None,
+            "page_store": page_store is not None,
+            "quote_index": quote_index is not None,
+            "reranker": reranker is not None
+        },
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "corpus_version": corpus_version.current()
+    }
 
-@app.post("/query", response_model=QueryResponse)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency, tokens, cache hit rates, in-flight requests"""
+    gauges = {
+        "rag_ready": ("1 once clients and indexes are loaded", int(startup["ready"])),
+        "rag_startup_seconds": ("Time spent loading clients and indexes", startup["seconds"] or 0),
+        "rag_requests_in_flight": ("Requests currently holding a concurrency slot", request_limiter.in_flight),
+        "rag_requests_rejected": ("Requests rejected with 429 since start", request_limiter.rejected),
+        "rag_requests_coalesced": ("Requests served by an identical in-flight request", single_flight.coalesced),
+    }
+    if startup["ready"]:
+        cache = embedding_cache.stats()
+        gauges.update({
+            "rag_embedding_cache_memory_hits": ("Query embedding cache memory-tier hits", cache["memory_hits"]),
+            "rag_embedding_cache_disk_hits": ("Query embedding cache disk-tier hits", cache["disk_hits"]),
+            "rag_embedding_cache_misses": ("Query embedding cache misses", cache["misses"]),
+            "rag_embedding_cache_hit_rate": ("Query embedding cache hit rate", cache["hit_rate"]),
+        })
+        answers = answer_cache.stats()
+        gauges.update({
+            "rag_answer_cache_entries": ("Answers held in the semantic answer cache", answers["entries"]),
+            "rag_answer_cache_hits": ("Semantic answer cache hits", answers["hits"]),
+            "rag_answer_cache_misses": ("Semantic answer cache misses", answers["misses"]),
+            "rag_answer_cache_evictions": ("Answers evicted (LRU), expired (TTL) or stale (corpus version)",
+                                           answers["evictions"] + answers["expired"] + answers["stale"]),
+            "rag_answer_cache_hit_rate": ("Semantic answer cache hit rate", answers["hit_rate"]),
+        })
+    return PlainTextResponse(
+        registry.render(gauges),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.post("/query", response_model=QueryResponse, dependencies=[Depends(limit_concurrency)])
 async def query_documents(request: QueryRequest):
     """
     Query the MPP documentation with exact citations
 
     Returns synthesized answer with source citations and confidence scores
     """
+    annotate(body=request.model_dump())
+    # Identical concurrent questions share one embed/search/answer pass
+    response = await single_flight.run(
+        request_key("/query", request.model_dump()),
+        lambda: answer_query(request)
+    )
+    annotate(
+        retrieved_ids=response.metadata.get("retrieved_ids"),
+        answer_cache_hit=response.metadata.get("answer_cache", {}).get("hit")
+    )
+    return response
+
+async def answer_query(request: QueryRequest) -> QueryResponse:
+    """Answer one /query request, using and filling the semantic answer cache"""
+    timings = start_request_timings() if request.include_timings else None
     try:
+        # Reuse the answer to an earlier asking of the question on the same corpus
+        cache_scope = (request.doc_type, request.top_k)
+        version = corpus_version.current()
+        question_embedding = await get_embedding(request.question)
+        if not request.bypass_cache:
+            cached = answer_cache.lookup(request.question, question_embedding, cache_scope, version)
+            if cached is not None:
+                response = cached["response"]
+                return QueryResponse(
+                    query=request.question,
+                    answer=response["answer"],
+                    sources=response["sources"],
+                    metadata={
+                        **response["metadata"],
+                        "answer_cache": {
+                            "hit": True,
+                            "matched_question": cached["question"],
+                            "similarity": round(cached["similarity"], 4)
+                        },
+                        **({"timings_ms": timings} if timings is not None else {})
+                    }
+                )
+
         # Retrieve relevant sources
-        sources = hybrid_search(
+        sources = await hybrid_search(
             request.question,
             top_k=request.top_k,
             doc_type=request.doc_type
@@ -185,45 +634,229 @@ async def query_documents(request: QueryRequest):
         if not sources:
             raise HTTPException(status_code=404, detail="No relevant documents found")
 
+        # Merge overlapping chunks and fit the context token budget
+        retrieved_ids = [s['id'] for s in sources]
+        sources = await chroma_executor.run(pack_context, sources)
+
         # Generate answer with citations
-        answer = generate_answer(request.question, sources)
+        answer = await generate_answer(request.question, sources)
+
+        # Check quoted spans against the cited passages
+        citations, citation_summary = await chroma_executor.run(verify_answer, answer, sources)
 
         # Format sources
-        formatted_sources = [
-            Source(
-                quote=s['text'][:500] + "..." if len(s['text']) > 500 else s['text'],
-                document=s['metadata']['document'],
-                page=s['metadata']['page'],
-                confidence=1.0 - (s['distance'] / 2.0),  # Convert distance to confidence
-                doc_type=s['metadata']['doc_type']
-            )
-            for s in sources
-        ]
+        formatted_sources = format_sources(sources, citations)
+
+        metadata = {
+            "total_sources": len(sources),
+            "retrieved_chunks": len(retrieved_ids),
+            "retrieved_ids": retrieved_ids,
+            "doc_filter": request.doc_type,
+            "model": os.getenv("LLM_MODEL", "gpt-4"),
+            "corpus_version": version,
+            "citations": citation_summary
+        }
+        answer_cache.store(request.question, question_embedding, cache_scope, version, {
+            "answer": answer,
+            "sources": [source.model_dump() for source in formatted_sources],
+            "metadata": metadata
+        })
 
         return QueryResponse(
             query=request.question,
             answer=answer,
             sources=formatted_sources,
             metadata={
-                "total_sources": len(sources),
-                "doc_filter": request.doc_type,
-                "model": os.getenv("LLM_MODEL", "gpt-4")
+                **metadata,
+                "answer_cache": {"hit": False},
+                **({"timings_ms": timings} if timings is not None else {})
             }
         )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/extract")
+@app.post("/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """
+    Streaming variant of /query (server-sent events)
+
+    Sends a `sources` event with the retrieved Source list first, then one `token`
+    event per answer fragment as GPT produces it, then `done` (or `error`)
+    """
+    annotate(body=request.model_dump())
+    # Hold the in-flight slot until the stream finishes, not just until headers are sent
+    await ensure_ready()
+    slot = await request_limiter.hold()
+    try:
+        try:
+            sources = await hybrid_search(
+                request.question,
+                top_k=request.top_k,
+                doc_type=request.doc_type
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if not sources:
+            raise HTTPException(status_code=404, detail="No relevant documents found")
+
+        retrieved_ids = [s['id'] for s in sources]
+        annotate(retrieved_ids=retrieved_ids)
+        sources = await chroma_executor.run(pack_context, sources)
+    except BaseException:
+        # Includes cancellation when the client goes away during retrieval
+        slot.release()
+        raise
+
+    async def event_stream():
+        try:
+            yield sse_event("sources", {
+                "query": request.question,
+                "sources": [source.model_dump() for source in format_sources(sources)]
+            })
+            answer = []
+            async for token in stream_answer(request.question, sources):
+                answer.append(token)
+                yield sse_event("token", {"text": token})
+            citations, citation_summary = await chroma_executor.run(verify_answer, "".join(answer), sources)
+            yield sse_event("done", {
+                "total_sources": len(sources),
+                "doc_filter": request.doc_type,
+                "model": os.getenv("LLM_MODEL", "gpt-4"),
+                "retrieved_ids": retrieved_ids,
+                "citations": citation_summary,
+                "verified_sources": [
+                    {"index": i + 1, "verified": c['verified'], "matches": c['matches']}
+                    for i, c in enumerate(citations)
+                ]
+            })
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            slot.release()
+
+    return SlotStreamingResponse(
+        event_stream(),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/query/batch", response_model=BatchQueryResponse, dependencies=[Depends(limit_concurrency)])
+async def query_documents_batch(request: BatchQueryRequest):
+    """
+    Answer many questions in one call
+
+    All questions are embedded in one request and searched with one ChromaDB
+    multi-query; answers are generated with bounded parallelism. Results come back
+    in question order, with a per-item error instead of failing the whole batch.
+    """
+    annotate(body=request.model_dump())
+    try:
+        all_sources = await hybrid_search_many(
+            request.questions,
+            top_k=request.top_k,
+            doc_type=request.doc_type
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    annotate(retrieved_ids=[[s['id'] for s in sources] for sources in all_sources])
+
+    answer_slots = asyncio.Semaphore(BATCH_ANSWER_CONCURRENCY)
+
+    async def answer_one(index: int, question: str, sources: List[Dict]) -> BatchQueryItem:
+        if not sources:
+            return BatchQueryItem(index=index, error="No relevant documents found")
+        retrieved_ids = [s['id'] for s in sources]
+        try:
+            sources = await chroma_executor.run(pack_context, sources)
+            async with answer_slots:
+                answer = await generate_answer(question, sources)
+            citations, citation_summary = await chroma_executor.run(verify_answer, answer, sources)
+            return BatchQueryItem(index=index, result=QueryResponse(
+                query=question,
+                answer=answer,
+                sources=format_sources(sources, citations),
+                metadata={
+                    "total_sources": len(sources),
+                    "doc_filter": request.doc_type,
+                    "model": os.getenv("LLM_MODEL", "gpt-4"),
+                    "retrieved_ids": retrieved_ids,
+                    "citations": citation_summary
+                }
+            ))
+        except Exception as e:
+            return BatchQueryItem(index=index, error=str(e))
+
+    results = await asyncio.gather(*[
+        answer_one(i, question, sources)
+        for i, (question, sources) in enumerate(zip(request.questions, all_sources))
+    ])
+
+    return BatchQueryResponse(
+        results=results,
+        metadata={
+            "total_questions": len(request.questions),
+            "succeeded": sum(1 for r in results if r.error is None),
+            "failed": sum(1 for r in results if r.error is not None)
+        }
+    )
+
+def page_not_found(request: ExtractRequest) -> HTTPException:
+    pages = ""
+    if request.page and request.page_end:
+        pages = f" pages {request.page}-{request.page_end}"
+    elif request.page:
+        pages = f" page {request.page}"
+    return HTTPException(status_code=404, detail=f"No content found for {request.document}{pages}")
+
+@app.post("/extract", dependencies=[Depends(limit_concurrency)])
 async def extract_from_document(request: ExtractRequest):
     """
     Extract exact text from specific document/page
 
-    Returns verbatim text from the specified document
+    Returns verbatim text from the specified document. Without search_term, whole
+    pages (or a page range) are read straight from the page store; search_term, and
+    documents the page store does not hold, still go through the collection.
     """
+    annotate(body=request.model_dump())
     try:
+        in_page_store = False
+        if not request.search_term and page_store is not None:
+            in_page_store = await chroma_executor.run(page_store.has_document, request.document)
+
+        if in_page_store:
+            last_page = request.page_end or request.page
+            with time_stage("page_store"):
+                pages = await chroma_executor.run(
+                    page_store.get_pages, request.document, request.page, last_page
+                )
+            if not pages:
+                raise page_not_found(request)
+
+            return {
+                "document": request.document,
+                "page": request.page,
+                "page_end": request.page_end,
+                "search_term": None,
+                "total_extracts": len(pages),
+                "extracts": [
+                    {"text": p['text'], "page": p['page'], "document": p['document']}
+                    for p in pages
+                ]
+            }
+
         # Build filter with proper ChromaDB syntax
-        if request.page:
+        if request.page and request.page_end:
+            where_filter = {
+                "$and": [
+                    {"document": {"$eq": request.document}},
+                    {"page": {"$gte": request.page}},
+                    {"page": {"$lte": request.page_end}}
+                ]
+            }
+        elif request.page:
             where_filter = {
                 "$and": [
                     {"document": {"$eq": request.document}},
@@ -236,25 +869,25 @@ async def extract_from_document(request: ExtractRequest):
         # Query collection
         if request.search_term:
             # Search for specific term
-            query_embedding = get_embedding(request.search_term)
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=10,
-                where=where_filter
-            )
+            query_embedding = await get_embedding(request.search_term)
+            with time_stage("vector_query"):
+                results = await chroma_executor.run(
+                    collection.query,
+                    query_embeddings=[query_embedding],
+                    n_results=10,
+                    where=where_filter
+                )
         else:
-            # Get all chunks from document/page
-            results = collection.get(
-                where=where_filter,
-                limit=100
-            )
+            # Not in the page store - get chunks from document/page
+            with time_stage("vector_get"):
+                results = await chroma_executor.run(
+                    collection.get,
+                    where=where_filter,
+                    limit=100
+                )
 
         if not results or (isinstance(results, dict) and not results.get('documents')):
-            raise HTTPException(
-                status_code=404,
-                detail=f"No content found for {request.document}" +
-                       (f" page {request.page}" if request.page else "")
-            )
+            raise page_not_found(request)
 
         # Format results
         extracts = []
@@ -274,6 +907,7 @@ async def extract_from_document(request: ExtractRequest):
         return {
             "document": request.document,
             "page": request.page,
+            "page_end": request.page_end,
             "search_term": request.search_term,
             "total_extracts": len(extracts),
             "extracts": extracts
@@ -284,31 +918,105 @@ async def extract_from_document(request: ExtractRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/cross_reference")
+@app.post("/extract/stream")
+async def extract_stream(request: ExtractRequest):
+    """
+    Export document pages as NDJSON, one {"document", "page", "doc_type", "text"} line per page
+
+    Covers the whole document, or page..page_end when given. Pages are read from the
+    page store in batches of EXPORT_PAGE_BATCH, so a long document is never held in memory.
+    """
+    annotate(body=request.model_dump())
+    await ensure_ready()
+    if page_store is None:
+        raise HTTPException(status_code=503, detail="Page store not built - run ingest_pdfs.py")
+    if request.search_term:
+        raise HTTPException(status_code=400, detail="search_term is not supported for exports; use /extract")
+
+    # Hold the in-flight slot until the export finishes
+    slot = await request_limiter.hold()
+    try:
+        try:
+            first = await chroma_executor.run(
+                page_store.get_pages, request.document, request.page, request.page_end, EXPORT_PAGE_BATCH
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if not first:
+            raise page_not_found(request)
+    except BaseException:
+        slot.release()
+        raise
+
+    async def page_lines():
+        try:
+            batch = first
+            while batch:
+                for p in batch:
+                    yield json.dumps(p) + "\n"
+                if len(batch) < EXPORT_PAGE_BATCH:
+                    break
+                batch = await chroma_executor.run(
+                    page_store.get_pages, request.document, batch[-1]['page'] + 1,
+                    request.page_end, EXPORT_PAGE_BATCH
+                )
+        finally:
+            slot.release()
+
+    return SlotStreamingResponse(page_lines(), slot, media_type="application/x-ndjson")
+
+@app.post("/cross_reference", dependencies=[Depends(limit_concurrency)])
 async def cross_reference(request: CrossReferenceRequest):
     """
     Cross-reference modules against core documents
 
     Checks if module content aligns with core MPP SOP and Appendix I
     """
+    annotate(body=request.model_dump())
+    # Identical concurrent comparisons share one retrieval and LLM call
+    return await single_flight.run(
+        request_key("/cross_reference", request.model_dump()),
+        lambda: compare_modules_to_core(request)
+    )
+
+async def compare_modules_to_core(request: CrossReferenceRequest) -> Dict:
+    """Retrieve module and core passages and have GPT analyze their alignment"""
     try:
         # Search in modules
         module_filter = {"doc_type": "module"}
         if request.module_name:
             module_filter["document"] = request.module_name
 
-        module_results = hybrid_search(
-            request.query,
-            top_k=5,
-            doc_type="module"
-        )
+        core_results = []
+        core_retrieval = "live"
+        if alignment_table is not None:
+            # Core passages come from the precomputed alignment of the matched module chunks
+            module_results = await hybrid_search(
+                request.query,
+                top_k=5,
+                doc_type="module"
+            )
+            core_results = alignment_table.core_passages_for(
+                [r['id'] for r in module_results], top_k=5
+            )
+            core_retrieval = "alignment_table"
 
-        # Search in core docs
-        core_results = hybrid_search(
-            request.query,
-            top_k=5,
-            doc_type="core"
-        )
+        if not core_results:
+            # No table, or module chunks newer than the table - search modules and core docs concurrently
+            module_results, core_results = await asyncio.gather(
+                hybrid_search(
+                    request.query,
+                    top_k=5,
+                    doc_type="module"
+                ),
+                hybrid_search(
+                    request.query,
+                    top_k=5,
+                    doc_type="core"
+                )
+            )
+            core_retrieval = "live"
 
         # Compare results
         module_sources = [
@@ -345,14 +1053,16 @@ Analyze:
 
 Be specific and cite page numbers."""
 
-        response = client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4"),
-            messages=[
-                {"role": "system", "content": "You are analyzing alignment between DoD MPP modules and core documentation."},
-                {"role": "user", "content": alignment_prompt}
-            ]
-            # GPT-5 only supports default temperature of 1
-        )
+        with time_stage("llm"):
+            response = await client.chat.completions.create(
+                model=os.getenv("LLM_MODEL", "gpt-4"),
+                messages=[
+                    {"role": "system", "content": "You are analyzing alignment between DoD MPP modules and core documentation."},
+                    {"role": "user", "content": alignment_prompt}
+                ]
+                # GPT-5 only supports default temperature of 1
+            )
+        record_tokens("llm", getattr(response, "usage", None))
 
         return {
             "query": request.query,
@@ -362,20 +1072,37 @@ Be specific and cite page numbers."""
             "alignment_analysis": response.choices[0].message.content,
             "metadata": {
                 "modules_checked": len(module_results),
-                "core_references": len(core_results)
+                "core_references": len(core_results),
+                "core_retrieval": core_retrieval
             }
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cross_reference/report")
+async def cross_reference_report(weak_threshold: float = 0.5):
+    """
+    All modules vs core documents, from the precomputed alignment table
+
+    Per module: how strongly its chunks are backed by core passages, which chunks
+    have no close core match, and which core pages it leans on most
+    """
+    await ensure_ready()
+    if alignment_table is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Alignment table not built - run: python alignment_table.py"
+        )
+    return alignment_table.report(weak_threshold)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     print(f"\n{'='*60}")
     print(f"MPP RAG API Starting on http://localhost:{port}")
     print(f"{'='*60}")
-    print(f"Documents indexed: {collection.count()}")
+    print("Indexes load in the background - GET /ready reports when they are warm")
     print(f"API docs: http://localhost:{port}/docs")
     print(f"{'='*60}\n")
 
@@ -0,0 +1,128 @@
+"""
+Batched Embedding for MPP RAG System
+Token-sized embedding batches with several requests in flight, retries that follow the
+API's rate-limit headers, and results handed back strictly in batch order
+"""
+
+import re
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Iterable, Iterator, Optional
+from openai import RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+from context_packing import estimate_tokens
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def token_batches(chunks: Iterable[Dict], max_tokens: int = 50_000, max_inputs: int = 2048) -> Iterator[List[Dict]]:
+    """Consecutive chunks grouped so each request stays under max_tokens and max_inputs (lazily)"""
+    batch, tokens = [], 0
+    for chunk in chunks:
+        size = estimate_tokens(chunk["text"])
+        if batch and (tokens + size > max_tokens or len(batch) == max_inputs):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += size
+    if batch:
+        yield batch
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds in an OpenAI reset header ("20ms", "1.5s", "6m0s")"""
+    parts = DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+def retry_delay(error: Exception, attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """
+    Seconds to wait before retrying a failed request
+
+    Uses retry-after(-ms) when the API sends it, else the reset time of whichever rate
+    limit is exhausted, else exponential backoff with full jitter.
+    """
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+
+    delay = None
+    if headers.get("retry-after-ms"):
+        delay = float(headers["retry-after-ms"]) / 1000
+    elif headers.get("retry-after", "").replace(".", "", 1).isdigit():
+        delay = float(headers["retry-after"])
+    else:
+        resets = [
+            parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            for kind in ("requests", "tokens")
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+        ]
+        resets = [r for r in resets if r is not None]
+        if resets:
+            delay = max(resets)
+
+    if delay is None:
+        return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    # A little jitter so concurrent batches do not all retry at the same instant
+    return min(max_delay, delay) + random.uniform(0, 0.25)
+
+class BatchEmbedder:
+    """Runs embed_fn over batches with up to `concurrency` requests in flight"""
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], concurrency: int = 4,
+                 max_retries: int = 6, base_delay: float = 1.0):
+        self.embed_fn = embed_fn
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.retries = 0
+        self.wait_seconds = 0.0  # Time the writer spent blocked on an embedding result
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embed_fn(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_delay(e, attempt, self.base_delay)
+                self.retries += 1
+                print(f"  [WARN] {type(e).__name__} on a batch of {len(texts)} - retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, batches: Iterable[List[Dict]], write: Callable[[List[Dict], List[List[float]]], None]) -> int:
+        """
+        Embed every batch and call write(batch, embeddings) in batch order; returns the batch count
+
+        batches is consumed lazily, at most `concurrency` batches ahead of the writer, so a
+        generator feeding it never has more than that many batches of chunks in memory.
+        write runs on the calling thread, so the vector store sees one ordered writer. A
+        batch that still fails after max_retries raises; batches written before it stay written.
+        """
+        source = iter(batches)
+        in_flight = deque()
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                while True:
+                    while len(in_flight) < self.concurrency:
+                        batch = next(source, None)
+                        if batch is None:
+                            break
+                        texts = [chunk["text"] for chunk in batch]
+                        in_flight.append((batch, pool.submit(self._embed_with_retry, texts)))
+                    if not in_flight:
+                        return written
+
+                    batch, future = in_flight.popleft()
+                    start = time.perf_counter()
+                    embeddings = future.result()
+                    self.wait_seconds += time.perf_counter() - start
+                    written += 1
+                    print(f"Processing batch {written} ({len(batch)} chunks)")
+                    write(batch, embeddings)
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
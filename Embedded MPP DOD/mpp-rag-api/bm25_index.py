@@ -0,0 +1,173 @@
+"""
+Persisted BM25 Index for MPP RAG System
+Lexical side of hybrid search: tokenized once at ingest, loaded into memory at startup
+"""
+
+import os
+import re
+import pickle
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_INDEX_PATH = "./bm25_index.pkl"
+
+# Keeps DFARS clause numbers ("252.232-7005", "219.71") and acronyms ("SAR", "DCMA") as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text, also emitting the parts of dotted/hyphenated tokens"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token or "-" in token:
+            tokens.extend(part for part in re.split(r"[.\-]", token) if part)
+    return tokens
+
+class BM25Index:
+    """
+    Inverted BM25 index over the same chunk ids stored in ChromaDB
+
+    Term weights are precomputed at build time with BM25Okapi's parameters, so a
+    query is a handful of sparse numpy adds instead of a scan over every document.
+    """
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict],
+                 postings: Dict[str, tuple]):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings
+        self.doc_types = np.array([m.get("doc_type", "") for m in metadatas])
+        self.documents = np.array([m.get("document", "") for m in metadatas])
+        self.rows = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, chunks: List[Dict]) -> "BM25Index":
+        """Build from ingestion chunks ({"id", "text", "metadata"})"""
+        from rank_bm25 import BM25Okapi  # Only needed to build; the server just loads the pickle
+
+        tokenized = [tokenize(chunk["text"]) for chunk in chunks]
+        bm25 = BM25Okapi(tokenized)
+
+        # term -> (doc indices, precomputed BM25 weights)
+        raw_postings: Dict[str, Dict[int, int]] = {}
+        for doc_idx, freqs in enumerate(bm25.doc_freqs):
+            for term, tf in freqs.items():
+                raw_postings.setdefault(term, {})[doc_idx] = tf
+
+        doc_len = np.array(bm25.doc_len, dtype=np.float32)
+        norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl)
+
+        postings = {}
+        for term, docs in raw_postings.items():
+            idx = np.fromiter(docs.keys(), dtype=np.int32, count=len(docs))
+            tf = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            weights = bm25.idf[term] * tf * (bm25.k1 + 1) / (tf + norm[idx])
+            postings[term] = (idx, weights.astype(np.float32))
+
+        return cls(
+            ids=[chunk["id"] for chunk in chunks],
+            texts=[chunk["text"] for chunk in chunks],
+            metadatas=[chunk["metadata"] for chunk in chunks],
+            postings=postings
+        )
+
+    def save(self, path: str = DEFAULT_INDEX_PATH):
+        """Persist index next to chroma_db"""
+        with open(path, "wb") as f:
+            pickle.dump({
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "postings": self.postings
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH) -> "BM25Index":
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        return cls(**data)
+
+    def idf(self, term: str) -> float:
+        """Okapi idf from the term's document frequency (0 for unseen terms)"""
+        if term not in self.postings:
+            return 0.0
+        df = len(self.postings[term][0])
+        return float(np.log((len(self.ids) - df + 0.5) / (df + 0.5) + 1))
+
+    def score_ids(self, query: str, ids: List[str]) -> np.ndarray:
+        """BM25 scores of specific chunks for a query (0 for ids not in the index)"""
+        rows = np.array([self.rows.get(doc_id, -1) for doc_id in ids], dtype=np.int64)
+        scores = np.zeros(len(ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                idx, weights = self.postings[term]
+                # postings are built in row order, so idx is sorted
+                pos = np.searchsorted(idx, rows)
+                pos = np.minimum(pos, len(idx) - 1)
+                hit = (rows >= 0) & (idx[pos] == rows)
+                scores[hit] += weights[pos[hit]]
+        return scores
+
+    def search(self, query: str, top_k: int = 10, doc_type: Optional[str] = None,
+               document: Optional[str] = None) -> List[Dict]:
+        """Return top_k chunks by BM25 score, optionally filtered by doc_type/document"""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                idx, weights = self.postings[term]
+                scores[idx] += weights
+
+        if doc_type:
+            scores[self.doc_types != doc_type] = 0
+        if document:
+            scores[self.documents != document] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [
+            {
+                'text': self.texts[i],
+                'metadata': self.metadatas[i],
+                'bm25_score': float(scores[i]),
+                'id': self.ids[i]
+            }
+            for i in candidates
+        ]
+
+def load_index(path: Optional[str] = None) -> Optional[BM25Index]:
+    """Load the persisted index, or None if ingestion has not produced one yet"""
+    path = path or os.getenv("BM25_INDEX_PATH", DEFAULT_INDEX_PATH)
+    if not Path(path).exists():
+        print(f"[WARN] BM25 index not found at {path} - hybrid search will use vectors only")
+        return None
+    return BM25Index.load(path)
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuse several ranked id lists: score(id) = sum(1 / (k + rank))"""
+    fused: Dict[str, float] = {}
+    for ranking in ranked_lists:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+if __name__ == "__main__":
+    # Rebuild the BM25 index from an existing chroma_db without re-embedding
+    import chromadb
+
+    chroma_client = chromadb.PersistentClient(path="./chroma_db")
+    collection = chroma_client.get_collection(name="mpp_documents")
+    data = collection.get(include=["documents", "metadatas"])
+
+    chunks = [
+        {"id": data['ids'][i], "text": data['documents'][i], "metadata": data['metadatas'][i]}
+        for i in range(len(data['ids']))
+    ]
+    index = BM25Index.build(chunks)
+    index_path = os.getenv("BM25_INDEX_PATH", DEFAULT_INDEX_PATH)
+    index.save(index_path)
+    print(f"[OK] BM25 index with {len(chunks)} chunks saved to {index_path}")
@@ -0,0 +1,245 @@
+"""
+Citation Verification for MPP RAG System
+Checks the quoted spans in a generated answer against the passages they cite, with exact
+word-sequence matching and a fuzzy word-trigram fallback - no LLM calls
+"""
+
+import os
+import re
+import zlib
+import pickle
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+DEFAULT_QUOTE_INDEX_PATH = "./quote_index.pkl"
+
+# Dotted numbers ("252.232") stay whole; hyphens split, so "semi-annual" matches "semi annual"
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*", re.IGNORECASE)
+QUOTE_PATTERN = re.compile(r"[\"“]([^\"“”]+)[\"”]")
+CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\]")
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)|\n")
+
+MIN_QUOTE_WORDS = 4  # Shorter quoted strings are terms ("mentor"), not quotations
+NGRAM = 3
+
+def word_spans(text: str) -> List[Tuple[str, int, int]]:
+    """(lowercased word, start, end) for each word, with character offsets into text"""
+    return [(m.group().lower(), m.start(), m.end()) for m in WORD_PATTERN.finditer(text)]
+
+def ngram_hashes(words: List[str]) -> List[int]:
+    return [
+        zlib.crc32(" ".join(words[i:i + NGRAM]).encode())
+        for i in range(len(words) - NGRAM + 1)
+    ]
+
+def _citation_numbers(text: str) -> List[int]:
+    return [int(n) for group in CITATION_PATTERN.findall(text) for n in group.split(",")]
+
+def extract_quotes(answer: str) -> List[Dict]:
+    """
+    Quoted spans in the answer with the [n] citations of their sentence
+
+    Citations after the quote (up to the end of the sentence) win; otherwise the ones
+    earlier in the same sentence are used ("According to the SOP [1], "...").
+    """
+    quotes = []
+    for m in QUOTE_PATTERN.finditer(answer):
+        words = [w for w, _, _ in word_spans(m.group(1))]
+        if len(words) < MIN_QUOTE_WORDS:
+            continue
+
+        before = answer[:m.start()]
+        sentence_start = max((e.end() for e in SENTENCE_END.finditer(before)), default=0)
+        after = SENTENCE_END.search(answer, m.end())
+        sentence_end = after.start() if after else len(answer)
+
+        citations = _citation_numbers(answer[m.end():sentence_end])
+        if not citations:
+            citations = _citation_numbers(answer[sentence_start:m.start()])
+
+        quotes.append({
+            "text": m.group(1),
+            "words": words,
+            "citations": list(dict.fromkeys(citations)),
+            "answer_start": m.start(1),
+            "answer_end": m.end(1)
+        })
+    return quotes
+
+def match_quote(quote_words: List[str], spans: List[Tuple[str, int, int]],
+                threshold: float) -> Optional[Dict]:
+    """
+    Locate a quote in a passage: exact word sequence first, then the passage
+    alignment sharing the most word trigrams with the quote
+
+    Returns {"start", "end", "score"} with character offsets into the passage, or None
+    """
+    words = [w for w, _, _ in spans]
+    n = len(quote_words)
+
+    for i in range(len(words) - n + 1):
+        if words[i] == quote_words[0] and words[i:i + n] == quote_words:
+            return {"start": spans[i][1], "end": spans[i + n - 1][2], "score": 1.0}
+
+    quote_grams = ngram_hashes(quote_words)
+    if not quote_grams:
+        return None
+
+    positions: Dict[int, List[int]] = {}
+    for i, gram in enumerate(ngram_hashes(words)):
+        positions.setdefault(gram, []).append(i)
+
+    # Vote for alignments (passage position - quote position) shared by matching trigrams
+    votes: Dict[int, List[int]] = {}
+    for q, gram in enumerate(quote_grams):
+        for p in positions.get(gram, []):
+            votes.setdefault(p - q, []).append(p)
+    if not votes:
+        return None
+
+    hits = max(votes.values(), key=len)
+    score = len(hits) / len(quote_grams)
+    if score < threshold:
+        return None
+    return {"start": spans[min(hits)][1], "end": spans[max(hits) + NGRAM - 1][2], "score": round(score, 4)}
+
+class QuoteIndex:
+    """
+    Corpus-wide word-trigram index, built at ingest
+
+    Finds where a quote really comes from when it is not in any cited passage. Stored as
+    sorted (trigram hash, chunk row) arrays, so a lookup is a few binary searches.
+    """
+
+    def __init__(self, ids: List[str], locations: List[Tuple[str, int]],
+                 keys: np.ndarray, rows: np.ndarray):
+        self.ids = ids
+        self.locations = locations  # (document, page) per row
+        self.keys = keys
+        self.rows = rows
+
+    @classmethod
+    def build(cls, chunks: List[Dict]) -> "QuoteIndex":
+        keys, rows = [], []
+        for row, chunk in enumerate(chunks):
+            grams = np.unique(np.asarray(ngram_hashes([w for w, _, _ in word_spans(chunk["text"])]), dtype=np.uint32))
+            keys.append(grams)
+            rows.append(np.full(len(grams), row, dtype=np.int32))
+
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint32)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            ids=[chunk["id"] for chunk in chunks],
+            locations=[(chunk["metadata"]["document"], chunk["metadata"]["page"]) for chunk in chunks],
+            keys=keys[order],
+            rows=rows[order]
+        )
+
+    def save(self, path: str = DEFAULT_QUOTE_INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_QUOTE_INDEX_PATH) -> "QuoteIndex":
+        with open(path, "rb") as f:
+            return cls(**pickle.load(f))
+
+    def locate(self, quote_words: List[str], threshold: float) -> Optional[Dict]:
+        """Chunk containing the largest share of the quote's trigrams, if above threshold"""
+        grams = np.unique(np.asarray(ngram_hashes(quote_words), dtype=np.uint32))
+        if not len(grams) or not len(self.ids):
+            return None
+
+        left = np.searchsorted(self.keys, grams, side="left")
+        right = np.searchsorted(self.keys, grams, side="right")
+        hits = [self.rows[l:r] for l, r in zip(left, right) if r > l]
+        if not hits:
+            return None
+
+        votes = np.bincount(np.concatenate(hits), minlength=len(self.ids))
+        row = int(np.argmax(votes))
+        score = votes[row] / len(grams)
+        if score < threshold:
+            return None
+        document, page = self.locations[row]
+        return {"id": self.ids[row], "document": document, "page": page, "score": round(float(score), 4)}
+
+def load_quote_index(path: Optional[str] = None) -> Optional[QuoteIndex]:
+    """Load the persisted index, or None if ingestion has not produced one yet"""
+    path = path or os.getenv("QUOTE_INDEX_PATH", DEFAULT_QUOTE_INDEX_PATH)
+    if not Path(path).exists():
+        print(f"[WARN] Quote index not found at {path} - unverified quotes will not be located in the corpus")
+        return None
+    return QuoteIndex.load(path)
+
+def _best_match(quote_words: List[str], candidates: List[int], spans: List, threshold: float):
+    best = None
+    for i in candidates:
+        match = match_quote(quote_words, spans[i], threshold)
+        if match and (best is None or match["score"] > best[1]["score"]):
+            best = (i, match)
+            if match["score"] == 1.0:
+                break
+    return best
+
+def verify_citations(answer: str, sources: List[Dict], quote_index: Optional[QuoteIndex] = None,
+                     threshold: Optional[float] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Check every quote in an answer against the sources numbered [1]..[n] in its prompt
+
+    Returns one {"verified", "matches"} per source and a summary. verified is None when
+    no quote refers to the source, and otherwise True only if every quote attributed to
+    it was found. A quote citing several sources needs to be in just one of them; one
+    found in a different source than those cited is attributed there, and a quote found
+    in none of them is looked up in the whole corpus.
+    """
+    if threshold is None:
+        threshold = float(os.getenv("CITATION_FUZZY_THRESHOLD", 0.6))
+
+    spans = [word_spans(s['text']) for s in sources]
+    results = [{"verified": None, "matches": []} for _ in sources]
+    outcomes: List[List[bool]] = [[] for _ in sources]
+    summary = {
+        "quotes": 0,
+        "verified": 0,
+        "unverified": 0,
+        "invalid_citations": sorted({n for n in _citation_numbers(answer) if not 1 <= n <= len(sources)}),
+        "found_elsewhere": []
+    }
+
+    for quote in extract_quotes(answer):
+        summary["quotes"] += 1
+        cited = [n - 1 for n in quote["citations"] if 1 <= n <= len(sources)]
+        others = [i for i in range(len(sources)) if i not in cited]
+
+        # Prefer the cited source whenever it holds the quote
+        found = _best_match(quote["words"], cited, spans, threshold) or \
+            _best_match(quote["words"], others, spans, threshold)
+
+        if found is None or found[0] not in cited:
+            for i in cited:
+                outcomes[i].append(False)
+
+        if found is None:
+            summary["unverified"] += 1
+            location = quote_index.locate(quote["words"], threshold) if quote_index else None
+            if location:
+                summary["found_elsewhere"].append({"quote": quote["text"], **location})
+            continue
+
+        i, match = found
+        summary["verified"] += 1
+        results[i]["matches"].append({
+            "quote": quote["text"],
+            "text": sources[i]['text'][match["start"]:match["end"]],
+            "answer_start": quote["answer_start"],
+            "answer_end": quote["answer_end"],
+            **match
+        })
+        outcomes[i].append(True)
+
+    for result, checks in zip(results, outcomes):
+        result["verified"] = all(checks) if checks else None
+    return results, summary
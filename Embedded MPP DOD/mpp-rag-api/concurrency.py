@@ -0,0 +1,132 @@
+"""
+Async Request Helpers for MPP RAG System
+Bounded executor for blocking ChromaDB calls, an in-flight request limiter with 429 backpressure,
+and single-flight coalescing of identical concurrent requests
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Callable, Any, Awaitable, Dict
+
+class BlockingExecutor:
+    """
+    Runs synchronous calls (ChromaDB, SQLite, CPU-bound ranking) on a bounded thread pool
+    off the event loop. Calls see the caller's context variables, so time_stage inside
+    them still lands in the request's timing breakdown.
+    """
+
+    def __init__(self, max_workers: int = 8, name: str = "chroma"):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests. A request waits up to queue_timeout seconds for a
+    slot, then is rejected with 429 and a Retry-After hint instead of queueing forever.
+    """
+
+    def __init__(self, max_concurrent: int = 64, queue_timeout: float = 5.0):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Server busy: {self.max_concurrent} requests in flight",
+                headers={"Retry-After": str(max(1, int(self.queue_timeout)))}
+            )
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def hold(self) -> "Slot":
+        """Acquire a slot that outlives the handler, e.g. for a streamed response"""
+        await self.acquire()
+        return Slot(self)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+class Slot:
+    """One held limiter slot; release() may be called from every exit path, only the first counts"""
+
+    def __init__(self, limiter: ConcurrencyLimiter):
+        self._limiter = limiter
+        self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self._limiter.release()
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that gives back its limiter slot when sending ends, however it ends.
+    The body generator's own finally does not run if the client disconnects before
+    the body starts, or if the generator is never iterated at all.
+    """
+
+    def __init__(self, content, slot: Slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the work
+    in its own task, and callers arriving while it is in flight await the same result.
+    One caller disconnecting does not cancel the shared work.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def run(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+def request_key(endpoint: str, body: Dict) -> str:
+    """Key for a request body with whitespace differences in string fields removed (case matters to retrieval)"""
+    normalized = {
+        field: " ".join(value.split()) if isinstance(value, str) else value
+        for field, value in body.items()
+    }
+    return endpoint + ":" + json.dumps(normalized, sort_keys=True)
@@ -0,0 +1,77 @@
+"""
+pytest configuration for MPP RAG System
+Fake OpenAI clients and a small PDF corpus; test_query.py is a manual smoke script
+against a running server, not a unit test
+"""
+
+import types
+import pytest
+import fitz  # PyMuPDF
+from replay import hash_embedding
+
+collect_ignore = ["test_query.py"]
+
+FAKE_DIMENSIONS = 64
+
+class FakeOpenAI:
+    """Sync client with embeddings.create only; honours the dimensions extra_body option"""
+
+    def __init__(self, **kwargs):
+        self.embedding_calls = []
+        self.embeddings = types.SimpleNamespace(create=self._create_embeddings)
+
+    def _create_embeddings(self, model, input, extra_body=None, **kwargs):
+        texts = [input] if isinstance(input, str) else input
+        self.embedding_calls.append(texts)
+        dimensions = (extra_body or {}).get("dimensions") or FAKE_DIMENSIONS
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=hash_embedding(t, dimensions)) for t in texts],
+            usage=types.SimpleNamespace(prompt_tokens=sum(len(t.split()) for t in texts))
+        )
+
+def write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+BOILERPLATE = "CONTINUE Select the next button to continue. Navigation menu home modules glossary help exit " * 3
+
+def module_pages(i: int):
+    pages = [f"Module {i} page {p} " + " ".join(f"m{i}_{p}_{k}" for k in range(60)) for p in range(1, 4)]
+    return pages + [BOILERPLATE]
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Core/ and Modules/ PDFs; every module ends with the same boilerplate page"""
+    core, modules = tmp_path / "Core", tmp_path / "Modules"
+    core.mkdir()
+    modules.mkdir()
+    write_pdf(core / "MPP SOP.pdf", [f"Core page {p} mentor eligibility " + " ".join(f"c{p}_{k}" for k in range(80))
+                                     for p in range(1, 4)])
+    for i in range(3):
+        write_pdf(modules / f"module-{i}.pdf", module_pages(i))
+    return tmp_path
+
+@pytest.fixture
+def ingestion(corpus, monkeypatch):
+    """Factory for PDFIngestion over `corpus`, with every store under the test directory"""
+    import ingest_pdfs
+    from chromadb.api.client import SharedSystemClient
+
+    # Clients are cached by path string, and every test's path is "./chroma_db"
+    SharedSystemClient.clear_system_cache()
+    work = corpus / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    monkeypatch.setattr(ingest_pdfs, "OpenAI", FakeOpenAI)
+    for name, value in {
+        "OPENAI_API_KEY": "sk-test", "CHUNK_SIZE": "40", "CHUNK_OVERLAP": "5",
+        "INGEST_WORKERS": "1", "EMBEDDING_DIMENSIONS": str(FAKE_DIMENSIONS), "EMBEDDING_STORE_DIR": ""
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    def make():
+        return ingest_pdfs.PDFIngestion(str(corpus / "Core"), str(corpus / "Modules"), workers=1)
+    return make
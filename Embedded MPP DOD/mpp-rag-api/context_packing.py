@@ -0,0 +1,131 @@
+"""
+Context Packing for MPP RAG System
+Merges overlapping chunks from the same page, diversifies with MMR, and fills a token budget
+"""
+
+import os
+import re
+from typing import List, Dict
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for OpenAI models (~4 characters per token for English)"""
+    return max(1, len(text) // 4)
+
+def _relevance(source: Dict) -> float:
+    """Cosine similarity recovered from Chroma's squared-L2 distance on unit vectors"""
+    return 1.0 - source.get('distance', 2.0) / 2.0
+
+def _merge_words(first: List[str], second: List[str], max_overlap: int) -> List[str]:
+    """Append second to first, dropping the longest suffix/prefix overlap (ingest chunk overlap)"""
+    for k in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first[-k:] == second[:k]:
+            return first + second[k:]
+    return first + second
+
+def merge_adjacent(sources: List[Dict], max_overlap: int) -> List[Dict]:
+    """
+    Merge chunks of the same document/page whose chunk_index values are consecutive,
+    removing the words they share. Each passage keeps the ids of the chunks it covers.
+    """
+    by_page: Dict[tuple, List[Dict]] = {}
+    for source in sources:
+        meta = source['metadata']
+        by_page.setdefault((meta['document'], meta['page']), []).append(source)
+
+    passages = []
+    for group in by_page.values():
+        group.sort(key=lambda s: s['metadata'].get('chunk_index', 0))
+        current = None
+        for source in group:
+            index = source['metadata'].get('chunk_index', 0)
+            if current is not None and index == current['last_index'] + 1:
+                current['words'] = _merge_words(current['words'], source['text'].split(), max_overlap)
+                current['ids'].append(source['id'])
+                current['last_index'] = index
+                current['distance'] = min(current['distance'], source.get('distance', 2.0))
+                continue
+            if current is not None:
+                passages.append(current)
+            current = {
+                'words': source['text'].split(),
+                'ids': [source['id']],
+                'metadata': source['metadata'],
+                'last_index': index,
+                'distance': source.get('distance', 2.0)
+            }
+        if current is not None:
+            passages.append(current)
+
+    return [
+        {
+            'text': ' '.join(p['words']),
+            'metadata': p['metadata'],
+            'distance': p['distance'],
+            'id': p['ids'][0],
+            'merged_ids': p['ids']
+        }
+        for p in passages
+    ]
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def mmr_order(passages: List[Dict], mmr_lambda: float) -> List[Dict]:
+    """
+    Maximal marginal relevance ordering: relevance is the passage's vector similarity,
+    redundancy is word-set Jaccard overlap with passages already chosen
+    """
+    word_sets = [set(WORD_PATTERN.findall(p['text'].lower())) for p in passages]
+    remaining = list(range(len(passages)))
+    chosen: List[int] = []
+
+    while remaining:
+        def score(i: int) -> float:
+            redundancy = max((_jaccard(word_sets[i], word_sets[j]) for j in chosen), default=0.0)
+            return mmr_lambda * _relevance(passages[i]) - (1 - mmr_lambda) * redundancy
+
+        best = max(remaining, key=score)
+        chosen.append(best)
+        remaining.remove(best)
+
+    return [passages[i] for i in chosen]
+
+def pack_context(sources: List[Dict], token_budget: int = None, mmr_lambda: float = None,
+                 max_overlap: int = None) -> List[Dict]:
+    """
+    Turn retrieved chunks into the passages actually sent to the LLM
+
+    Passages keep the shape of hybrid_search results, so prompt numbering [n] and the
+    returned Sources line up; merged_ids lists the original chunk ids behind each one.
+    A token_budget of 0 disables packing.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+    if mmr_lambda is None:
+        mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+    if max_overlap is None:
+        max_overlap = 2 * int(os.getenv("CHUNK_OVERLAP", 50))
+
+    if not token_budget or not sources:
+        return sources
+
+    passages = mmr_order(merge_adjacent(sources, max_overlap), mmr_lambda)
+
+    packed = []
+    used = 0
+    for passage in passages:
+        cost = estimate_tokens(passage['text'])
+        if used + cost <= token_budget:
+            packed.append(passage)
+            used += cost
+        elif not packed:
+            # Best passage alone exceeds the budget - keep its head rather than nothing
+            passage = {**passage, 'text': passage['text'][:token_budget * 4]}
+            packed.append(passage)
+            used = token_budget
+
+    return packed
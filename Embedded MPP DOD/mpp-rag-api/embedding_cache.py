@@ -0,0 +1,159 @@
+"""
+Query Embedding Cache for MPP RAG System
+Two tiers: in-process LRU in front of an on-disk SQLite store, keyed by (model@dimensions,
+normalized text)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Dict
+from embedding_store import model_key
+
+DEFAULT_CACHE_PATH = "./embedding_cache.db"
+# Bumped when the key format changes; rows written under an older format are dropped
+KEY_FORMAT_VERSION = 2
+
+def embedding_options(dimensions: int) -> Dict:
+    """Extra embeddings.create arguments for reduced-dimension text-embedding-3 vectors"""
+    if not dimensions:
+        return {}
+    # Passed through extra_body: the pinned openai client predates the `dimensions` argument
+    return {"extra_body": {"dimensions": dimensions}}
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different questions share an entry (case is kept:
+    the model embeds "SAR" and "sar" differently)"""
+    return re.sub(r"\s+", " ", text).strip()
+
+class EmbeddingCache:
+    """
+    LRU memory tier (bounded by entry count) backed by a SQLite tier (bounded by
+    row count, least-recently-used rows evicted). Safe to share across threads.
+
+    read_only opens an existing SQLite file without ever writing to it (no schema
+    changes, recency updates or inserts); new vectors then stay in the memory tier.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, memory_size: int = 1024,
+                 disk_size: int = 50000, read_only: bool = False):
+        self.memory_size = memory_size
+        self.read_only = read_only
+        self.disk_size = disk_size
+        self._memory: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if path and read_only:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < KEY_FORMAT_VERSION:
+                self._db.close()
+                self._db = None
+        elif path and disk_size > 0:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+            # Before version 1 rows were keyed by model alone, whatever their dimensions;
+            # before version 2 by lowercased text
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < KEY_FORMAT_VERSION:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.execute(f"PRAGMA user_version = {KEY_FORMAT_VERSION}")
+            self._db.commit()
+
+    def get(self, model: str, text: str, dimensions: int = 0) -> Optional[List[float]]:
+        """Cached vector for text, or None; a vector of the wrong width is dropped as a miss"""
+        key = (model_key(model, dimensions), normalize_text(text))
+        with self._lock:
+            if key in self._memory:
+                if not dimensions or len(self._memory[key]) == dimensions:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return self._memory[key]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text = ?", key
+                ).fetchone()
+                if row and dimensions and len(row[0]) != dimensions * 4:
+                    if not self.read_only:
+                        self._db.execute("DELETE FROM embeddings WHERE model = ? AND text = ?", key)
+                        self._db.commit()
+                    row = None
+                if row:
+                    if not self.read_only:
+                        self._db.execute(
+                            "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                            (time.time(), *key)
+                        )
+                        self._db.commit()
+                    embedding = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, embedding)
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float], dimensions: int = 0):
+        key = (model_key(model, dimensions), normalize_text(text))
+        with self._lock:
+            self._remember(key, embedding)
+            if self._db is None or self.read_only:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                (*key, np.asarray(embedding, dtype=np.float32).tobytes(), time.time())
+            )
+            overflow = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.disk_size
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def _remember(self, key: tuple, embedding: List[float]):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        }
+
+def cache_from_env() -> EmbeddingCache:
+    """Build the cache from EMBEDDING_CACHE_* settings (disk tier off when EMBEDDING_CACHE_PATH is empty)"""
+    return EmbeddingCache(
+        path=os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH),
+        memory_size=int(os.getenv("EMBEDDING_CACHE_SIZE", 1024)),
+        disk_size=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", 50000))
+    )
@@ -0,0 +1,159 @@
+"""
+Content-Addressed Embedding Store for MPP RAG System
+Chunk embeddings keyed by sha256(text) and model, kept as compact vectors in an append-only
+file, so every ingester pays the API only for text it has never embedded
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Callable, Optional
+
+DEFAULT_STORE_DIR = "./embedding_store"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    model TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    offset INTEGER NOT NULL,
+    dimensions INTEGER NOT NULL,
+    PRIMARY KEY (model, digest)
+) WITHOUT ROWID;
+"""
+
+def model_key(model: str, dimensions: int = 0) -> str:
+    """Shortened text-embedding-3 vectors are a different embedding of the same text"""
+    return f"{model}@{dimensions}" if dimensions else model
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class EmbeddingStore:
+    """
+    vectors.bin: every stored vector back to back, only ever appended to
+    index.db: (model, sha256) -> byte offset and dimensions in vectors.bin
+
+    Vectors are written before their index rows, so a crash can leave unused bytes at
+    the end of vectors.bin but never an index row pointing at a partial vector.
+    Safe to share across threads; run one writing process (ingester) at a time.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_DIR, dtype: str = "float16"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path / "index.db"), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+        # The file's dtype is fixed by whoever created it
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dtype'").fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('dtype', ?)", (dtype,))
+            self._db.commit()
+        self.dtype = np.dtype(row[0] if row else dtype)
+
+        self._vectors = open(self.path / "vectors.bin", "a+b")
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Stored vector for each text, None where it has not been embedded with this model"""
+        digests = [text_digest(t) for t in texts]
+        with self._lock:
+            found = {}
+            for digest in set(digests):
+                row = self._db.execute(
+                    "SELECT offset, dimensions FROM entries WHERE model = ? AND digest = ?",
+                    (model, digest)
+                ).fetchone()
+                if row:
+                    offset, dimensions = row
+                    self._vectors.seek(offset)
+                    raw = self._vectors.read(dimensions * self.dtype.itemsize)
+                    found[digest] = np.frombuffer(raw, dtype=self.dtype).astype(np.float32).tolist()
+
+            results = [found.get(d) for d in digests]
+            hits = sum(r is not None for r in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+            return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        with self._lock:
+            rows = []
+            self._vectors.seek(0, os.SEEK_END)
+            offset = self._vectors.tell()
+            written = set()
+            for text, vector in zip(texts, vectors):
+                digest = text_digest(text)
+                if digest in written or self._db.execute(
+                    "SELECT 1 FROM entries WHERE model = ? AND digest = ?", (model, digest)
+                ).fetchone():
+                    continue
+                data = np.asarray(vector, dtype=self.dtype).tobytes()
+                self._vectors.write(data)
+                rows.append((model, digest, offset, len(vector)))
+                written.add(digest)
+                offset += len(data)
+
+            if rows:
+                self._vectors.flush()
+                os.fsync(self._vectors.fileno())
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO entries (model, digest, offset, dimensions) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+
+    def embed(self, model: str, texts: List[str],
+              embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Vectors for texts, calling embed_fn once with the distinct texts not stored yet"""
+        results = self.get_many(model, texts)
+        missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+        if missing:
+            vectors = embed_fn(missing)
+            self.put_many(model, missing, vectors)
+            # Fresh vectors go back at full precision; only later hits see the stored dtype
+            fresh = dict(zip(missing, vectors))
+            results = [r if r is not None else fresh[t] for t, r in zip(texts, results)]
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            self._vectors.seek(0, os.SEEK_END)
+            size = self._vectors.tell()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        self._vectors.close()
+        self._db.close()
+
+def store_from_env() -> Optional[EmbeddingStore]:
+    """Open the store at EMBEDDING_STORE_DIR (off when set to an empty string)"""
+    path = os.getenv("EMBEDDING_STORE_DIR", DEFAULT_STORE_DIR)
+    if not path:
+        return None
+    return EmbeddingStore(path, dtype=os.getenv("EMBEDDING_STORE_DTYPE", "float16"))
+
+if __name__ == "__main__":
+    store = store_from_env()
+    if store is None:
+        print("[SKIP] EMBEDDING_STORE_DIR is empty - the store is off")
+    else:
+        stats = store.stats()
+        print(f"[OK] {stats['entries']} vectors, {stats['bytes'] / 1e6:.1f} MB ({store.dtype.name}) in {store.path}")
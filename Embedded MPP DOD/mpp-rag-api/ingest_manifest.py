@@ -0,0 +1,99 @@
+"""
+Ingestion Manifest for MPP RAG System
+Per-page content hashes and chunk counts from the last ingestion run, so a rerun only
+re-chunks and re-embeds pages that are new or changed
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_MANIFEST_PATH = "./ingest_manifest.json"
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def file_hash(path: Path) -> str:
+    """sha256 of a file's bytes - an unchanged PDF is skipped without being opened"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestManifest:
+    """
+    {"settings": {...}, "documents": {name: {"doc_type", "file_hash", "pages": {page: {"hash", "chunks"}}}},
+     "duplicates": {chunk_id: [representative_id, document, page]}}
+
+    Chunk ids are derived from (document, page, chunk_index), so the chunk count per page
+    is enough to know which ids a page owns. "duplicates" lists the chunks of those pages
+    that were not embedded because a near-duplicate represents them.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, documents: Optional[Dict] = None,
+                 duplicates: Optional[Dict] = None):
+        self.settings = settings or {}
+        self.documents = documents or {}
+        self.duplicates = duplicates or {}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MANIFEST_PATH) -> "IngestManifest":
+        if not Path(path).exists():
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        # JSON object keys are strings; pages are ints everywhere else
+        documents = {
+            name: {**entry, "pages": {int(p): page for p, page in entry["pages"].items()}}
+            for name, entry in data.get("documents", {}).items()
+        }
+        return cls(data.get("settings"), documents, data.get("duplicates"))
+
+    def save(self, path: str = DEFAULT_MANIFEST_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"settings": self.settings, "documents": self.documents, "duplicates": self.duplicates}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def invalidate(self):
+        """Mark every page for re-embedding while keeping the chunk counts needed to clean up"""
+        for entry in self.documents.values():
+            entry["file_hash"] = None
+            for page in entry["pages"].values():
+                page["hash"] = None
+        self.duplicates.clear()
+
+    def start_document(self, document: str, doc_type: str) -> Dict:
+        """Entry a document's pages are recorded into as they are written"""
+        entry = self.documents.setdefault(document, {"doc_type": doc_type, "file_hash": None, "pages": {}})
+        entry["doc_type"] = doc_type
+        entry["file_hash"] = None  # Set again once every changed page is written
+        return entry
+
+    def is_unchanged(self, document: str, doc_type: str, digest: str) -> bool:
+        entry = self.documents.get(document)
+        return entry is not None and entry["doc_type"] == doc_type and entry["file_hash"] == digest
+
+    def page_count(self, document: str) -> int:
+        return len(self.documents.get(document, {}).get("pages", {}))
+
+    def diff_pages(self, document: str, doc_type: str, page_hashes: Dict[int, str]) -> Dict[str, List[int]]:
+        """Sort a document's current pages into added / updated / removed / skipped"""
+        entry = self.documents.get(document)
+        old_pages = entry["pages"] if entry else {}
+        # A doc_type change rewrites every chunk's metadata
+        force = entry is not None and entry["doc_type"] != doc_type
+
+        diff = {"added": [], "updated": [], "removed": [], "skipped": []}
+        for page, digest in sorted(page_hashes.items()):
+            if page not in old_pages:
+                diff["added"].append(page)
+            elif force or old_pages[page]["hash"] != digest:
+                diff["updated"].append(page)
+            else:
+                diff["skipped"].append(page)
+        diff["removed"] = sorted(p for p in old_pages if p not in page_hashes)
+        return diff
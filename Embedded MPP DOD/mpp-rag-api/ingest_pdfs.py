@@ -11,163 +11,707 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from pathlib import Path
 import json
-from typing import List, Dict
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import List, Dict, Iterator, Optional, Tuple
 import hashlib
+from bm25_index import BM25Index, DEFAULT_INDEX_PATH
+from alignment_table import AlignmentTable, DEFAULT_TABLE_PATH
+from vector_index import export_collection, remove_export, DEFAULT_INDEX_DIR as DEFAULT_VECTOR_INDEX_DIR
+from embedding_cache import embedding_options
+from embedding_store import store_from_env, model_key
+from answer_cache import bump_corpus_version, DEFAULT_VERSION_PATH
+from partitions import PartitionWriter, DEFAULT_PARTITIONS_PATH, BASE_COLLECTION
+from page_store import PageStore, DEFAULT_PAGE_STORE_PATH
+from citations import QuoteIndex, DEFAULT_QUOTE_INDEX_PATH
+from batch_embedder import BatchEmbedder, token_batches
+from ingest_manifest import IngestManifest, content_hash, file_hash, DEFAULT_MANIFEST_PATH
+from near_duplicates import NearDuplicateIndex, minhash
+from ingest_profile import IngestProfile, compare_summaries, print_comparison, peak_rss_mb
+from context_packing import estimate_tokens
 
 # Explicitly load .env from current directory
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path, override=True)
 
+def create_chunks(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Split text into overlapping chunks"""
+    words = text.split()
+    chunks = []
+
+    for i in range(0, len(words), chunk_size - chunk_overlap):
+        chunk = ' '.join(words[i:i + chunk_size])
+        chunks.append(chunk)
+
+    return chunks
+
+def generate_chunk_id(filename: str, page: int, chunk_idx: int) -> str:
+    """Generate unique ID for chunk"""
+    content = f"{filename}_{page}_{chunk_idx}"
+    return hashlib.md5(content.encode()).hexdigest()
+
+def extract_pdf(file_path: str, doc_type: str, chunk_size: int, chunk_overlap: int) -> Dict:
+    """
+    Pages, chunks and word offsets of one PDF
+
+    Runs in a worker process, so it takes and returns only plain data and touches no
+    clients or stores.
+    """
+    start = time.perf_counter()
+    name = Path(file_path).name
+    result = {
+        "file_path": file_path,
+        "doc_type": doc_type,
+        "page_count": 0,
+        "pages": [],
+        "offsets": [],
+        "chunks": [],
+        "page_hashes": {},
+        "chunk_seconds": 0.0,
+        "error": None
+    }
+
+    try:
+        doc = fitz.open(file_path)
+        result["page_count"] = len(doc)
+
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            text = page.get_text()
+
+            # Skip empty pages
+            if not text.strip():
+                continue
+
+            result["pages"].append((page_num + 1, text))
+            result["page_hashes"][page_num + 1] = content_hash(text)
+            word_count = len(text.split())
+            chunk_start = time.perf_counter()
+
+            # Create chunks from page text
+            for idx, chunk_text in enumerate(create_chunks(text, chunk_size, chunk_overlap)):
+                chunk_id = generate_chunk_id(name, page_num + 1, idx)
+                start_word = idx * (chunk_size - chunk_overlap)
+                result["offsets"].append({
+                    "id": chunk_id,
+                    "page": page_num + 1,
+                    "chunk_index": idx,
+                    "start_word": start_word,
+                    "end_word": min(start_word + chunk_size, word_count)
+                })
+
+                result["chunks"].append({
+                    "id": chunk_id,
+                    "text": chunk_text,
+                    "metadata": {
+                        "document": name,
+                        "page": page_num + 1,
+                        "doc_type": doc_type,  # "core" or "module"
+                        "chunk_index": idx,
+                        "file_path": file_path
+                    }
+                })
+            result["chunk_seconds"] += time.perf_counter() - chunk_start
+
+        doc.close()
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = time.perf_counter() - start
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
 class PDFIngestion:
-    def __init__(self, core_dir: str, modules_dir: str):
+    def __init__(self, core_dir: str, modules_dir: str, workers: Optional[int] = None):
         self.core_dir = Path(core_dir)
         self.modules_dir = Path(modules_dir)
 
+        # PDF text extraction runs in this many processes (1 = in this process)
+        self.workers = workers or int(os.getenv("INGEST_WORKERS", 0)) or os.cpu_count() or 1
+        self.file_timings: List[Dict] = []
+        self.profile = IngestProfile()
+
         # Force load API key from .env file
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key or api_key == "lmstudio":
             raise ValueError("OPENAI_API_KEY not properly loaded from .env file")
 
         print(f"Using API key: {api_key[:20]}...")
-        self.client = OpenAI(api_key=api_key)
+        # Retries are handled per batch by BatchEmbedder, which follows the rate-limit headers
+        self.client = OpenAI(api_key=api_key, max_retries=0)
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+        self.embedding_dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
         self.chunk_size = int(os.getenv("CHUNK_SIZE", 512))
         self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", 50))
+        self.batch_tokens = int(os.getenv("EMBEDDING_BATCH_TOKENS", 50_000))
+
+        # Vectors of every chunk text embedded before, by any ingester sharing the store
+        self.embedding_store = store_from_env()
+        self.embedder = BatchEmbedder(
+            self.get_embeddings,
+            concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", 4)),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+        )
 
         # Initialize ChromaDB
         self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        self._open_collections()
+
+        # Verbatim page text for /extract, keyed by (document, page)
+        self.page_store = PageStore(os.getenv("PAGE_STORE_PATH", DEFAULT_PAGE_STORE_PATH))
 
+        # Page hashes from the last run; only new or changed pages are re-embedded
+        self.manifest_path = os.getenv("INGEST_MANIFEST_PATH", DEFAULT_MANIFEST_PATH)
+        self.manifest = IngestManifest.load(self.manifest_path)
+
+        # Chunks at least this similar (estimated Jaccard) to one already indexed are not
+        # embedded, only listed on it; 0 turns the pass off
+        self.near_duplicate_threshold = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9))
+        self.dedup: Optional[NearDuplicateIndex] = None
+
+    def _open_collections(self):
         # Create or get collections
         self.collection = self.chroma_client.get_or_create_collection(
-            name="mpp_documents",
+            name=BASE_COLLECTION,
             metadata={"description": "DoD Mentor-Protege Program Documentation"}
         )
 
-    def extract_text_from_pdf(self, pdf_path: Path, doc_type: str) -> List[Dict]:
-        """Extract text from PDF with page-level tracking"""
-        chunks = []
-
-        try:
-            doc = fitz.open(pdf_path)
-            print(f"Processing: {pdf_path.name} ({len(doc)} pages)")
-
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-
-                # Skip empty pages
-                if not text.strip():
-                    continue
-
-                # Create chunks from page text
-                page_chunks = self._create_chunks(text, page_num + 1)
-
-                for idx, chunk_text in enumerate(page_chunks):
-                    chunk_id = self._generate_chunk_id(pdf_path.name, page_num + 1, idx)
-
-                    chunks.append({
-                        "id": chunk_id,
-                        "text": chunk_text,
-                        "metadata": {
-                            "document": pdf_path.name,
-                            "page": page_num + 1,
-                            "doc_type": doc_type,  # "core" or "module"
-                            "chunk_index": idx,
-                            "file_path": str(pdf_path)
-                        }
-                    })
-
-            doc.close()
-            print(f"  [OK] Extracted {len(chunks)} chunks from {pdf_path.name}")
-
-        except Exception as e:
-            print(f"  [ERROR] Error processing {pdf_path.name}: {str(e)}")
-
-        return chunks
-
-    def _create_chunks(self, text: str, page_num: int) -> List[str]:
-        """Split text into overlapping chunks"""
-        words = text.split()
-        chunks = []
-
-        for i in range(0, len(words), self.chunk_size - self.chunk_overlap):
-            chunk = ' '.join(words[i:i + self.chunk_size])
-            chunks.append(chunk)
-
-        return chunks
+        # Per-doc_type (and optionally per-document) copies for unfiltered ANN search
+        self.partitions = PartitionWriter(
+            self.chroma_client,
+            by_document=os.getenv("PARTITION_BY_DOCUMENT", "0") == "1"
+        )
 
-    def _generate_chunk_id(self, filename: str, page: int, chunk_idx: int) -> str:
-        """Generate unique ID for chunk"""
-        content = f"{filename}_{page}_{chunk_idx}"
-        return hashlib.md5(content.encode()).hexdigest()
+    def reset_vector_store(self):
+        """
+        Drop the collection, its partitions and the exported matrices
+
+        Vectors from another embedding model or width cannot share a collection with the
+        new ones (ChromaDB rejects them, and distances between them mean nothing).
+        """
+        for collection in self.chroma_client.list_collections():
+            name = getattr(collection, "name", collection)  # Collection objects in chromadb 0.4, names later
+            if name == BASE_COLLECTION or name.startswith(BASE_COLLECTION + "_"):
+                self.chroma_client.delete_collection(name=name)
+        self._open_collections()
+
+        Path(os.getenv("PARTITIONS_PATH", DEFAULT_PARTITIONS_PATH)).unlink(missing_ok=True)
+        remove_export(os.getenv("VECTOR_INDEX_DIR", DEFAULT_VECTOR_INDEX_DIR))
+
+    def extract_iter(self, files: List[Tuple[Path, str]]) -> Iterator[Tuple[List[Dict], Optional[Dict[int, str]]]]:
+        """
+        Extract several (pdf_path, doc_type), one PDF per worker process
+
+        Yields the chunks and a content hash per non-empty page (None if the PDF could not be
+        read) in the order of `files`, whatever order the workers finish in, with at most
+        two PDFs per worker extracted ahead of the consumer.
+        """
+        args = [(str(path), doc_type, self.chunk_size, self.chunk_overlap) for path, doc_type in files]
+
+        if self.workers <= 1 or len(files) <= 1:
+            for a in args:
+                result = extract_pdf(*a)
+                self.profile.add("extraction", result["seconds"] - result["chunk_seconds"])
+                self.profile.add("chunking", result["chunk_seconds"])
+                yield self._store_extraction(result)
+        else:
+            workers = min(self.workers, len(files))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for a in args:
+                    pending.append(pool.submit(extract_pdf, *a))
+                    if len(pending) >= 2 * workers:
+                        yield self._store_extraction(self._extraction_result(pending.popleft()))
+                while pending:
+                    yield self._store_extraction(self._extraction_result(pending.popleft()))
+
+    def _extraction_result(self, future) -> Dict:
+        """Wait for a worker's result; the wait is extraction time on the ingesting thread"""
+        with self.profile.stage("extraction"):
+            result = future.result()
+        if result["peak_rss_mb"]:
+            self.profile.worker_peak_rss_mb = max(self.profile.worker_peak_rss_mb or 0.0, result["peak_rss_mb"])
+        return result
+
+    def _store_extraction(self, result: Dict) -> Tuple[List[Dict], Optional[Dict[int, str]]]:
+        """Write one extract_pdf result to the page store and the timing report"""
+        name = Path(result["file_path"]).name
+        self.profile.worker_seconds["extraction"] += result["seconds"] - result["chunk_seconds"]
+        self.profile.worker_seconds["chunking"] += result["chunk_seconds"]
+        if result["error"]:
+            print(f"  [ERROR] Error processing {name}: {result['error']}")
+            return [], None
+
+        with self.profile.stage("db_write"):
+            self.page_store.replace_document(name, result["doc_type"], result["pages"], result["offsets"])
+        self.file_timings.append({
+            "document": name,
+            "pages": result["page_count"],
+            "chunks": len(result["chunks"]),
+            "seconds": round(result["seconds"], 3)
+        })
+        print(f"  [OK] Extracted {len(result['chunks'])} chunks from {name} "
+              f"({result['page_count']} pages, {result['seconds']:.2f}s)")
+        return result["chunks"], result["page_hashes"]
 
     def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings from OpenAI"""
+        """Get embeddings from OpenAI, only for texts not already in the embedding store"""
+        if self.embedding_store is None:
+            return self._request_embeddings(texts)
+        return self.embedding_store.embed(
+            model_key(self.embedding_model, self.embedding_dimensions), texts, self._request_embeddings
+        )
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
         response = self.client.embeddings.create(
             model=self.embedding_model,
-            input=texts
+            input=texts,
+            **embedding_options(self.embedding_dimensions)
         )
+        usage = getattr(response, "usage", None)
+        tokens = getattr(usage, "prompt_tokens", None) or sum(estimate_tokens(t) for t in texts)
+        self.profile.record_request(tokens, time.perf_counter() - start)
         return [item.embedding for item in response.data]
 
-    def ingest_documents(self):
-        """Main ingestion process"""
-        all_chunks = []
+    def _upsert_batch(self, batch: List[Dict], embeddings: List[List[float]]):
+        """Upsert into ChromaDB and its partitions (re-ingested pages keep their chunk ids)"""
+        texts = [chunk["text"] for chunk in batch]
+        self.collection.upsert(
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=[chunk["metadata"] for chunk in batch]
+        )
+        self.partitions.write(
+            "upsert",
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=[chunk["metadata"] for chunk in batch]
+        )
+
+    def _chunk_ids(self, document: str, pages: Dict[int, Dict], page: int, first: int = 0) -> List[str]:
+        """Ids of a page's chunks from the manifest, starting at chunk_index `first`"""
+        return [generate_chunk_id(document, page, idx) for idx in range(first, pages[page]["chunks"])]
+
+    def _delete_chunks(self, ids: List[str], doc_type: str, document: str):
+        """
+        Delete chunks from ChromaDB and its partitions
+
+        With the near-duplicate pass on, the duplicates among them were never indexed, and
+        the chunks a deleted representative stood for are placed again at the end of the run.
+        """
+        if self.dedup is not None:
+            ids = [chunk_id for chunk_id in ids if not self.dedup.forget(chunk_id)]
+        if not ids:
+            return
+        with self.profile.stage("db_write"):
+            self.collection.delete(ids=ids)
+            self.partitions.delete(ids, doc_type, document)
+        self.chunks_removed += len(ids)
+
+    def _place(self, chunk: Dict) -> bool:
+        """
+        List a chunk under an indexed near-duplicate of the same doc_type; True if there is
+        none and the chunk is embedded as a new representative
+
+        A chunk an interrupted run already wrote keeps its place, so nothing embedded is
+        ever deleted again for being a duplicate.
+        """
+        metadata = chunk["metadata"]
+        with self.profile.stage("chunking"):
+            signature = minhash(chunk["text"])
+            indexed = chunk["id"] in self.dedup.signatures
+            match = None if indexed else self.dedup.find(signature, metadata["doc_type"])
+        if match is not None:
+            self.dedup.add_duplicate(chunk["id"], match, metadata["document"], metadata["page"])
+            return False
+        self.dedup.add_representative(chunk["id"], signature, metadata["doc_type"])
+        return True
+
+    def _rebuild_chunk(self, chunk_id: str, document: str, page: int) -> Optional[Dict]:
+        """A chunk that was never embedded, from the page text and word offsets in the page store"""
+        pages = self.page_store.get_pages(document, page, page)
+        offsets = [o for o in self.page_store.chunk_offsets(document, page) if o["id"] == chunk_id]
+        if not pages or not offsets:
+            return None
+
+        words = pages[0]["text"].split()
+        doc_type = pages[0]["doc_type"]
+        directory = self.core_dir if doc_type == "core" else self.modules_dir
+        return {
+            "id": chunk_id,
+            "text": " ".join(words[offsets[0]["start_word"]:offsets[0]["end_word"]]),
+            "metadata": {
+                "document": document,
+                "page": page,
+                "doc_type": doc_type,
+                "chunk_index": offsets[0]["chunk_index"],
+                "file_path": str(directory / document)
+            }
+        }
 
-        print("\n=== Processing Core Documents ===")
-        for pdf_file in self.core_dir.glob("*.pdf"):
-            chunks = self.extract_text_from_pdf(pdf_file, "core")
-            all_chunks.extend(chunks)
+    def _orphan_chunks(self) -> Iterator[Dict]:
+        """
+        Duplicates whose representative was deleted, placed again once the changed pages are written
+
+        Each joins an indexed group if one matches; otherwise the first of them (by document,
+        page and position) is embedded and the rest are listed under it.
+        """
+        orphans = []
+        for chunk_id, document, page in self.dedup.orphans():
+            chunk = self._rebuild_chunk(chunk_id, document, page)
+            if chunk is None:
+                print(f"  [WARN] {document} page {page} is not in the page store - duplicate not restored")
+                self.dedup.forget(chunk_id)
+            else:
+                orphans.append(chunk)
+
+        orphans.sort(key=lambda c: (c["metadata"]["document"], c["metadata"]["page"], c["metadata"]["chunk_index"]))
+        for chunk in orphans:
+            if self._place(chunk):
+                # Its page is checkpointed already, so it stays listed (as an orphan) until written
+                self.dedup.duplicate_of[chunk["id"]] = [None, chunk["metadata"]["document"], chunk["metadata"]["page"]]
+                chunk["promoted"] = True
+                self.duplicates_promoted += 1
+                yield chunk
+
+    def _flush_duplicate_metadata(self):
+        """Write changed duplicate lists to the representatives already in ChromaDB"""
+        if self.dedup is None or not self.dedup.changed:
+            return
+        current = self.collection.get(ids=sorted(self.dedup.changed), include=["metadatas"])
+        metadatas = [{**m, **self.dedup.metadata(i)} for i, m in zip(current['ids'], current['metadatas'])]
+        if metadatas:
+            self.collection.update(ids=current['ids'], metadatas=metadatas)
+            self.partitions.update_metadata(current['ids'], metadatas)
+        self.dedup.changed = set()
+
+    def _load_corpus_chunks(self) -> List[Dict]:
+        """Every chunk in the collection, for rebuilding the lexical indexes after a partial run"""
+        data = self.collection.get(include=["documents", "metadatas"])
+        return [
+            {"id": data['ids'][i], "text": data['documents'][i], "metadata": data['metadatas'][i]}
+            for i in range(len(data['ids']))
+        ]
+
+    def _changed_chunks(self, to_extract: List[Tuple[Path, str, str]], extracted) -> Iterator[Dict]:
+        """
+        Chunks of new and changed pages, one PDF at a time
+
+        Chunks that a changed document no longer has are deleted as soon as it is diffed;
+        its pages are recorded in the manifest by _write_batch once their chunks are written.
+        """
+        # Results are in (document, page, chunk_index) order, as if extracted one by one
+        for (pdf_file, doc_type, digest), (chunks, page_hashes) in zip(to_extract, extracted):
+            document = pdf_file.name
+            if page_hashes is None:
+                continue  # Unreadable this run - keep what is indexed
+
+            with self.profile.stage("chunking"):
+                diff = self.manifest.diff_pages(document, doc_type, page_hashes)
+            for key in self.changes:
+                self.changes[key] += len(diff[key])
+
+            old_type = self.manifest.documents.get(document, {}).get("doc_type", doc_type)
+            entry = self.manifest.start_document(document, doc_type)
+            new_counts = {}
+            for chunk in chunks:
+                page = chunk["metadata"]["page"]
+                new_counts[page] = new_counts.get(page, 0) + 1
+
+            # Upserts overwrite the ids a changed page still has; delete the rest. After a
+            # doc_type change every id goes, so none is left in the old doc_type's partition,
+            # and with the near-duplicate pass on, so does a chunk that may now be a duplicate.
+            for page in diff["updated"]:
+                keep = new_counts[page] if old_type == doc_type and self.dedup is None else 0
+                self._delete_chunks(self._chunk_ids(document, entry["pages"], page, keep), old_type, document)
+            for page in diff["removed"]:
+                self._delete_chunks(self._chunk_ids(document, entry["pages"], page), old_type, document)
+                del entry["pages"][page]
+
+            changed = set(diff["added"]) | set(diff["updated"])
+            self.pending[document] = {
+                "file_hash": digest,
+                "hashes": page_hashes,
+                "counts": new_counts,
+                "left": {page: new_counts[page] for page in changed}
+            }
+            self._record_written(document)
+            for chunk in chunks:
+                page = chunk["metadata"]["page"]
+                if page not in changed:
+                    continue
+                if self.dedup is not None and not self._place(chunk):
+                    # Done: an interrupted run finds it listed, and its representative's page redone
+                    self.duplicates_skipped += 1
+                    self._record_written(document, page)
+                    continue
+                yield chunk
+
+        if self.dedup is not None:
+            # Last, so an orphan that a changed page's new text matches is not embedded
+            yield from self._orphan_chunks()
+
+    def _record_written(self, document: str, page: Optional[int] = None):
+        """Move a page (and then its document) to done in the manifest once its chunks are written"""
+        pending = self.pending[document]
+        entry = self.manifest.documents[document]
+        if page is not None:
+            pending["left"][page] -= 1
+            if pending["left"][page] == 0:
+                del pending["left"][page]
+                entry["pages"][page] = {"hash": pending["hashes"][page], "chunks": pending["counts"][page]}
+        if not pending["left"]:
+            entry["file_hash"] = pending["file_hash"]
+            del self.pending[document]
+
+    def _write_batch(self, batch: List[Dict], embeddings: List[List[float]]):
+        """Upsert one embedded batch, then checkpoint the pages it completed"""
+        with self.profile.stage("db_write"):
+            if self.dedup is not None:
+                for chunk in batch:  # Duplicates may have been listed since it was queued
+                    chunk["metadata"].update(self.dedup.metadata(chunk["id"]))
+            self._upsert_batch(batch, embeddings)
+            self.chunks_embedded += len(batch)
+            for chunk in batch:
+                if chunk.get("promoted"):
+                    del self.dedup.duplicate_of[chunk["id"]]
+                else:
+                    self._record_written(chunk["metadata"]["document"], chunk["metadata"]["page"])
+            self._flush_duplicate_metadata()
+            self.manifest.save(self.manifest_path)
+
+    def ingest_documents(self, full: bool = False):
+        """
+        Main ingestion process
+
+        Only pages whose text changed since the last run (per the manifest) are chunked,
+        embedded and upserted; chunks of removed or shortened pages are deleted.
+        full=True re-embeds every page.
+        """
+        settings = {
+            "embedding_model": self.embedding_model,
+            "embedding_dimensions": self.embedding_dimensions,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "near_duplicate_threshold": self.near_duplicate_threshold
+        }
+        if self.manifest.documents and self.manifest.settings != settings:
+            embedding_changed = any(
+                self.manifest.settings.get(key) != settings[key]
+                for key in ["embedding_model", "embedding_dimensions"]
+            )
+            if embedding_changed:
+                print("[WARN] Embedding model or dimensions changed since the last run - "
+                      "rebuilding the vector store and re-embedding every page")
+                self.reset_vector_store()
+            else:
+                print("[WARN] Chunking or near-duplicate settings changed since the last run - re-embedding every page")
+            full = True
+
+        if full:
+            self.manifest.invalidate()
+        self.manifest.settings = settings
+
+        self.profile = IngestProfile()
+        self.file_timings = []
+        self.changes = {"added": 0, "updated": 0, "removed": 0, "skipped": 0}
+        self.chunks_embedded = 0
+        self.chunks_removed = 0
+        self.pending = {}
+        self.duplicates_skipped = 0
+        self.duplicates_promoted = 0
+        seen = set()
+
+        # Hash every PDF first; only new or changed ones go to the extraction workers
+        to_extract = []
+        sources = [("Core", self.core_dir, "core"), ("Module", self.modules_dir, "module")]
+        for label, directory, doc_type in sources:
+            print(f"\n=== Scanning {label} Documents ===")
+            for pdf_file in sorted(directory.glob("*.pdf")):
+                document = pdf_file.name
+                seen.add(document)
+                digest = file_hash(pdf_file)
+                if self.manifest.is_unchanged(document, doc_type, digest):
+                    self.changes["skipped"] += self.manifest.page_count(document)
+                    print(f"  [SKIP] {document} unchanged")
+                    continue
+                to_extract.append((pdf_file, doc_type, digest))
+        removed = [name for name in self.manifest.documents if name not in seen]
+
+        # Signatures of what is indexed; a full run re-adds every chunk, so it starts empty.
+        # Orphans left by an interrupted run are placed again even if no PDF changed.
+        self.dedup = None
+        orphaned = any(entry[0] is None for entry in self.manifest.duplicates.values())
+        if self.near_duplicate_threshold > 0 and (to_extract or removed or orphaned):
+            if full:
+                self.dedup = NearDuplicateIndex(self.near_duplicate_threshold, self.manifest.duplicates)
+            else:
+                with self.profile.stage("chunking"):
+                    self.dedup = NearDuplicateIndex.from_collection(
+                        self.collection, self.near_duplicate_threshold, self.manifest.duplicates
+                    )
+            print(f"  [OK] Near-duplicate index: {len(self.dedup.signatures)} chunks, "
+                  f"{self.dedup.duplicate_total()} duplicates listed under them")
+
+        # PDFs that are gone from both folders
+        for document in removed:
+            entry = self.manifest.documents.pop(document)
+            for page in entry["pages"]:
+                self._delete_chunks(self._chunk_ids(document, entry["pages"], page), entry["doc_type"], document)
+            self.changes["removed"] += len(entry["pages"])
+            self.page_store.delete_document(document)
+            print(f"  [OK] Removed {document}")
+        self.manifest.save(self.manifest_path)
+
+        # extract -> diff -> batch -> embed -> write, each stage pulling from the one before,
+        # so only a few PDFs and batches are in memory at once. Every written batch is
+        # checkpointed in the manifest, and a rerun picks up at the first unwritten page.
+        print(f"\n=== Extracting {len(to_extract)} PDFs ({self.workers} workers) and embedding "
+              f"({self.embedder.concurrency} batches in flight) ===")
+        extracted = self.extract_iter([(pdf_file, doc_type) for pdf_file, doc_type, _ in to_extract])
+        changed_chunks = self._changed_chunks(to_extract, extracted)
+        batches = token_batches(changed_chunks, max_tokens=self.batch_tokens)
+        self.embedder.run(batches, self._write_batch)
+        self.profile.add("embedding", self.embedder.wait_seconds)
+        with self.profile.stage("db_write"):
+            self._flush_duplicate_metadata()
+            self.manifest.save(self.manifest_path)
+
+        print(f"\n=== Pages: {self.changes['added']} added, {self.changes['updated']} updated, "
+              f"{self.changes['removed']} removed, {self.changes['skipped']} skipped ===")
+        print(f"=== Chunks: {self.chunks_embedded} embedded, {self.chunks_removed} deleted, "
+              f"{self.duplicates_skipped} near-duplicates not embedded ===")
+        print(f"  [OK] Manifest saved to {self.manifest_path}")
+
+        total_chunks = self.collection.count()
+        summary = {
+            "total_chunks": total_chunks,
+            "core_docs": len(list(self.core_dir.glob("*.pdf"))),
+            "module_docs": len(list(self.modules_dir.glob("*.pdf"))),
+            "embedding_model": self.embedding_model,
+            "chunk_size": self.chunk_size,
+            "pages": self.changes,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_removed": self.chunks_removed,
+            "near_duplicates": {
+                "threshold": self.near_duplicate_threshold,
+                "skipped": self.duplicates_skipped,
+                "promoted": self.duplicates_promoted,
+                "total": self.dedup.duplicate_total() if self.dedup else None
+            },
+            "embedding_retries": self.embedder.retries,
+            "embedding_store": self.embedding_store.stats() if self.embedding_store else None,
+            "extraction": {
+                "workers": self.workers,
+                "files": sorted(self.file_timings, key=lambda t: t["seconds"], reverse=True)
+            }
+        }
 
-        print("\n=== Processing Module Documents ===")
-        for pdf_file in self.modules_dir.glob("*.pdf"):
-            chunks = self.extract_text_from_pdf(pdf_file, "module")
-            all_chunks.extend(chunks)
+        if not self.chunks_embedded and not self.chunks_removed and not self.duplicates_skipped:
+            print("\n=== Nothing changed - indexes left as they are ===")
+            return self._write_summary(summary)
 
-        print(f"\n=== Total Chunks: {len(all_chunks)} ===")
+        indexes_start = time.perf_counter()
+        partitions_path = os.getenv("PARTITIONS_PATH", DEFAULT_PARTITIONS_PATH)
+        self.partitions.save(partitions_path)
+        print(f"  [OK] Partition registry saved to {partitions_path}")
 
-        # Batch process embeddings
-        print("\n=== Generating Embeddings ===")
-        batch_size = 100
+        # The lexical indexes cover the whole corpus, not just this run's pages
+        all_chunks = self._load_corpus_chunks()
 
-        for i in range(0, len(all_chunks), batch_size):
-            batch = all_chunks[i:i + batch_size]
-            texts = [chunk["text"] for chunk in batch]
+        # Tokenize once for the lexical side of hybrid search
+        print("\n=== Building BM25 Index ===")
+        bm25_path = os.getenv("BM25_INDEX_PATH", DEFAULT_INDEX_PATH)
+        BM25Index.build(all_chunks).save(bm25_path)
+        print(f"  [OK] Saved BM25 index to {bm25_path}")
 
-            print(f"Processing batch {i//batch_size + 1}/{(len(all_chunks) + batch_size - 1)//batch_size}")
-            embeddings = self.get_embeddings(texts)
+        # Word trigrams for locating quotes that are not in the passages they cite
+        quote_index_path = os.getenv("QUOTE_INDEX_PATH", DEFAULT_QUOTE_INDEX_PATH)
+        QuoteIndex.build(all_chunks).save(quote_index_path)
+        print(f"  [OK] Saved quote index to {quote_index_path}")
 
-            # Add to ChromaDB
-            self.collection.add(
-                ids=[chunk["id"] for chunk in batch],
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=[chunk["metadata"] for chunk in batch]
-            )
+        # Precompute module-to-core alignment for /cross_reference
+        print("\n=== Building Alignment Table ===")
+        try:
+            table_path = os.getenv("ALIGNMENT_TABLE_PATH", DEFAULT_TABLE_PATH)
+            AlignmentTable.build(self.collection).save(table_path)
+            print(f"  [OK] Saved alignment table to {table_path}")
+        except ValueError as e:
+            print(f"  [SKIP] {e}")
+
+        # Refresh the memory-mapped export used by VECTOR_BACKEND=mmap
+        index_dir = os.getenv("VECTOR_INDEX_DIR", DEFAULT_VECTOR_INDEX_DIR)
+        exported = export_collection(
+            self.collection, index_dir,
+            quantization=os.getenv("VECTOR_QUANTIZATION") or None,
+            compact_dimensions=int(os.getenv("VECTOR_COMPACT_DIMENSIONS", 0))
+        )
+        print(f"  [OK] Exported {exported} vectors to {index_dir}")
 
-        print("\n=== Ingestion Complete ===")
-        print(f"Total documents in collection: {self.collection.count()}")
+        # Invalidate cached answers built on the previous corpus
+        version = bump_corpus_version(
+            os.getenv("CORPUS_VERSION_PATH", DEFAULT_VERSION_PATH),
+            total_chunks=total_chunks
+        )
+        print(f"  [OK] Corpus version {version}")
+        self.profile.add("indexes", time.perf_counter() - indexes_start)
 
-        # Save summary
-        summary = {
-            "total_chunks": len(all_chunks),
-            "core_docs": len(list(self.core_dir.glob("*.pdf"))),
-            "module_docs": len(list(self.modules_dir.glob("*.pdf"))),
-            "embedding_model": self.embedding_model,
-            "chunk_size": self.chunk_size
-        }
+        print("\n=== Ingestion Complete ===")
+        print(f"Total documents in collection: {total_chunks}")
+        return self._write_summary(summary)
+
+    def _write_summary(self, summary: Dict) -> Dict:
+        """Add the run's profile and save ingestion_summary.json"""
+        summary["profile"] = self.profile.report(
+            self.embedding_model,
+            pages=sum(t["pages"] for t in self.file_timings),
+            chunks=self.chunks_embedded
+        )
+        stages = summary["profile"]["stages"]
+        print(f"  [OK] {summary['profile']['wall_seconds']:.2f}s: " + ", ".join(
+            f"{stage} {stages[stage]['seconds']:.2f}s" for stage in stages
+        ) + f"; {summary['profile']['embedding']['tokens']} tokens embedded")
 
         with open("ingestion_summary.json", "w") as f:
             json.dump(summary, f, indent=2)
-
         return summary
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest new and changed MPP PDFs")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-embed every page instead of only new or changed ones")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for PDF text extraction (default: INGEST_WORKERS or CPU count)")
+    parser.add_argument("--compare", nargs="+", metavar="SUMMARY",
+                        help="Diff a baseline ingestion_summary.json against another (default: "
+                             "ingestion_summary.json) instead of ingesting; exits 1 on a regression")
+    parser.add_argument("--max-slowdown", type=float, default=0.2,
+                        help="With --compare, the relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        if len(args.compare) > 2:
+            parser.error("--compare takes a baseline and at most one other summary")
+        baseline_path, current_path = (args.compare + ["ingestion_summary.json"])[:2]
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        with open(current_path) as f:
+            current = json.load(f)
+        rows = compare_summaries(baseline, current, args.max_slowdown)
+        print_comparison(rows, baseline_path, current_path)
+        raise SystemExit(1 if any(row["regression"] for row in rows) else 0)
+
     # Adjust paths to parent directories
     core_dir = "../Core"
     modules_dir = "../Modules"
 
-    ingestion = PDFIngestion(core_dir, modules_dir)
-    summary = ingestion.ingest_documents()
+    ingestion = PDFIngestion(core_dir, modules_dir, workers=args.workers)
+    summary = ingestion.ingest_documents(full=args.full)
 
     print("\n" + "="*50)
     print("Summary:")
@@ -0,0 +1,192 @@
+"""
+Ingestion Profile for MPP RAG System
+Time per ingestion stage, throughput, embedding tokens and cost, and peak memory for a
+run, plus a diff of two runs' ingestion_summary.json to catch slowdowns before a release
+"""
+
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+
+STAGES = ["extraction", "chunking", "embedding", "db_write", "indexes"]
+
+# USD per million input tokens; EMBEDDING_PRICE_PER_MTOK overrides (e.g. for a negotiated rate)
+EMBEDDING_PRICES = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10
+}
+
+# (summary path, which direction is better); only time, throughput and memory count as regressions
+COMPARED_METRICS = [
+    ("profile.wall_seconds", "lower"),
+    *[(f"profile.stages.{stage}.seconds", "lower") for stage in STAGES],
+    ("profile.pages_per_second", "higher"),
+    ("profile.chunks_per_second", "higher"),
+    ("profile.peak_rss_mb.ingest", "lower"),
+    ("profile.peak_rss_mb.extraction_workers", "lower"),
+    ("profile.embedding.tokens", None),
+    ("profile.embedding.estimated_cost_usd", None),
+    ("embedding_retries", None),
+    ("chunks_embedded", None),
+    ("total_chunks", None)
+]
+MIN_SECONDS_CHANGE = 1.0  # Shorter stages are too noisy to flag on a ratio alone
+
+def embedding_price(model: str) -> Optional[float]:
+    override = os.getenv("EMBEDDING_PRICE_PER_MTOK")
+    if override:
+        return float(override)
+    return EMBEDDING_PRICES.get(model)
+
+def _windows_peak_rss_mb() -> Optional[float]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in [
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage"
+            ]
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / 1e6
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the calling process so far (None where it cannot be read)"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            return _windows_peak_rss_mb()
+        except (AttributeError, OSError):
+            return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1e6 if sys.platform == "darwin" else 1e3
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+
+class IngestProfile:
+    """
+    Seconds the ingesting thread spends in each stage
+
+    Stages nest exclusively: time in an inner stage is not also charged to the outer one.
+    Stages overlap with work elsewhere (extraction workers, embedding requests in flight),
+    so these add up to at most the wall time; worker and request totals are kept apart.
+    stage() is for the ingesting thread only; record_request() may be called from any thread.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.worker_seconds = {"extraction": 0.0, "chunking": 0.0}
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.tokens = 0
+        self.worker_peak_rss_mb: Optional[float] = None  # Largest peak reported by an extraction worker
+        self._stack: List[str] = []
+        self._since = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._since
+        self._stack.append(name)
+        self._since = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.seconds[self._stack.pop()] += now - self._since
+            self._since = now
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] += seconds
+
+    def record_request(self, tokens: int, seconds: float):
+        """One successful embedding request"""
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+            self.request_seconds += seconds
+
+    def report(self, model: str, pages: int, chunks: int) -> Dict:
+        """The "profile" section of ingestion_summary.json"""
+        wall = time.perf_counter() - self.start
+        price = embedding_price(model)
+        ingest_rss = peak_rss_mb()
+        stages = {stage: {"seconds": round(seconds, 3)} for stage, seconds in self.seconds.items()}
+        for stage, seconds in self.worker_seconds.items():
+            stages[stage]["worker_seconds"] = round(seconds, 3)
+        stages["embedding"]["request_seconds"] = round(self.request_seconds, 3)
+
+        return {
+            "wall_seconds": round(wall, 3),
+            "stages": stages,
+            "pages_per_second": round(pages / wall, 2) if wall else 0.0,
+            "chunks_per_second": round(chunks / wall, 2) if wall else 0.0,
+            "embedding": {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "price_per_mtok": price,
+                "estimated_cost_usd": round(self.tokens / 1e6 * price, 4) if price is not None else None
+            },
+            "peak_rss_mb": {
+                "ingest": round(ingest_rss, 1) if ingest_rss else None,
+                "extraction_workers": round(self.worker_peak_rss_mb, 1) if self.worker_peak_rss_mb else None
+            }
+        }
+
+def _lookup(summary: Dict, path: str):
+    value = summary
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def compare_summaries(baseline: Dict, current: Dict, max_slowdown: float = 0.2) -> List[Dict]:
+    """
+    Metric-by-metric change between two ingestion summaries
+
+    A row is a regression when a time, throughput or memory metric got worse by more than
+    max_slowdown (0.2 = 20%); a time (for throughput, the wall time) must also change by
+    at least MIN_SECONDS_CHANGE.
+    """
+    old_wall, new_wall = _lookup(baseline, "profile.wall_seconds"), _lookup(current, "profile.wall_seconds")
+    wall_change = abs(new_wall - old_wall) if old_wall is not None and new_wall is not None else 0.0
+    rows = []
+    for path, better in COMPARED_METRICS:
+        old, new = _lookup(baseline, path), _lookup(current, path)
+        if old is None and new is None:
+            continue
+        change = (new - old) / old if old and new is not None else None
+        worse = change is not None and better is not None and (
+            change > max_slowdown if better == "lower" else change < -max_slowdown
+        )
+        if worse and path.endswith("seconds") and abs(new - old) < MIN_SECONDS_CHANGE:
+            worse = False
+        if worse and path.endswith("per_second") and wall_change < MIN_SECONDS_CHANGE:
+            worse = False
+        rows.append({"metric": path, "baseline": old, "current": new, "change": change, "regression": worse})
+    return rows
+
+def print_comparison(rows: List[Dict], baseline_path: str, current_path: str):
+    print(f"Ingestion profile: {baseline_path} -> {current_path}")
+    print(f"  {'metric':<42} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row['change'] is not None else "-"
+        flag = "  [WARN] regression" if row['regression'] else ""
+        print(f"  {row['metric']:<42} {str(row['baseline']):>12} {str(row['current']):>12} {change:>9}{flag}")
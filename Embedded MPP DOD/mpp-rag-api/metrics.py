@@ -0,0 +1,123 @@
+"""
+Metrics for MPP RAG System
+Per-stage latency histograms and token counters, rendered in Prometheus text format
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-request stage timings (ms), set by endpoints that report a timing breakdown
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: Tuple, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms; gauges are supplied at render time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, list]] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str):
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            # [count per bucket..., sum, count]
+            state = series.setdefault(key, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in series.items():
+                    for i, bound in enumerate(LATENCY_BUCKETS):
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': str(bound)})} {state[i]}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+
+        for name, (help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+registry.histogram("rag_stage_duration_seconds", "Latency of one pipeline stage (embedding, vector_query, vector_get, rerank, page_store, llm, citations)")
+registry.histogram("rag_request_duration_seconds", "End-to-end HTTP request latency by endpoint")
+registry.counter("rag_requests_total", "HTTP requests by endpoint and status code")
+registry.counter("rag_rerank_total", "Second-stage rerank calls by outcome (reranked, or fallback past the time budget)")
+registry.counter("rag_tokens_total", "Tokens reported by OpenAI, by stage and kind (prompt/completion)")
+
+@contextmanager
+def time_stage(stage: str):
+    """Record a stage's latency in the histogram and in the current request's breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("rag_stage_duration_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 2)
+
+def record_tokens(stage: str, usage):
+    """Count prompt/completion tokens from an OpenAI usage object (absent on streamed responses)"""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt:
+        registry.inc("rag_tokens_total", prompt, stage=stage, kind="prompt")
+    if completion:
+        registry.inc("rag_tokens_total", completion, stage=stage, kind="completion")
+
+def start_request_timings() -> Dict[str, float]:
+    """Begin collecting a per-stage timing breakdown (ms) for the current request"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
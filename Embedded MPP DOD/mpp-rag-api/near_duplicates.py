@@ -0,0 +1,156 @@
+"""
+Near-Duplicate Chunks for MPP RAG System
+MinHash signatures banded into LSH buckets, so repeated boilerplate (navigation text,
+"CONTINUE" screens, quoted regulations) is embedded once and its other pages are kept
+as metadata on the one chunk that is
+"""
+
+import json
+import zlib
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from citations import WORD_PATTERN
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16  # 4 rows each: pairs above ~0.5 Jaccard share a bucket, and are then checked
+ROWS = NUM_PERM // BANDS
+PRIME = 4294967311  # First prime above 2**32, the range of crc32
+
+# Fixed seed - signatures are recomputed every run and must match the previous run's
+_rng = np.random.RandomState(7919)
+_A = _rng.randint(1, 2 ** 31, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31, NUM_PERM).astype(np.uint64)
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature over the word 5-grams of text (lowercased, punctuation ignored)"""
+    words = [w.lower() for w in WORD_PATTERN.findall(text)]
+    shingles = {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # a < 2**31 and hash < 2**32, so a * hash + b cannot overflow uint64
+    return ((np.outer(hashes, _A) + _B) % PRIME).min(axis=0)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float(np.mean(a == b))
+
+class NearDuplicateIndex:
+    """
+    Representative chunks by doc_type and signature, and the near-duplicates listed under each
+
+    Only copies within one doc_type are folded together, so every module page stays
+    searchable (and partitioned) as a module even when it repeats core text. A chunk that
+    is indexed stays the representative of its group: nothing embedded is ever deleted
+    for being a duplicate. duplicate_of[chunk_id] = [representative_id, document, page] is
+    the ingest manifest's own dict; a representative_id of None marks an orphan whose
+    representative was deleted and which has to be placed again.
+    """
+
+    def __init__(self, threshold: float = 0.9, duplicate_of: Optional[Dict[str, List]] = None):
+        self.threshold = threshold
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.doc_types: Dict[str, str] = {}
+        self.buckets: Dict[Tuple[str, int, bytes], set] = {}
+        self.duplicate_of: Dict[str, List] = duplicate_of if duplicate_of is not None else {}
+        self.members: Dict[str, set] = {}
+        for chunk_id, (representative_id, _, _) in self.duplicate_of.items():
+            if representative_id is not None:
+                self.members.setdefault(representative_id, set()).add(chunk_id)
+        self.changed: set = set()  # Representatives whose duplicate list changed since the last write
+
+    @classmethod
+    def from_collection(cls, collection, threshold: float = 0.9,
+                        duplicate_of: Optional[Dict[str, List]] = None) -> "NearDuplicateIndex":
+        index = cls(threshold, duplicate_of)
+        data = collection.get(include=["documents", "metadatas"])
+        for chunk_id, text, meta in zip(data['ids'], data['documents'], data['metadatas']):
+            index.add_representative(chunk_id, minhash(text), meta["doc_type"])
+        index.changed = set()
+        return index
+
+    def _bands(self, doc_type: str, signature: np.ndarray):
+        for band in range(BANDS):
+            yield doc_type, band, signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def find(self, signature: np.ndarray, doc_type: str) -> Optional[str]:
+        """The most similar representative of the same doc_type at or above the threshold, if any"""
+        candidates = set()
+        for key in self._bands(doc_type, signature):
+            candidates |= self.buckets.get(key, set())
+
+        best, best_score = None, self.threshold
+        for chunk_id in sorted(candidates):
+            score = similarity(signature, self.signatures[chunk_id])
+            if score >= best_score:
+                best, best_score = chunk_id, score
+        return best
+
+    def _unlist(self, chunk_id: str):
+        """Take a chunk off the duplicate list it is on"""
+        entry = self.duplicate_of.pop(chunk_id, None)
+        if entry is not None and entry[0] is not None:
+            self.members[entry[0]].discard(chunk_id)
+            self.changed.add(entry[0])
+
+    def _drop_signature(self, chunk_id: str):
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is not None:
+            for key in self._bands(self.doc_types.pop(chunk_id), signature):
+                self.buckets[key].discard(chunk_id)
+
+    def add_representative(self, chunk_id: str, signature: np.ndarray, doc_type: str):
+        """Index a chunk; chunks already listed under its id (by an interrupted run) stay listed"""
+        self._unlist(chunk_id)
+        self._drop_signature(chunk_id)
+        self.signatures[chunk_id] = signature
+        self.doc_types[chunk_id] = doc_type
+        for key in self._bands(doc_type, signature):
+            self.buckets.setdefault(key, set()).add(chunk_id)
+
+    def add_duplicate(self, chunk_id: str, representative_id: str, document: str, page: int):
+        """List a chunk under a representative; chunks listed under it (by an interrupted run) move along"""
+        self._unlist(chunk_id)
+        moved = self.members.pop(chunk_id, set())
+        for member in moved:
+            self.duplicate_of[member][0] = representative_id
+        self.duplicate_of[chunk_id] = [representative_id, document, page]
+        self.members.setdefault(representative_id, set()).update(moved | {chunk_id})
+        self.changed.add(representative_id)
+
+    def forget(self, chunk_id: str) -> bool:
+        """
+        Drop a chunk that is being deleted or re-chunked
+
+        Returns True if it was a duplicate (never indexed). Chunks it represented become orphans.
+        """
+        if chunk_id in self.duplicate_of:
+            self._unlist(chunk_id)
+            return True
+        self._drop_signature(chunk_id)
+        for member in self.members.pop(chunk_id, set()):
+            self.duplicate_of[member][0] = None
+        return False
+
+    def orphans(self) -> List[List]:
+        """[chunk_id, document, page] of each duplicate whose representative is not indexed"""
+        return [
+            [chunk_id, document, page]
+            for chunk_id, (representative_id, document, page) in self.duplicate_of.items()
+            if representative_id not in self.signatures
+        ]
+
+    def metadata(self, representative_id: str) -> Dict:
+        """Chunk metadata fields for a representative (ChromaDB metadata values must be scalars)"""
+        duplicates = sorted([d, *self.duplicate_of[d][1:]] for d in self.members.get(representative_id, ()))
+        return {"duplicate_count": len(duplicates), "duplicates": json.dumps(duplicates)}
+
+    def duplicate_total(self) -> int:
+        return len(self.duplicate_of)
+
+def duplicate_locations(metadata: Dict) -> List[Dict]:
+    """Other (document, page) locations of a chunk's text, from its metadata"""
+    locations = dict.fromkeys((document, page) for _, document, page in json.loads(metadata.get("duplicates") or "[]"))
+    return [{"document": document, "page": page} for document, page in locations]
@@ -0,0 +1,120 @@
+"""
+SQLite Page Store for MPP RAG System
+Verbatim page text and chunk offsets keyed by (document, page), for /extract reads that
+do not need the vector store
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+DEFAULT_PAGE_STORE_PATH = "./page_store.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    document TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    doc_type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (document, page)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    start_word INTEGER NOT NULL,
+    end_word INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_page ON chunks(document, page);
+"""
+
+class PageStore:
+    """One SQLite connection per thread; writes come only from ingestion"""
+
+    def __init__(self, path: str = DEFAULT_PAGE_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        if not hasattr(self._local, "db"):
+            self._local.db = sqlite3.connect(self.path)
+        return self._local.db
+
+    def replace_document(self, document: str, doc_type: str, pages: List[Tuple[int, str]],
+                         chunks: List[Dict]):
+        """
+        Replace everything stored for a document
+
+        pages: [(page, text)]; chunks: [{"id", "page", "chunk_index", "start_word", "end_word"}]
+        """
+        with self._connection() as db:
+            db.execute("DELETE FROM pages WHERE document = ?", (document,))
+            db.execute("DELETE FROM chunks WHERE document = ?", (document,))
+            db.executemany(
+                "INSERT INTO pages (document, page, doc_type, text) VALUES (?, ?, ?, ?)",
+                [(document, page, doc_type, text) for page, text in pages]
+            )
+            db.executemany(
+                "INSERT INTO chunks (id, document, page, chunk_index, start_word, end_word) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(c["id"], document, c["page"], c["chunk_index"], c["start_word"], c["end_word"])
+                 for c in chunks]
+            )
+
+    def delete_document(self, document: str):
+        with self._connection() as db:
+            db.execute("DELETE FROM pages WHERE document = ?", (document,))
+            db.execute("DELETE FROM chunks WHERE document = ?", (document,))
+
+    def has_document(self, document: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM pages WHERE document = ? LIMIT 1", (document,)
+        ).fetchone()
+        return row is not None
+
+    def get_pages(self, document: str, first_page: Optional[int] = None,
+                  last_page: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Pages of a document in page order, optionally within first_page..last_page (inclusive)"""
+        query = "SELECT page, doc_type, text FROM pages WHERE document = ?"
+        params: list = [document]
+        if first_page is not None:
+            query += " AND page >= ?"
+            params.append(first_page)
+        if last_page is not None:
+            query += " AND page <= ?"
+            params.append(last_page)
+        query += " ORDER BY page"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        return [
+            {"document": document, "page": page, "doc_type": doc_type, "text": text}
+            for page, doc_type, text in self._connection().execute(query, params)
+        ]
+
+    def chunk_offsets(self, document: str, page: int) -> List[Dict]:
+        """Word offsets of each chunk on a page, for mapping chunks back to page text"""
+        rows = self._connection().execute(
+            "SELECT id, chunk_index, start_word, end_word FROM chunks "
+            "WHERE document = ? AND page = ? ORDER BY chunk_index",
+            (document, page)
+        ).fetchall()
+        return [
+            {"id": r[0], "chunk_index": r[1], "start_word": r[2], "end_word": r[3]}
+            for r in rows
+        ]
+
+def load_page_store(path: Optional[str] = None) -> Optional[PageStore]:
+    """Open the page store if ingestion has built one"""
+    path = path or os.getenv("PAGE_STORE_PATH", DEFAULT_PAGE_STORE_PATH)
+    if not Path(path).exists():
+        print(f"[WARN] Page store not found at {path} - /extract will read pages from the vector store")
+        return None
+    return PageStore(path)
@@ -0,0 +1,178 @@
+"""
+Partitioned Vector Collections for MPP RAG System
+One physical ChromaDB collection per doc_type (and optionally per document), so filtered
+queries search a whole index instead of post-filtering the shared one
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_PARTITIONS_PATH = "./partitions.json"
+BASE_COLLECTION = "mpp_documents"
+
+def doc_type_partition(doc_type: str) -> str:
+    return f"{BASE_COLLECTION}_{doc_type}"
+
+def document_partition(document: str) -> str:
+    # Collection names must be short and alphanumeric; PDF names are neither
+    return f"{BASE_COLLECTION}_doc_{hashlib.md5(document.encode()).hexdigest()[:16]}"
+
+class PartitionWriter:
+    """Used by ingestion to mirror every batch into its partition collections"""
+
+    def __init__(self, chroma_client, by_document: bool = False):
+        self.chroma_client = chroma_client
+        self.by_document = by_document
+        self.registry: Dict[str, Dict[str, str]] = {"doc_type": {}, "document": {}}
+        self._collections = {}
+
+    def _collection(self, name: str):
+        if name not in self._collections:
+            self._collections[name] = self.chroma_client.get_or_create_collection(
+                name=name,
+                metadata={"description": "DoD Mentor-Protege Program Documentation (partition)"}
+            )
+        return self._collections[name]
+
+    def _group(self, field: str, metadatas: List[Dict]) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(meta[field], []).append(i)
+        return groups
+
+    def write(self, method: str, ids: List[str], embeddings: List, documents: List[str], metadatas: List[Dict]):
+        """Call collection.<method> (add/upsert) on each partition with its rows of the batch"""
+        fields = [("doc_type", doc_type_partition)]
+        if self.by_document:
+            fields.append(("document", document_partition))
+
+        for field, name_for in fields:
+            for value, rows in self._group(field, metadatas).items():
+                name = name_for(value)
+                self.registry[field][value] = name
+                getattr(self._collection(name), method)(
+                    ids=[ids[i] for i in rows],
+                    embeddings=[embeddings[i] for i in rows],
+                    documents=[documents[i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows]
+                )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Replace the metadata of chunks already written to their partitions"""
+        fields = [("doc_type", doc_type_partition)]
+        if self.by_document:
+            fields.append(("document", document_partition))
+
+        for field, name_for in fields:
+            for value, rows in self._group(field, metadatas).items():
+                self._collection(name_for(value)).update(
+                    ids=[ids[i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows]
+                )
+
+    def delete(self, ids: List[str], doc_type: str, document: str):
+        """Remove chunks of one document from every partition that may hold them"""
+        names = [doc_type_partition(doc_type), document_partition(document)]
+        for name in names:
+            try:
+                collection = self._collections.get(name) or self.chroma_client.get_collection(name=name)
+            except Exception:
+                # Partition never built, e.g. PARTITION_BY_DOCUMENT was off (ValueError in
+                # chromadb 0.4, NotFoundError in later releases)
+                continue
+            collection.delete(ids=ids)
+
+    def save(self, path: str = DEFAULT_PARTITIONS_PATH):
+        # Keep partitions registered by earlier runs that this run did not touch
+        existing = load_registry(path) or {"doc_type": {}, "document": {}}
+        for field in self.registry:
+            existing.setdefault(field, {}).update(self.registry[field])
+        with open(path, "w") as f:
+            json.dump(existing, f, indent=2)
+
+def load_registry(path: str = DEFAULT_PARTITIONS_PATH) -> Optional[Dict]:
+    if not Path(path).exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+class PartitionedCollection:
+    """
+    Query router with the collection API the server uses
+
+    where={"doc_type": X} (or a document equality, when per-document partitions exist)
+    goes to that partition with no filter, so it returns exactly n_results. Unfiltered
+    queries fan out to every doc_type partition in parallel and merge by distance.
+    Everything else falls through to the shared collection.
+    """
+
+    def __init__(self, chroma_client, base_collection, registry: Dict):
+        self.base = base_collection
+        self.partitions = {
+            field: {value: chroma_client.get_collection(name=name) for value, name in names.items()}
+            for field, names in registry.items()
+        }
+        self._fan_out = ThreadPoolExecutor(max_workers=max(1, len(self.partitions.get("doc_type", {}))))
+
+    def count(self) -> int:
+        return self.base.count()
+
+    def get(self, **kwargs) -> Dict:
+        return self.base.get(**kwargs)
+
+    def _route(self, where: Optional[Dict]):
+        """(partition, remaining filter) for a where clause, or (None, where)"""
+        if not where:
+            return None, None
+        clauses = where["$and"] if "$and" in where else [{k: v} for k, v in where.items()]
+
+        for field in ["document", "doc_type"]:
+            for clause in clauses:
+                value = clause.get(field)
+                if isinstance(value, dict):
+                    value = value.get("$eq") if set(value) == {"$eq"} else None
+                if isinstance(value, str) and value in self.partitions.get(field, {}):
+                    rest = [c for c in clauses if c is not clause]
+                    if not rest:
+                        return self.partitions[field][value], None
+                    return self.partitions[field][value], rest[0] if len(rest) == 1 else {"$and": rest}
+        return None, where
+
+    def query(self, query_embeddings: List, n_results: int = 10, where: Optional[Dict] = None, **kwargs) -> Dict:
+        partition, rest = self._route(where)
+        if partition is not None:
+            return partition.query(query_embeddings=query_embeddings, n_results=n_results, where=rest, **kwargs)
+
+        doc_type_partitions = list(self.partitions.get("doc_type", {}).values())
+        if where or not doc_type_partitions:
+            return self.base.query(query_embeddings=query_embeddings, n_results=n_results, where=where, **kwargs)
+
+        # No filter: search every doc_type partition in parallel and merge by distance
+        results = list(self._fan_out.map(
+            lambda p: p.query(query_embeddings=query_embeddings, n_results=n_results, **kwargs),
+            doc_type_partitions
+        ))
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q in range(len(query_embeddings)):
+            hits = [
+                (r['distances'][q][i], r['ids'][q][i], r['documents'][q][i], r['metadatas'][q][i])
+                for r in results for i in range(len(r['ids'][q]))
+            ]
+            hits.sort(key=lambda h: h[0])
+            hits = hits[:n_results]
+            merged["distances"].append([h[0] for h in hits])
+            merged["ids"].append([h[1] for h in hits])
+            merged["documents"].append([h[2] for h in hits])
+            merged["metadatas"].append([h[3] for h in hits])
+        return merged
+
+def partitioned_collection(chroma_client, base_collection, path: Optional[str] = None):
+    """Wrap the shared collection with partition routing if ingestion built partitions"""
+    registry = load_registry(path or os.getenv("PARTITIONS_PATH", DEFAULT_PARTITIONS_PATH))
+    if not registry or not registry.get("doc_type"):
+        return base_collection
+    return PartitionedCollection(chroma_client, base_collection, registry)
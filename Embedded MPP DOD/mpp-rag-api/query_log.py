@@ -0,0 +1,92 @@
+"""
+Query Log Recorder for MPP RAG System
+Opt-in, size-rotated JSONL log of anonymized request bodies, latencies and retrieved chunk
+ids - the traffic replay.py plays back
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+# Fields for the log line of the current request, filled in by the endpoint
+_current_entry: ContextVar[Optional[Dict]] = ContextVar("query_log_entry", default=None)
+
+# Personal data that shows up in free-text questions. Phone numbers need one consistent
+# separator so DFARS clause numbers ("252.232-7005") are left alone.
+REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"\b\d{3}-\d{2}-\d{4}\b"), "<ssn>"),
+    (re.compile(r"(?:\+?1[\s.-]?)?(?:\(\d{3}\)\s*\d{3}[\s.-]?\d{4}|\b\d{3}([\s.-])\d{3}\1\d{4})\b"), "<phone>"),
+]
+
+def anonymize(value: Any) -> Any:
+    """Redact emails, SSNs and phone numbers from every string in a request body"""
+    if isinstance(value, str):
+        for pattern, replacement in REDACTIONS:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, dict):
+        return {k: anonymize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v) for v in value]
+    return value
+
+class QueryLogRecorder:
+    """Appends one JSON line per request; rotates path -> path.1 -> ... -> path.<backups>"""
+
+    def __init__(self, path: str, max_bytes: int = 50_000_000, backups: int = 5):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._size = self.path.stat().st_size if self.path.exists() else 0
+        self.written = 0
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._size = 0
+
+    def write(self, entry: Dict):
+        line = json.dumps({**entry, "body": anonymize(entry.get("body"))}) + "\n"
+        with self._lock:
+            if self._size and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._size += len(line)
+            self.written += 1
+
+def start_entry() -> Dict:
+    """Begin collecting the log line for the current request"""
+    entry: Dict = {"ts": round(time.time(), 3)}
+    _current_entry.set(entry)
+    return entry
+
+def annotate(**fields):
+    """Add fields (body, retrieved_ids, ...) to the current request's log line, if recording"""
+    entry = _current_entry.get()
+    if entry is not None:
+        entry.update(fields)
+
+def recorder_from_env() -> Optional[QueryLogRecorder]:
+    """Recording is off unless QUERY_LOG_PATH is set"""
+    path = os.getenv("QUERY_LOG_PATH", "")
+    if not path:
+        return None
+    return QueryLogRecorder(
+        path,
+        max_bytes=int(os.getenv("QUERY_LOG_MAX_BYTES", 50_000_000)),
+        backups=int(os.getenv("QUERY_LOG_BACKUPS", 5))
+    )
@@ -0,0 +1,352 @@
+"""
+Query Log Replay for MPP RAG System
+Plays recorded traffic (QUERY_LOG_PATH) against the API and reports latency per endpoint,
+serves a stub OpenAI API so replays cost nothing, and diffs retrieved ids between runs
+
+    python replay.py stub --port 9100
+    OPENAI_BASE_URL=http://localhost:9100/v1 python api_server.py
+    python replay.py run query_log.jsonl --concurrency 16 --out run_a.jsonl
+    python replay.py diff run_a.jsonl run_b.jsonl
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_STUB_PORT = 9100
+
+# Stub OpenAI API
+
+def hash_embedding(text: str, dimensions: int) -> List[float]:
+    """Deterministic unit vector from the words of a text; similar texts get similar vectors"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else np.full(dimensions, dimensions ** -0.5)).tolist()
+
+def stub_answer(messages: List[Dict]) -> str:
+    """An answer that quotes and cites the first context passage, like a well-behaved model"""
+    prompt = messages[-1]["content"] if messages else ""
+    match = re.search(r"\[1\] Document: (.+?), Page: (\d+)\n(.+)", prompt)
+    if not match:
+        return "This information is not found in the provided documents."
+    document, page, text = match.groups()
+    quote = " ".join(text.split()[:12])
+    return f'According to {document} (page {page}) [1], "{quote}".'
+
+def create_stub_app(embedding_latency_ms: float, llm_latency_ms: float, token_interval_ms: float,
+                    dimensions: int, embedding_cache_path: Optional[str] = None):
+    """
+    OpenAI-compatible /v1/embeddings and /v1/chat/completions with fixed latencies
+
+    Embeddings come from an embedding cache file when it holds the text (real vectors,
+    so retrieval matches production), otherwise from hash_embedding. The file is opened
+    read-only, so pointing the stub at the live server's cache never changes it.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+    from embedding_cache import EmbeddingCache
+
+    app = FastAPI(title="Stub OpenAI API")
+    cache = EmbeddingCache(path=embedding_cache_path, read_only=True) if embedding_cache_path else None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+        await asyncio.sleep(embedding_latency_ms / 1000)
+        data = []
+        for i, text in enumerate(texts):
+            vector = cache.get(body["model"], text, body.get("dimensions") or 0) if cache else None
+            data.append({"object": "embedding", "index": i,
+                         "embedding": vector or hash_embedding(text, dimensions)})
+        tokens = sum(len(text.split()) for text in texts)
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        answer = stub_answer(body.get("messages", []))
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+        created = int(time.time())
+        await asyncio.sleep(llm_latency_ms / 1000)
+
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(answer) // 4,
+                          "total_tokens": prompt_tokens + len(answer) // 4}
+            }
+
+        async def chunks():
+            for word in answer.split(" "):
+                chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                         "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_interval_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+# Replay
+
+def read_records(paths: List[str]) -> List[Dict]:
+    """
+    JSONL records in file order (pass rotated logs oldest first: log.2 log.1 log)
+
+    Each record keeps "i", its position across all files, so a run that replayed only
+    some endpoints can still be diffed line for line against the log or another run.
+    """
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    record.setdefault("i", len(records))
+                    records.append(record)
+    return records
+
+def load_log(paths: List[str], endpoints: Optional[List[str]] = None) -> List[Dict]:
+    """Replayable query log entries, optionally only for some endpoints"""
+    return [
+        entry for entry in read_records(paths)
+        if entry.get("body") is not None and (not endpoints or entry.get("endpoint") in endpoints)
+    ]
+
+def retrieved_ids_from(endpoint: str, data: Dict):
+    if endpoint == "/query":
+        return data.get("metadata", {}).get("retrieved_ids")
+    if endpoint == "/query/batch":
+        return [
+            item["result"]["metadata"].get("retrieved_ids") if item.get("result") else None
+            for item in data.get("results", [])
+        ]
+    return None
+
+async def send(client, entry: Dict, bypass_cache: bool) -> Dict:
+    endpoint = entry["endpoint"]
+    body = dict(entry["body"])
+    if bypass_cache and endpoint in ("/query", "/query/stream"):
+        body["bypass_cache"] = True
+
+    start = time.perf_counter()
+    result = {"i": entry["i"], "endpoint": endpoint, "status": 0, "retrieved_ids": None}
+    try:
+        if endpoint.endswith("/stream"):
+            async with client.stream("POST", endpoint, json=body) as response:
+                result["status"] = response.status_code
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: ") and event == "done":
+                        result["retrieved_ids"] = json.loads(line[len("data: "):]).get("retrieved_ids")
+        else:
+            response = await client.post(endpoint, json=body)
+            result["status"] = response.status_code
+            if response.status_code == 200:
+                result["retrieved_ids"] = retrieved_ids_from(endpoint, response.json())
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+async def wait_until_ready(client, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"[ERROR] API not ready after {timeout:g}s")
+        await asyncio.sleep(0.5)
+
+async def replay(entries: List[Dict], base_url: str, concurrency: int, timeout: float = 120,
+                 bypass_cache: bool = False, ready_timeout: float = 60):
+    """Send every entry with at most `concurrency` in flight; returns (results, wall seconds)"""
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        await wait_until_ready(client, ready_timeout)
+        queue: asyncio.Queue = asyncio.Queue()
+        for entry in entries:
+            queue.put_nowait(entry)
+        results: List[Dict] = []
+
+        async def worker():
+            while not queue.empty():
+                results.append(await send(client, queue.get_nowait(), bypass_cache))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+        wall = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["i"])
+    return results, wall
+
+def summarize(results: List[Dict], wall_seconds: float) -> Dict[str, Dict]:
+    """p50/p95/p99 latency, error count and throughput per endpoint (and for all requests)"""
+    groups: Dict[str, List[Dict]] = {}
+    for r in results:
+        groups.setdefault(r["endpoint"], []).append(r)
+    groups["all"] = results
+
+    summary = {}
+    for endpoint, group in groups.items():
+        latencies = np.array([r["latency_ms"] for r in group])
+        summary[endpoint] = {
+            "requests": len(group),
+            "errors": sum(1 for r in group if not 200 <= r["status"] < 300),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+            "throughput_rps": round(len(group) / wall_seconds, 2) if wall_seconds else 0.0
+        }
+    return summary
+
+def print_summary(summary: Dict[str, Dict], wall_seconds: float, concurrency: int):
+    print(f"\nReplayed {summary['all']['requests']} requests in {wall_seconds:.1f}s at concurrency {concurrency}")
+    print(f"  {'endpoint':<26} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for endpoint, s in summary.items():
+        print(f"  {endpoint:<26} {s['requests']:>8} {s['errors']:>7} {s['p50_ms']:>9} "
+              f"{s['p95_ms']:>9} {s['p99_ms']:>9} {s['throughput_rps']:>8}")
+
+# Retrieval diff
+
+def _id_lists(record: Dict) -> List[Optional[List[str]]]:
+    """One ranked id list per question (batch entries hold one per question)"""
+    ids = record.get("retrieved_ids")
+    if ids and all(x is None or isinstance(x, list) for x in ids):
+        return ids
+    return [ids]
+
+def diff_runs(a: List[Dict], b: List[Dict], k: int = 5, worst: int = 10) -> Dict:
+    """
+    Compare the top-k retrieved ids of two runs (or a recorded log and a run) request by request
+
+    Jaccard overlap of the top-k sets, plus how often the lists are identical and
+    agree on the top hit. Requests without ids on both sides are skipped.
+    """
+    b_by_i = {r["i"]: r for r in b}
+    compared = []
+    for record in a:
+        other = b_by_i.get(record["i"])
+        if other is None:
+            continue
+        for q, (ids_a, ids_b) in enumerate(zip(_id_lists(record), _id_lists(other))):
+            if not ids_a or not ids_b:
+                continue
+            top_a, top_b = ids_a[:k], ids_b[:k]
+            compared.append({
+                "i": record["i"],
+                "question": q,
+                "endpoint": record.get("endpoint"),
+                "jaccard": len(set(top_a) & set(top_b)) / len(set(top_a) | set(top_b)),
+                "identical": top_a == top_b,
+                "top1_same": top_a[0] == top_b[0],
+                "only_a": [x for x in top_a if x not in top_b],
+                "only_b": [x for x in top_b if x not in top_a]
+            })
+
+    if not compared:
+        return {"compared": 0}
+    compared.sort(key=lambda c: c["jaccard"])
+    return {
+        "compared": len(compared),
+        "k": k,
+        "mean_jaccard": round(sum(c["jaccard"] for c in compared) / len(compared), 4),
+        "identical": round(sum(c["identical"] for c in compared) / len(compared), 4),
+        "top1_agreement": round(sum(c["top1_same"] for c in compared) / len(compared), 4),
+        "most_changed": [c for c in compared[:worst] if not c["identical"]]
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded queries, serve a stub OpenAI API, or diff runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stub = commands.add_parser("stub", help="Serve a stub OpenAI API (point OPENAI_BASE_URL at it)")
+    stub.add_argument("--port", type=int, default=DEFAULT_STUB_PORT)
+    stub.add_argument("--embedding-latency-ms", type=float, default=50)
+    stub.add_argument("--llm-latency-ms", type=float, default=800, help="Delay before the first token")
+    stub.add_argument("--token-interval-ms", type=float, default=10, help="Delay between streamed tokens")
+    stub.add_argument("--dimensions", type=int, default=int(os.getenv("EMBEDDING_DIMENSIONS", 0)) or 3072,
+                      help="Must match the indexed vectors")
+    stub.add_argument("--embedding-cache", help="Serve real vectors from this embedding cache file when present")
+
+    run = commands.add_parser("run", help="Replay a query log against a running API")
+    run.add_argument("logs", nargs="+", help="Query log files, oldest first")
+    run.add_argument("--base-url", default="http://localhost:8000")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--endpoints", nargs="*", help="Only replay these endpoints (e.g. /query /extract)")
+    run.add_argument("--limit", type=int, default=0, help="Replay only the first N entries")
+    run.add_argument("--bypass-cache", action="store_true", help="Skip the answer cache so every query retrieves")
+    run.add_argument("--timeout", type=float, default=120)
+    run.add_argument("--out", default="replay_results.jsonl", help="Per-request results, for diff")
+    run.add_argument("--report", help="Also write the latency summary as JSON")
+
+    diff = commands.add_parser("diff", help="Compare retrieved ids of two runs (or a log and a run)")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--k", type=int, default=5)
+    diff.add_argument("--worst", type=int, default=10, help="Most-changed requests to list")
+
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        import uvicorn
+        app = create_stub_app(args.embedding_latency_ms, args.llm_latency_ms, args.token_interval_ms,
+                              args.dimensions, args.embedding_cache)
+        print(f"Stub OpenAI API on http://localhost:{args.port}/v1 - start the server with "
+              f"OPENAI_BASE_URL=http://localhost:{args.port}/v1")
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+    elif args.command == "run":
+        entries = load_log(args.logs, args.endpoints)
+        if args.limit:
+            entries = entries[:args.limit]
+        if not entries:
+            raise SystemExit("[ERROR] No replayable entries in the log")
+
+        results, wall = asyncio.run(replay(entries, args.base_url, args.concurrency,
+                                           timeout=args.timeout, bypass_cache=args.bypass_cache))
+        with open(args.out, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+        summary = summarize(results, wall)
+        print_summary(summary, wall, args.concurrency)
+        print(f"\n[OK] Per-request results written to {args.out}")
+        if args.report:
+            Path(args.report).write_text(json.dumps(
+                {"concurrency": args.concurrency, "wall_seconds": round(wall, 3), "endpoints": summary}, indent=2
+            ))
+            print(f"[OK] Summary written to {args.report}")
+
+    else:
+        report = diff_runs(read_records([args.a]), read_records([args.b]), k=args.k, worst=args.worst)
+        if not report["compared"]:
+            raise SystemExit("[ERROR] No requests with retrieved ids on both sides")
+        print(f"Compared {report['compared']} retrievals (top {report['k']}):")
+        print(f"  mean Jaccard overlap  {report['mean_jaccard']:.4f}")
+        print(f"  identical top-k       {report['identical']:.2%}")
+        print(f"  same top hit          {report['top1_agreement']:.2%}")
+        for c in report["most_changed"]:
+            print(f"  #{c['i']}.{c['question']} {c['endpoint']} jaccard={c['jaccard']:.2f} "
+                  f"only_a={c['only_a']} only_b={c['only_b']}")
@@ -0,0 +1,237 @@
+"""
+Second-Stage Reranker for MPP RAG System
+Rescores the top fused candidates with a small linear model over first-stage, BM25 and
+term-proximity features - local, no LLM calls, within a hard time budget
+"""
+
+import os
+import json
+import time
+import heapq
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+from bm25_index import TOKEN_PATTERN
+
+DEFAULT_RERANKER_PATH = "./reranker.json"
+
+FEATURES = [
+    "vector_similarity",  # 1 - distance/2 (cosine on unit vectors)
+    "first_stage_rank",   # 1 / (1 + rank) in the fused order
+    "bm25",               # BM25 score relative to the best candidate
+    "term_coverage",      # idf-weighted share of query terms present
+    "proximity",          # matched terms / smallest window holding all of them
+    "bigram_match",       # share of query word pairs appearing verbatim
+    "clause_match",       # share of clause numbers ("252.232-7005") present
+]
+
+# Hand-set starting point (python reranker.py init); `train` replaces them with fitted ones
+DEFAULT_WEIGHTS = {
+    "vector_similarity": 2.0,
+    "first_stage_rank": 0.5,
+    "bm25": 1.0,
+    "term_coverage": 1.5,
+    "proximity": 1.0,
+    "bigram_match": 1.0,
+    "clause_match": 1.5,
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "in", "is", "it", "of", "on", "or", "the", "to", "what", "when", "which", "who", "with"
+}
+
+def _words(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _min_window(position_lists: List[List[int]]) -> int:
+    """Length of the smallest span holding one position from every list"""
+    heap = [(positions[0], i, 0) for i, positions in enumerate(position_lists)]
+    heapq.heapify(heap)
+    high = max(p for p, _, _ in heap)
+    best = high - heap[0][0] + 1
+    while True:
+        low, i, j = heapq.heappop(heap)
+        best = min(best, high - low + 1)
+        if j + 1 == len(position_lists[i]):
+            return best
+        nxt = position_lists[i][j + 1]
+        high = max(high, nxt)
+        heapq.heappush(heap, (nxt, i, j + 1))
+
+def feature_matrix(query: str, candidates: List[Dict], bm25_index=None,
+                   deadline: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    One row of FEATURES per candidate (hybrid_search result dicts, in first-stage order)
+
+    Returns None as soon as time.perf_counter() passes the deadline.
+    """
+    words = _words(query)
+    terms = list(dict.fromkeys(w for w in words if w not in STOPWORDS)) or list(dict.fromkeys(words))
+    bigrams = {(a, b) for a, b in zip(words, words[1:])}
+    clauses = {w for w in words if "." in w or "-" in w}
+    idf = {t: (bm25_index.idf(t) if bm25_index is not None else 1.0) or 0.1 for t in terms}
+    total_idf = sum(idf.values()) or 1.0
+
+    bm25 = (bm25_index.score_ids(query, [c['id'] for c in candidates])
+            if bm25_index is not None else np.zeros(len(candidates), dtype=np.float32))
+    best_bm25 = float(bm25.max()) if len(bm25) and bm25.max() > 0 else 1.0
+
+    rows = np.zeros((len(candidates), len(FEATURES)), dtype=np.float32)
+    for r, candidate in enumerate(candidates):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+
+        chunk_words = _words(candidate['text'])
+        positions: Dict[str, List[int]] = {}
+        for p, w in enumerate(chunk_words):
+            if w in idf:
+                positions.setdefault(w, []).append(p)
+
+        matched = [t for t in terms if t in positions]
+        proximity = 0.0
+        if len(matched) >= 2:
+            proximity = len(matched) / _min_window([positions[t] for t in matched])
+        elif matched:
+            proximity = 1.0 / len(terms)
+
+        chunk_bigrams = set(zip(chunk_words, chunk_words[1:])) if bigrams else set()
+        chunk_set = set(chunk_words) if clauses else set()
+
+        rows[r] = [
+            1.0 - candidate.get('distance', 2.0) / 2.0,
+            1.0 / (1 + r),
+            bm25[r] / best_bm25,
+            sum(idf[t] for t in matched) / total_idf,
+            proximity,
+            len(bigrams & chunk_bigrams) / len(bigrams) if bigrams else 0.0,
+            len(clauses & chunk_set) / len(clauses) if clauses else 0.0,
+        ]
+    return rows
+
+class LinearReranker:
+    """
+    score = bias + weights . features; falls back to first-stage order past budget_ms
+
+    budget_ms=None scores every candidate however long it takes (training and evaluation).
+    """
+
+    def __init__(self, weights: Dict[str, float], bias: float = 0.0, budget_ms: Optional[float] = 25.0):
+        self.weights = np.array([weights.get(name, 0.0) for name in FEATURES], dtype=np.float32)
+        self.bias = bias
+        self.budget_ms = budget_ms
+
+    def rerank(self, query: str, candidates: List[Dict], bm25_index=None) -> Optional[List[Dict]]:
+        """Candidates sorted by model score (with 'rerank_score' set), or None if over budget"""
+        deadline = time.perf_counter() + self.budget_ms / 1000 if self.budget_ms is not None else None
+        rows = feature_matrix(query, candidates, bm25_index, deadline)
+        if rows is None:
+            return None
+        scores = rows @ self.weights + self.bias
+        order = np.argsort(-scores, kind="stable")
+        reranked = []
+        for i in order:
+            candidates[i]['rerank_score'] = float(scores[i])
+            reranked.append(candidates[i])
+        return reranked
+
+    def save(self, path: str = DEFAULT_RERANKER_PATH, **details):
+        with open(path, "w") as f:
+            json.dump({
+                "features": FEATURES,
+                "weights": dict(zip(FEATURES, self.weights.tolist())),
+                "bias": self.bias,
+                **details
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RERANKER_PATH, budget_ms: float = 25.0) -> "LinearReranker":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["weights"], data.get("bias", 0.0), budget_ms)
+
+def load_reranker(path: Optional[str] = None) -> Optional[LinearReranker]:
+    """Load the model if one has been written (python reranker.py init / train)"""
+    path = path or os.getenv("RERANKER_PATH", DEFAULT_RERANKER_PATH)
+    if not Path(path).exists():
+        print(f"[WARN] Reranker not found at {path} - results keep first-stage order")
+        return None
+    return LinearReranker.load(path, budget_ms=float(os.getenv("RERANK_BUDGET_MS", 25)))
+
+def fit_logistic(features: np.ndarray, labels: np.ndarray, epochs: int = 500,
+                 learning_rate: float = 0.5, l2: float = 1e-3):
+    """Weights and bias of an L2-regularized logistic regression, by full-batch gradient descent"""
+    weights = np.zeros(features.shape[1], dtype=np.float64)
+    bias = 0.0
+    # Relevant chunks are rare among candidates - weight them up so they are not ignored
+    positive = labels.mean() if len(labels) else 0.5
+    sample_weight = np.where(labels == 1, 0.5 / max(positive, 1e-6), 0.5 / max(1 - positive, 1e-6))
+    for _ in range(epochs):
+        p = 1 / (1 + np.exp(-(features @ weights + bias)))
+        error = (p - labels) * sample_weight
+        weights -= learning_rate * (features.T @ error / len(labels) + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return dict(zip(FEATURES, weights.tolist())), float(bias)
+
+def precision_at(ranked_ids: List[List[str]], relevant: List[set], k: int = 3) -> float:
+    scores = [len(set(ids[:k]) & rel) / min(k, len(ids)) for ids, rel in zip(ranked_ids, relevant) if ids]
+    return sum(scores) / len(scores) if scores else 0.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write or train the second-stage reranker")
+    parser.add_argument("command", choices=["init", "train"])
+    parser.add_argument("labels", nargs="?",
+                        help='JSONL of {"question": ..., "relevant_ids": [...]} for train')
+    parser.add_argument("--path", default=os.getenv("RERANKER_PATH", DEFAULT_RERANKER_PATH))
+    parser.add_argument("--candidates", type=int, default=int(os.getenv("RERANK_CANDIDATES", 20)),
+                        help="First-stage candidates per question")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of questions kept for evaluation")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        LinearReranker(DEFAULT_WEIGHTS).save(args.path, trained_on=None)
+        print(f"[OK] Wrote default weights to {args.path}")
+        raise SystemExit(0)
+
+    if not args.labels:
+        parser.error("train needs a labels file")
+
+    import asyncio
+    import api_server
+
+    with open(args.labels) as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+
+    # First-stage candidates from the server's own pipeline, with reranking off
+    api_server.load_resources()
+    api_server.reranker = None
+    questions = [e["question"] for e in examples]
+    pools = asyncio.run(api_server.hybrid_search_many(questions, top_k=args.candidates))
+
+    rows, labels, first_stage, relevant = [], [], [], []
+    for example, pool in zip(examples, pools):
+        relevant.append(set(example["relevant_ids"]))
+        first_stage.append(pool)
+        rows.append(feature_matrix(example["question"], pool, api_server.bm25_index))
+        labels.append(np.array([c['id'] in relevant[-1] for c in pool], dtype=np.float64))
+
+    split = max(1, int(len(examples) * (1 - args.holdout))) if len(examples) > 1 else 1
+    weights, bias = fit_logistic(np.concatenate(rows[:split]), np.concatenate(labels[:split]))
+    # Unbudgeted, so the reranked score covers every held-out question and not a mix
+    # with first-stage fallbacks
+    model = LinearReranker(weights, bias, budget_ms=None)
+
+    evaluate = slice(split, None) if split < len(examples) else slice(None)
+    before = precision_at([[c['id'] for c in pool] for pool in first_stage[evaluate]], relevant[evaluate])
+    after = precision_at(
+        [[c['id'] for c in model.rerank(q, list(pool), api_server.bm25_index)]
+         for q, pool in zip(questions[evaluate], first_stage[evaluate])],
+        relevant[evaluate]
+    )
+    model.save(args.path, trained_on=len(examples[:split]), precision_at_3={"first_stage": before, "reranked": after})
+
+    label = "held-out" if split < len(examples) else "training"
+    print(f"[OK] Trained on {split} questions; precision@3 on {label} set: "
+          f"first stage {before:.3f} -> reranked {after:.3f}")
+    print(f"  Saved to {args.path}")
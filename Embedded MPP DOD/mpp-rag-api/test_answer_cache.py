@@ -0,0 +1,41 @@
+"""
+Tests for the answer cache
+"""
+
+import numpy as np
+from answer_cache import SemanticAnswerCache
+
+SCOPE = ("core", 5)
+# Embeddings of two questions one clause apart sit far above any useful threshold
+QUESTION = "Does DFARS 252.232-7003 apply to mentor firms?"
+NEAR = "Does DFARS 252.232-7004 apply to mentor firms?"
+VECTOR = np.linspace(1.0, 2.0, 16)
+NEAR_VECTOR = VECTOR + np.linspace(0.0, 0.05, 16)
+
+def cached(cache, question):
+    cache.store(question, VECTOR if question == QUESTION else NEAR_VECTOR, SCOPE, "v1",
+                {"answer": f"Answer to {question}"})
+
+def test_near_identical_question_gets_its_own_answer():
+    cache = SemanticAnswerCache()
+    cached(cache, QUESTION)
+
+    assert cache.lookup(NEAR, NEAR_VECTOR, SCOPE, "v1") is None
+    hit = cache.lookup(" Does DFARS  252.232-7003 apply to mentor firms?\n", VECTOR, SCOPE, "v1")
+    assert hit["response"]["answer"] == f"Answer to {QUESTION}"
+
+    cached(cache, NEAR)
+    assert cache.lookup(NEAR, NEAR_VECTOR, SCOPE, "v1")["response"]["answer"] == f"Answer to {NEAR}"
+    assert cache.lookup(QUESTION, VECTOR, SCOPE, "v1")["response"]["answer"] == f"Answer to {QUESTION}"
+
+def test_semantic_matching_is_opt_in():
+    cache = SemanticAnswerCache(semantic=True, threshold=0.92)
+    cached(cache, QUESTION)
+    assert cache.lookup(NEAR, NEAR_VECTOR, SCOPE, "v1")["question"] == QUESTION
+
+def test_scope_and_corpus_version_are_respected():
+    cache = SemanticAnswerCache()
+    cached(cache, QUESTION)
+    assert cache.lookup(QUESTION, VECTOR, ("module", 5), "v1") is None
+    assert cache.lookup(QUESTION, VECTOR, SCOPE, "v2") is None
+    assert cache.stats()["stale"] == 1
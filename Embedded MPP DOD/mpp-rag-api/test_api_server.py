@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+import api_server
+
+def test_empty_batch_is_rejected(monkeypatch):
+    monkeypatch.setitem(api_server.startup, "ready", True)
+    response = TestClient(api_server.app).post("/query/batch", json={"questions": []})
+    assert response.status_code == 422
+    assert api_server.request_limiter.in_flight == 0
+
+def test_oversized_batch_is_rejected(monkeypatch):
+    monkeypatch.setitem(api_server.startup, "ready", True)
+    questions = ["What is a protege?"] * (api_server.MAX_BATCH_SIZE + 1)
+    response = TestClient(api_server.app).post("/query/batch", json={"questions": questions})
+    assert response.status_code == 422
+
+def chunk(text):
+    return {"id": text, "text": text, "distance": 0.2,
+            "metadata": {"document": "MPP SOP", "page": 1, "doc_type": "core"}}
+
+def test_batch_item_failure_stays_in_its_item(monkeypatch):
+    async def search(questions, top_k, doc_type):
+        return [[chunk(q)] for q in questions]
+
+    async def answer(question, sources):
+        return f"Answer to {question} [1]"
+
+    def pack(sources):
+        if sources[0]["text"] == "bad":
+            raise ValueError("cannot pack")
+        return sources
+
+    monkeypatch.setitem(api_server.startup, "ready", True)
+    monkeypatch.setattr(api_server, "hybrid_search_many", search)
+    monkeypatch.setattr(api_server, "generate_answer", answer)
+    monkeypatch.setattr(api_server, "pack_context", pack)
+    response = TestClient(api_server.app).post("/query/batch", json={"questions": ["good", "bad"]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["result"]["answer"] == "Answer to good [1]"
+    assert results[1]["error"] == "cannot pack"
+
+class PagesOf:
+    def __init__(self, document):
+        self.document = document
+
+    def has_document(self, document):
+        return document == self.document
+
+    def get_pages(self, document, page, page_end):
+        return [{"document": document, "page": 1, "doc_type": "core", "text": "from the page store"}]
+
+class ChunkCollection:
+    def get(self, where, limit):
+        return {"documents": ["from the collection"], "metadatas": [{"document": "Module 3", "page": 2}]}
+
+def test_extract_falls_back_to_the_collection(monkeypatch):
+    monkeypatch.setitem(api_server.startup, "ready", True)
+    monkeypatch.setattr(api_server, "page_store", PagesOf("MPP SOP"))
+    monkeypatch.setattr(api_server, "collection", ChunkCollection())
+    client = TestClient(api_server.app)
+
+    stored = client.post("/extract", json={"document": "MPP SOP"}).json()
+    assert [e["text"] for e in stored["extracts"]] == ["from the page store"]
+    # Ingested before the page store existed
+    older = client.post("/extract", json={"document": "Module 3"}).json()
+    assert [e["text"] for e in older["extracts"]] == ["from the collection"]
@@ -0,0 +1,83 @@
+"""
+Tests for token-sized batching and retries of embedding requests
+"""
+
+import httpx
+import pytest
+import batch_embedder
+from openai import RateLimitError, BadRequestError
+from batch_embedder import BatchEmbedder, token_batches, retry_delay, parse_duration
+
+def api_error(error, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return error("error", response=httpx.Response(status, headers=headers or {}, request=request), body=None)
+
+def chunks(*sizes):
+    # estimate_tokens counts ~4 characters per token
+    return [{"id": f"c{i}", "text": "x" * (4 * size)} for i, size in enumerate(sizes)]
+
+def test_batches_split_on_tokens_and_inputs():
+    batches = list(token_batches(chunks(40, 40, 30, 90, 10), max_tokens=100, max_inputs=10))
+    assert [[c["id"] for c in b] for b in batches] == [["c0", "c1"], ["c2"], ["c3", "c4"]]
+
+    by_count = list(token_batches(chunks(*[1] * 5), max_tokens=100, max_inputs=2))
+    assert [len(b) for b in by_count] == [2, 2, 1]
+
+def test_oversized_chunk_gets_its_own_batch():
+    batches = list(token_batches(chunks(10, 500, 10), max_tokens=100))
+    assert [[c["id"] for c in b] for b in batches] == [["c0"], ["c1"], ["c2"]]
+
+def test_retry_delay_follows_rate_limit_headers():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert 2.0 <= retry_delay(api_error(RateLimitError, 429, {"retry-after-ms": "2000"}), 0) <= 2.25
+    exhausted = {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "1.5s",
+                 "x-ratelimit-remaining-requests": "12", "x-ratelimit-reset-requests": "30s"}
+    assert 1.5 <= retry_delay(api_error(RateLimitError, 429, exhausted), 0) <= 1.75
+    assert 0 <= retry_delay(api_error(RateLimitError, 429), 3, base_delay=1.0) <= 8
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    waits = []
+    monkeypatch.setattr(batch_embedder.time, "sleep", waits.append)
+    return waits
+
+def test_rate_limited_batch_is_retried_and_written_in_order(no_sleep):
+    failures = {"c2": 2}
+
+    def embed(texts):
+        first = texts[0]
+        if failures.get(first):
+            failures[first] -= 1
+            raise api_error(RateLimitError, 429, {"retry-after": "1"})
+        return [[float(len(t))] for t in texts]
+
+    batches = [[{"id": f"c{i}", "text": f"c{i}"}] for i in range(5)]
+    written = []
+    embedder = BatchEmbedder(embed, concurrency=3, max_retries=3)
+    assert embedder.run(batches, lambda batch, vectors: written.append(batch[0]["id"])) == 5
+
+    assert written == ["c0", "c1", "c2", "c3", "c4"]
+    assert embedder.retries == 2
+    assert len(no_sleep) == 2
+
+def test_batch_failing_past_max_retries_raises(no_sleep):
+    def embed(texts):
+        if texts == ["c1"]:
+            raise api_error(RateLimitError, 429)
+        return [[0.0] for _ in texts]
+
+    written = []
+    embedder = BatchEmbedder(embed, concurrency=1, max_retries=2)
+    with pytest.raises(RateLimitError):
+        embedder.run([[{"text": f"c{i}"}] for i in range(3)], lambda batch, vectors: written.append(batch[0]["text"]))
+    assert written == ["c0"]
+    assert embedder.retries == 2
+
+def test_request_errors_are_not_retried(no_sleep):
+    def embed(texts):
+        raise api_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        BatchEmbedder(embed).run([[{"text": "too long"}]], lambda batch, vectors: None)
+    assert no_sleep == []
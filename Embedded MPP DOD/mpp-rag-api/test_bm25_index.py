@@ -0,0 +1,53 @@
+"""
+Tests for the BM25 index and reciprocal-rank fusion with vector hits
+"""
+
+import asyncio
+import pytest
+import api_server
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    {"id": "sop-1", "text": "Mentors must comply with DFARS 252.232-7003 invoicing rules.",
+     "metadata": {"document": "MPP SOP", "page": 4, "doc_type": "core"}},
+    {"id": "sop-2", "text": "The agreement term is three years from approval.",
+     "metadata": {"document": "MPP SOP", "page": 5, "doc_type": "core"}},
+    {"id": "mod-1", "text": "Module three covers semi-annual reporting by mentors.",
+     "metadata": {"document": "Module 3", "page": 1, "doc_type": "module"}}
+]
+
+def test_fusion_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert fused["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62)
+    assert sorted(fused, key=fused.get, reverse=True) == ["a", "c", "b"]
+
+def test_agreement_beats_a_single_top_rank():
+    # Second in both lists outranks first in only one
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "b"]], k=60)
+    assert max(fused, key=fused.get) == "b"
+    assert reciprocal_rank_fusion([], k=60) == {}
+
+def test_clause_numbers_are_searchable_whole_and_in_parts():
+    assert tokenize("DFARS 252.232-7003") == ["dfars", "252.232-7003", "252", "232", "7003"]
+    index = BM25Index.build(CHUNKS)
+    assert [r["id"] for r in index.search("252.232-7003")] == ["sop-1"]
+    assert [r["id"] for r in index.search("mentors", doc_type="module")] == ["mod-1"]
+
+class VectorsFor:
+    def get(self, ids, include):
+        return {"ids": ids, "embeddings": [[0.0, 1.0] for _ in ids]}
+
+def test_keyword_only_hit_is_fused_and_given_a_distance(monkeypatch):
+    monkeypatch.setattr(api_server, "bm25_index", BM25Index.build(CHUNKS))
+    monkeypatch.setattr(api_server, "collection", VectorsFor())
+    semantic = [{"id": "sop-2", "text": CHUNKS[1]["text"], "metadata": CHUNKS[1]["metadata"], "distance": 0.3}]
+
+    fused = asyncio.run(api_server.fuse_with_keyword_results(
+        "DFARS 252.232-7003", [1.0, 0.0], semantic, top_k=2, doc_type=None
+    ))
+    assert sorted(r["id"] for r in fused) == ["sop-1", "sop-2"]
+    keyword_only = next(r for r in fused if r["id"] == "sop-1")
+    assert keyword_only["distance"] == pytest.approx(2.0)
+    assert keyword_only["rrf_score"] == pytest.approx(1 / (api_server.RRF_K + 1))
@@ -0,0 +1,62 @@
+"""
+Tests for quote extraction and citation verification
+"""
+
+import api_server
+from citations import extract_quotes, match_quote, verify_citations, word_spans
+
+SOP = ("Mentors must submit a semi-annual performance report to the OSBP office. "
+       "The agreement term is three years from the date of approval under DFARS 252.232-7003.")
+MODULE = "A protege firm may not have more than one active mentor-protege agreement at a time."
+
+def source(text, document="MPP SOP"):
+    return {"id": document, "text": text, "distance": 0.2,
+            "metadata": {"document": document, "page": 1, "doc_type": "core"}}
+
+def test_quote_takes_the_citations_of_its_sentence():
+    answer = 'Per the SOP [2], "the agreement term is three years". Reports are "semi annual performance report to" [1].'
+    quotes = extract_quotes(answer)
+    assert [q["citations"] for q in quotes] == [[2], [1]]
+    assert answer[quotes[0]["answer_start"]:quotes[0]["answer_end"]] == "the agreement term is three years"
+
+def test_exact_match_offsets_slice_the_passage():
+    match = match_quote(["under", "dfars", "252.232", "7003"], word_spans(SOP), threshold=0.6)
+    assert match["score"] == 1.0
+    assert SOP[match["start"]:match["end"]] == "under DFARS 252.232-7003"
+
+def test_fuzzy_match_tolerates_a_changed_word():
+    words = [w for w, _, _ in word_spans("must submit a semi annual performance report to the OSBP")]
+    words[3] = "quarterly"
+    match = match_quote(words, word_spans(SOP), threshold=0.3)
+    assert 0.3 <= match["score"] < 1.0
+    assert "performance report to the OSBP" in SOP[match["start"]:match["end"]]
+    assert match_quote(["nothing", "like", "this", "passage"], word_spans(SOP), threshold=0.3) is None
+
+def test_quote_citing_several_sources_needs_only_one():
+    answer = '"more than one active mentor-protege agreement" [1, 2].'
+    results, summary = verify_citations(answer, [source(SOP), source(MODULE, "Module 3")])
+    assert [r["verified"] for r in results] == [None, True]
+    assert summary["verified"] == 1
+
+def test_source_is_verified_only_if_every_quote_is_found():
+    found = '"the agreement term is three years" [1].'
+    missing = '"mentors may extend the term indefinitely" [1].'
+    results, summary = verify_citations(found + " " + missing, [source(SOP)])
+    assert results[0]["verified"] is False
+    assert (summary["verified"], summary["unverified"]) == (1, 1)
+
+    results, _ = verify_citations(missing + " " + found, [source(SOP)])
+    assert results[0]["verified"] is False
+
+    results, _ = verify_citations(found + ' "submit a semi-annual performance report" [1].', [source(SOP)])
+    assert results[0]["verified"] is True
+
+def test_match_offsets_point_into_the_returned_quote():
+    passage = "Filler sentence about the program. " * 20 + SOP
+    answer = 'The term is set: "three years from the date of approval" [1].'
+    citations, _ = verify_citations(answer, [source(passage), source(passage, "Module 3")])
+    quoted, unquoted = api_server.format_sources([source(passage), source(passage, "Module 3")], citations)
+
+    match = quoted.matches[0]
+    assert quoted.quote[match.start:match.end] == match.text == "three years from the date of approval"
+    assert len(unquoted.quote) == 503
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+import api_server
+from concurrency import BlockingExecutor, ConcurrencyLimiter, SlotStreamingResponse, request_key
+from metrics import start_request_timings, time_stage
+
+SCOPE = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "POST", "path": "/"}
+
+async def receive():
+    await asyncio.sleep(3600)
+
+# Newer Starlette re-raises a failed send as ClientDisconnect
+DISCONNECTED = (OSError, ClientDisconnect)
+
+async def disconnected_send(message):
+    """A client that went away before the first body chunk"""
+    if message["type"] == "http.response.body":
+        raise OSError("client disconnected")
+
+class FakePageStore:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_pages(self, document, page, page_end, limit):
+        return [p for p in self.pages if p['page'] >= (page or 1)][:limit]
+
+@pytest.fixture
+def server(monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrent=2, queue_timeout=0.1)
+    monkeypatch.setattr(api_server, "request_limiter", limiter)
+    monkeypatch.setitem(api_server.startup, "ready", True)
+    monkeypatch.setattr(api_server, "page_store", FakePageStore(
+        [{"document": "MPP SOP", "page": p, "doc_type": "core", "text": f"page {p}"} for p in range(1, 4)]
+    ))
+    return limiter
+
+def test_slot_released_once():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrent=1)
+        slot = await limiter.hold()
+        slot.release()
+        slot.release()
+        return limiter.in_flight
+    assert asyncio.run(run()) == 0
+
+def test_stream_without_own_release_returns_slot():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrent=1)
+        slot = await limiter.hold()
+
+        async def body():
+            yield "never sent"
+
+        with pytest.raises(DISCONNECTED):
+            await SlotStreamingResponse(body(), slot)(SCOPE, receive, disconnected_send)
+        return limiter.in_flight
+    assert asyncio.run(run()) == 0
+
+def test_extract_stream_releases_slot_on_disconnect(server):
+    async def run():
+        request = api_server.ExtractRequest(document="MPP SOP")
+        response = await api_server.extract_stream(request)
+        assert server.in_flight == 1
+        with pytest.raises(DISCONNECTED):
+            await response(SCOPE, receive, disconnected_send)
+        return server.in_flight
+    assert asyncio.run(run()) == 0
+
+def test_extract_stream_releases_slot_when_finished(server):
+    async def run():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        response = await api_server.extract_stream(api_server.ExtractRequest(document="MPP SOP"))
+        await response(SCOPE, receive, send)
+        return sent
+    sent = asyncio.run(run())
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    assert [json.loads(line)["page"] for line in body.decode().splitlines()] == [1, 2, 3]
+    assert server.in_flight == 0
+
+def test_extract_stream_releases_slot_on_not_found(server):
+    async def run():
+        with pytest.raises(HTTPException) as error:
+            await api_server.extract_stream(api_server.ExtractRequest(document="MPP SOP", page=9))
+        return error.value.status_code
+    assert asyncio.run(run()) == 404
+    assert server.in_flight == 0
+
+def test_request_key_ignores_whitespace_but_not_case():
+    key = request_key("/cross_reference", {"query": "SAR  reporting\n", "module_name": None})
+    assert key == request_key("/cross_reference", {"query": "SAR reporting", "module_name": None})
+    assert key != request_key("/cross_reference", {"query": "sar reporting", "module_name": None})
+
+def test_executor_calls_report_into_the_request_timings():
+    def ranking():
+        with time_stage("rerank"):
+            return "ranked"
+
+    async def run():
+        timings = start_request_timings()
+        return await BlockingExecutor(max_workers=1).run(ranking), timings
+    result, timings = asyncio.run(run())
+    assert result == "ranked"
+    assert "rerank" in timings
@@ -0,0 +1,53 @@
+"""
+Tests for merging, MMR ordering and budgeting of retrieved chunks
+"""
+
+import api_server
+from context_packing import merge_adjacent, mmr_order, pack_context
+
+def chunk(chunk_id, text, index, distance=0.4, page=1, document="MPP SOP"):
+    return {"id": chunk_id, "text": text, "distance": distance,
+            "metadata": {"document": document, "page": page, "doc_type": "core", "chunk_index": index}}
+
+def test_consecutive_chunks_merge_without_their_overlap():
+    sources = [
+        chunk("b", "reports are due semi-annually to the OSBP office", 1, distance=0.3),
+        chunk("a", "the mentor firm must file reports are due", 0, distance=0.5),
+        chunk("c", "an unrelated chunk further down the page", 3)
+    ]
+    passages = merge_adjacent(sources, max_overlap=10)
+
+    assert [p["merged_ids"] for p in passages] == [["a", "b"], ["c"]]
+    assert passages[0]["text"] == "the mentor firm must file reports are due semi-annually to the OSBP office"
+    assert passages[0]["distance"] == 0.3
+    assert passages[0]["id"] == "a"
+
+def test_chunks_on_other_pages_stay_apart():
+    passages = merge_adjacent([chunk("a", "first", 0), chunk("b", "second", 1, page=2)], max_overlap=10)
+    assert [p["merged_ids"] for p in passages] == [["a"], ["b"]]
+
+def test_mmr_moves_a_redundant_passage_down():
+    passages = [
+        {"text": "mentor protege agreement term three years", "distance": 0.20},
+        {"text": "mentor protege agreement term three years approval", "distance": 0.21},
+        {"text": "semi annual reports go to the OSBP", "distance": 0.40}
+    ]
+    order = [p["text"] for p in mmr_order(passages, mmr_lambda=0.5)]
+    assert order[:2] == [passages[0]["text"], passages[2]["text"]]
+    # Pure relevance keeps the similarity order
+    assert [p["text"] for p in mmr_order(passages, mmr_lambda=1.0)] == [p["text"] for p in passages]
+
+def test_budget_keeps_what_fits_and_the_head_of_an_oversized_best():
+    sources = [chunk("a", "x" * 400, 0, distance=0.1, page=1), chunk("b", "y" * 400, 0, distance=0.2, page=2)]
+    assert [p["id"] for p in pack_context(sources, token_budget=150, mmr_lambda=1.0, max_overlap=0)] == ["a"]
+
+    head = pack_context(sources, token_budget=50, mmr_lambda=1.0, max_overlap=0)
+    assert [(p["id"], len(p["text"])) for p in head] == [("a", 200)]
+    assert pack_context(sources, token_budget=0) is sources
+
+def test_sources_list_the_chunks_merged_into_them():
+    packed = pack_context([chunk("a", "one two three", 0), chunk("b", "three four five", 1)],
+                          token_budget=100, mmr_lambda=0.7, max_overlap=5)
+    source, = api_server.format_sources(packed)
+    assert source.quote == "one two three four five"
+    assert source.merged_ids == ["a", "b"]
@@ -0,0 +1,57 @@
+"""
+Tests for the query embedding cache
+"""
+
+import sqlite3
+from embedding_cache import EmbeddingCache
+
+def test_dimensions_are_part_of_the_key(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    cache.put("text-embedding-3-large", "mentor eligibility", [0.1] * 64, dimensions=64)
+
+    assert cache.get("text-embedding-3-large", "mentor eligibility", dimensions=32) is None
+    assert cache.get("text-embedding-3-large", "mentor eligibility") is None
+    assert len(cache.get("text-embedding-3-large", "mentor eligibility", dimensions=64)) == 64
+
+def test_vector_of_the_wrong_width_is_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path=path)
+    cache.put("m", "question", [0.5] * 8, dimensions=16)  # Mislabelled width
+
+    fresh = EmbeddingCache(path=path)
+    assert fresh.get("m", "question", dimensions=16) is None
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 0
+
+def test_rows_from_the_old_key_format_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE embeddings (model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+               "last_used REAL NOT NULL, PRIMARY KEY (model, text))")
+    db.execute("INSERT INTO embeddings VALUES ('m', 'question', ?, 0)", (bytes(4 * 32),))
+    db.commit()
+    db.close()
+
+    assert EmbeddingCache(path=path).get("m", "question") is None
+
+def test_case_is_part_of_the_key(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    cache.put("m", "What is a SAR?", [0.1] * 4)
+
+    assert cache.get("m", "what is a sar?") is None
+    assert cache.get("m", "  What is a\nSAR? ") == [0.1] * 4
+
+def test_replay_stub_leaves_the_cache_file_untouched(tmp_path):
+    from fastapi.testclient import TestClient
+    from replay import create_stub_app
+
+    path = tmp_path / "cache.db"
+    EmbeddingCache(path=str(path)).put("m", "What is a SAR?", [0.25] * 4)
+    before = path.read_bytes()
+
+    stub = TestClient(create_stub_app(0, 0, 0, dimensions=4, embedding_cache_path=str(path)))
+    response = stub.post("/v1/embeddings", json={"model": "m", "input": ["What is a SAR?", "Who is a mentor?"]})
+    vectors = [d["embedding"] for d in response.json()["data"]]
+
+    assert vectors[0] == [0.25] * 4
+    assert len(vectors[1]) == 4
+    assert path.read_bytes() == before
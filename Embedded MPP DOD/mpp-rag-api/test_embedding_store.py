@@ -0,0 +1,34 @@
+"""
+Tests for the content-addressed embedding store
+"""
+
+import numpy as np
+from embedding_store import EmbeddingStore
+
+def fetch(texts):
+    return [[1 / 3, 2 / 7, len(t) / 11] for t in texts]
+
+def test_miss_returns_fetched_vectors_at_full_precision(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dtype="float16")
+    first = store.embed("model", ["alpha", "beta"], fetch)
+    assert first == fetch(["alpha", "beta"])
+
+    calls = []
+    def refetch(texts):
+        calls.append(texts)
+        return fetch(texts)
+    second = store.embed("model", ["alpha", "beta"], refetch)
+    assert calls == []
+    # Hits come back as stored
+    np.testing.assert_allclose(second, first, rtol=1e-3)
+    assert second != first
+
+def test_each_distinct_text_is_fetched_once(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    calls = []
+    def counting(texts):
+        calls.append(list(texts))
+        return fetch(texts)
+    vectors = store.embed("model", ["alpha", "alpha", "gamma"], counting)
+    assert calls == [["alpha", "gamma"]]
+    assert vectors[0] == vectors[1]
@@ -0,0 +1,126 @@
+"""
+Tests for incremental PDF ingestion
+"""
+
+import json
+import numpy as np
+import pytest
+from pathlib import Path
+from conftest import write_pdf, module_pages
+
+def test_dimensions_change_rebuilds_vector_store(ingestion, monkeypatch):
+    first = ingestion().ingest_documents()
+
+    monkeypatch.setenv("EMBEDDING_DIMENSIONS", "32")
+    run = ingestion()
+    summary = run.ingest_documents()
+
+    assert summary["total_chunks"] == first["total_chunks"]
+    embeddings = run.collection.get(include=["embeddings"])["embeddings"]
+    assert {len(e) for e in embeddings} == {32}
+    for name in json.load(open("partitions.json"))["doc_type"].values():
+        partition = run.chroma_client.get_collection(name)
+        assert {len(e) for e in partition.get(include=["embeddings"])["embeddings"]} == {32}
+    assert np.load(Path("vector_index") / "embeddings.npy").shape[1] == 32
+
+def test_chunking_change_keeps_vector_store(ingestion, monkeypatch):
+    ingestion().ingest_documents()
+
+    monkeypatch.setenv("CHUNK_SIZE", "30")
+    run = ingestion()
+    run.reset_vector_store = lambda: (_ for _ in ()).throw(AssertionError("vector store dropped"))
+    summary = run.ingest_documents()
+
+    chunks = run.collection.get(include=["metadatas"])
+    assert summary["total_chunks"] == len(chunks["ids"]) > 0
+
+def move_to(path, monkeypatch):
+    """Start over with empty stores in another working directory"""
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    path.mkdir()
+    monkeypatch.chdir(path)
+
+def crash_after(run, calls):
+    """Make the run's embedding requests fail once `calls` have been sent"""
+    create = run.client.embeddings.create
+
+    def failing(*args, **kwargs):
+        if len(run.client.embedding_calls) >= calls:
+            raise RuntimeError("embedding service unavailable")
+        return create(*args, **kwargs)
+    run.client.embeddings.create = failing
+
+def index_state(run):
+    data = run.collection.get(include=["documents", "metadatas"])
+    listed = {i: m.get("duplicates") for i, m in zip(data["ids"], data["metadatas"])}
+    return listed, dict(run.manifest.duplicates), set(data["documents"])
+
+def embedded_texts(run):
+    return {text for call in run.client.embedding_calls for text in call}
+
+@pytest.mark.parametrize("calls", [2, 5, 8])
+def test_resumed_run_matches_uninterrupted_run(ingestion, corpus, monkeypatch, calls):
+    monkeypatch.setenv("EMBEDDING_BATCH_TOKENS", "100")
+    baseline = ingestion()
+    baseline.ingest_documents()
+    listed, duplicates, texts = index_state(baseline)
+    assert duplicates  # Module boilerplate after module-0 is not embedded
+
+    move_to(corpus / "resumed", monkeypatch)
+    crashed = ingestion()
+    crash_after(crashed, calls)
+    with pytest.raises(RuntimeError):
+        crashed.ingest_documents()
+    resumed = ingestion()
+    summary = resumed.ingest_documents()
+
+    assert index_state(resumed) == (listed, duplicates, texts)
+    assert summary["chunks_removed"] == 0
+    assert embedded_texts(resumed) <= texts
+
+def test_deleted_representative_hands_over_to_first_duplicate(ingestion, corpus, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BATCH_TOKENS", "100")
+    module_0 = corpus / "Modules" / "module-0.pdf"
+
+    ingestion().ingest_documents()
+    write_pdf(module_0, module_pages(0)[:-1])
+    uninterrupted = ingestion()
+    summary = uninterrupted.ingest_documents()
+    expected = index_state(uninterrupted)
+
+    listed, duplicates, _ = expected
+    assert summary["near_duplicates"]["promoted"] > 0
+    assert {d[1] for d in duplicates.values()} == {"module-2.pdf"}
+    representatives = {r for r, _, _ in duplicates.values()}
+    assert representatives <= set(listed)
+    assert all(json.loads(listed[r]) for r in representatives)
+
+    write_pdf(module_0, module_pages(0))
+    move_to(corpus / "resumed", monkeypatch)
+    ingestion().ingest_documents()
+    write_pdf(module_0, module_pages(0)[:-1])
+    crashed = ingestion()
+    crash_after(crashed, 0)  # Fails on the promoted chunks, after module-0 page 4 is deleted
+    with pytest.raises(RuntimeError):
+        crashed.ingest_documents()
+    resumed = ingestion()
+    resumed.ingest_documents()
+
+    assert index_state(resumed) == expected
+
+def test_module_copy_of_core_text_stays_a_module(ingestion, corpus):
+    regulation = ["Regulation 32 CFR 7.3 " + " ".join(f"r{k}" for k in range(70))]
+    write_pdf(corpus / "Core" / "Regulation.pdf", regulation)
+    write_pdf(corpus / "Modules" / "regulation-a.pdf", regulation)
+    write_pdf(corpus / "Modules" / "regulation-b.pdf", regulation)
+    run = ingestion()
+    run.ingest_documents()
+
+    modules = run.collection.get(where={"doc_type": "module"}, include=["metadatas"])
+    module_documents = {m["document"] for m in modules["metadatas"]}
+    assert "regulation-a.pdf" in module_documents
+    # regulation-b is folded into regulation-a, not into the core copy
+    listed = {document: representative for representative, document, _ in run.manifest.duplicates.values()}
+    assert "Regulation.pdf" not in listed and "regulation-a.pdf" not in listed
+    assert listed["regulation-b.pdf"] in set(modules["ids"])
@@ -0,0 +1,70 @@
+"""
+Tests for the ingestion profile and the --compare regression check
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from ingest_profile import IngestProfile, compare_summaries
+
+def summary(wall, embedding, pages_per_second, tokens=1000):
+    return {
+        "total_chunks": 120,
+        "profile": {
+            "wall_seconds": wall,
+            "stages": {"embedding": {"seconds": embedding}, "extraction": {"seconds": 0.4}},
+            "pages_per_second": pages_per_second,
+            "embedding": {"tokens": tokens}
+        }
+    }
+
+def rows_by_metric(baseline, current):
+    return {row["metric"]: row for row in compare_summaries(baseline, current, max_slowdown=0.2)}
+
+def test_slower_stage_and_throughput_are_regressions():
+    rows = rows_by_metric(summary(10.0, 6.0, 5.0), summary(14.0, 9.0, 3.5, tokens=2000))
+    assert rows["profile.wall_seconds"]["regression"]
+    assert rows["profile.stages.embedding.seconds"]["regression"]
+    assert rows["profile.pages_per_second"]["regression"]
+    assert abs(rows["profile.stages.embedding.seconds"]["change"] - 0.5) < 1e-9
+    # Tokens are reported, never flagged
+    assert rows["profile.embedding.tokens"]["change"] == 1.0
+    assert not rows["profile.embedding.tokens"]["regression"]
+
+def test_changes_under_a_second_are_noise():
+    rows = rows_by_metric(summary(2.0, 0.5, 5.0), summary(2.6, 0.9, 3.8))
+    assert rows["profile.stages.embedding.seconds"]["change"] > 0.2
+    assert not any(row["regression"] for row in rows.values())
+
+def test_missing_metrics_are_skipped_and_faster_is_fine():
+    rows = rows_by_metric(summary(10.0, 6.0, 5.0), summary(7.0, 4.0, 7.0))
+    assert "profile.peak_rss_mb.ingest" not in rows
+    assert rows["profile.stages.extraction.seconds"]["change"] == 0.0
+    assert not any(row["regression"] for row in rows.values())
+
+def test_nested_stage_time_is_charged_once():
+    profile = IngestProfile()
+    with profile.stage("db_write"):
+        time.sleep(0.02)
+        with profile.stage("indexes"):
+            time.sleep(0.05)
+    assert profile.seconds["indexes"] >= 0.05
+    assert 0.02 <= profile.seconds["db_write"] < 0.05
+
+def compare(tmp_path, baseline, current):
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    (tmp_path / "current.json").write_text(json.dumps(current))
+    script = Path(__file__).with_name("ingest_pdfs.py")
+    return subprocess.run([sys.executable, str(script), "--compare", "baseline.json", "current.json"],
+                          cwd=tmp_path, capture_output=True, text=True)
+
+def test_compare_exits_1_on_a_regression(tmp_path):
+    slower = compare(tmp_path, summary(10.0, 6.0, 5.0), summary(14.0, 9.0, 3.5))
+    assert slower.returncode == 1
+    assert "[WARN] regression" in slower.stdout
+
+    steady = compare(tmp_path, summary(10.0, 6.0, 5.0), summary(10.5, 6.2, 4.9))
+    assert steady.returncode == 0
+    assert "regression" not in steady.stdout
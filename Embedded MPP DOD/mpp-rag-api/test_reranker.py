@@ -0,0 +1,21 @@
+"""
+Tests for the second-stage reranker
+"""
+
+from reranker import LinearReranker, DEFAULT_WEIGHTS
+
+def candidates():
+    texts = ["unrelated text about travel vouchers",
+             "the mentor protege agreement term is three years",
+             "mentor firms report semi-annually"]
+    return [{"id": f"c{i}", "text": t, "distance": 0.5, "metadata": {"document": "MPP SOP", "page": 1}}
+            for i, t in enumerate(texts)]
+
+def test_unbudgeted_rerank_never_falls_back():
+    model = LinearReranker(DEFAULT_WEIGHTS, budget_ms=None)
+    ranked = model.rerank("mentor protege agreement term", candidates())
+    assert ranked[0]["id"] == "c1"
+    assert all("rerank_score" in c for c in ranked)
+
+def test_spent_budget_falls_back_to_first_stage_order():
+    assert LinearReranker(DEFAULT_WEIGHTS, budget_ms=-1).rerank("mentor protege agreement term", candidates()) is None
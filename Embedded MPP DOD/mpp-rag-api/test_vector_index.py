@@ -0,0 +1,93 @@
+"""
+Tests for the memory-mapped and quantized vector backends against ChromaDB
+"""
+
+import numpy as np
+import pytest
+import chromadb
+from vector_index import export_collection, recall_at_k, MmapVectorIndex, QuantizedVectorIndex
+
+DIMENSIONS = 32
+FILTERS = [
+    None,
+    {"doc_type": "core"},
+    {"document": {"$eq": "module-1.pdf"}},
+    {"$and": [{"document": {"$eq": "module-1.pdf"}}, {"page": {"$gte": 2}}, {"page": {"$lte": 5}}]}
+]
+
+@pytest.fixture(scope="module")
+def collection(tmp_path_factory):
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    client = chromadb.PersistentClient(path=str(tmp_path_factory.mktemp("chroma")))
+    # A search_ef above the row count makes ChromaDB's HNSW search exact
+    collection = client.create_collection("parity", metadata={"hnsw:search_ef": 1000})
+
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(300, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection.add(
+        ids=[f"chunk-{i}" for i in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        documents=[f"passage {i}" for i in range(len(vectors))],
+        metadatas=[{
+            "doc_type": "core" if i % 3 == 0 else "module",
+            "document": f"module-{i % 5}.pdf",
+            "page": i % 7 + 1,
+            "chunk_index": i
+        } for i in range(len(vectors))]
+    )
+    return collection
+
+def queries(collection, count=20):
+    rng = np.random.default_rng(11)
+    stored = np.asarray(collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+    return (stored[:count] + rng.normal(0, 0.05, (count, DIMENSIONS))).astype(np.float32)
+
+@pytest.fixture(scope="module")
+def exports(collection, tmp_path_factory):
+    directories = {}
+    for quantization in [None, "float16", "int8"]:
+        directories[quantization] = tmp_path_factory.mktemp(f"export-{quantization}")
+        assert export_collection(collection, str(directories[quantization]), quantization=quantization) == 300
+    return directories
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_mmap_query_matches_chroma(collection, exports, where):
+    index = MmapVectorIndex.load(str(exports[None]))
+    sample = queries(collection)
+    expected = collection.query(query_embeddings=sample.tolist(), n_results=10, where=where)
+    found = index.query(sample.tolist(), n_results=10, where=where)
+
+    assert found["ids"] == expected["ids"]
+    assert found["metadatas"] == expected["metadatas"]
+    np.testing.assert_allclose(found["distances"], expected["distances"], rtol=1e-4, atol=1e-5)
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_mmap_get_matches_chroma(collection, exports, where):
+    index = MmapVectorIndex.load(str(exports[None]))
+    expected = collection.get(where=where)
+    found = index.get(where=where)
+
+    assert sorted(found["ids"]) == sorted(expected["ids"])
+    ids = ["chunk-3", "missing", "chunk-1"]
+    assert sorted(index.get(ids=ids)["ids"]) == sorted(collection.get(ids=ids)["ids"])
+    assert index.count() == collection.count()
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+@pytest.mark.parametrize("where", FILTERS)
+def test_quantized_query_rescored_at_full_precision(collection, exports, quantization, where):
+    exact = MmapVectorIndex.load(str(exports[None]))
+    index = QuantizedVectorIndex.load(str(exports[quantization]), rescore_factor=4)
+    sample = queries(collection)
+    expected = exact.query(sample.tolist(), n_results=10, where=where)
+    found = index.query(sample.tolist(), n_results=10, where=where)
+
+    assert [ids[0] for ids in found["ids"]] == [ids[0] for ids in expected["ids"]]
+    assert recall_at_k(exact, index, k=10, where=where) >= 0.95
+    # Rows that come back carry their exact distances, not the compact approximation
+    for q, (ids, distances) in enumerate(zip(found["ids"], found["distances"])):
+        truth = dict(zip(expected["ids"][q], expected["distances"][q]))
+        for doc_id, distance in zip(ids, distances):
+            if doc_id in truth:
+                assert distance == pytest.approx(truth[doc_id], rel=1e-4, abs=1e-5)
@@ -0,0 +1,360 @@
+"""
+Memory-Mapped Vector Index for MPP RAG System
+Exact top-k search over an exported embedding matrix, as an in-process alternative to ChromaDB
+
+Export:     python vector_index.py export [--quantize int8|float16] [--compact-dimensions N]
+Benchmark:  python vector_index.py bench
+Recall:     python vector_index.py eval
+Serve:      VECTOR_BACKEND=mmap python api_server.py
+            VECTOR_BACKEND=quantized python api_server.py
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_INDEX_DIR = "./vector_index"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+COMPACT_FILE = "compact.npy"
+COMPACT_SCALES_FILE = "compact_scales.npy"
+
+def _atomic_save(path: Path, array: np.ndarray):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+def quantize(matrix: np.ndarray, quantization: str, dimensions: int = 0) -> tuple:
+    """
+    Compact copy of the embedding matrix for the first search pass
+
+    text-embedding-3 vectors can be shortened by truncating and re-normalizing (the same
+    thing the API's `dimensions` parameter does), so dimensions > 0 keeps the first N
+    components. int8 uses a symmetric per-row scale; returns (compact, scales or None).
+    """
+    if dimensions:
+        matrix = matrix[:, :dimensions]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(matrix).max(axis=1)
+        scales[scales == 0] = 1.0
+        compact = np.round(matrix / scales[:, None] * 127).astype(np.int8)
+        return compact, (scales / 127).astype(np.float32)
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+def export_collection(collection, index_dir: str = DEFAULT_INDEX_DIR, quantization: Optional[str] = None,
+                      compact_dimensions: int = 0) -> int:
+    """
+    Write the collection's embeddings as one contiguous float32 matrix plus a metadata
+    sidecar, and optionally a quantized compact copy for VECTOR_BACKEND=quantized
+    """
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    out = Path(index_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # Write to temp files and rename so running servers never map a half-written file
+    matrix = np.ascontiguousarray(np.asarray(data['embeddings'], dtype=np.float32))
+    _atomic_save(out / EMBEDDINGS_FILE, matrix)
+
+    # Drop any compact copy from an earlier export - it would no longer match the rows
+    for stale in [COMPACT_FILE, COMPACT_SCALES_FILE]:
+        (out / stale).unlink(missing_ok=True)
+    if quantization:
+        compact, scales = quantize(matrix, quantization, compact_dimensions)
+        if scales is not None:
+            _atomic_save(out / COMPACT_SCALES_FILE, scales)
+        _atomic_save(out / COMPACT_FILE, compact)
+
+    tmp_meta = out / (METADATA_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({
+            "ids": list(data['ids']),
+            "documents": list(data['documents']),
+            "metadatas": list(data['metadatas'])
+        }, f)
+
+    os.replace(tmp_meta, out / METADATA_FILE)
+    return len(data['ids'])
+
+def remove_export(index_dir: str = DEFAULT_INDEX_DIR):
+    """Delete an export, e.g. when the vectors it holds came from another embedding model"""
+    out = Path(index_dir)
+    for name in [EMBEDDINGS_FILE, METADATA_FILE, COMPACT_FILE, COMPACT_SCALES_FILE]:
+        (out / name).unlink(missing_ok=True)
+
+class MmapVectorIndex:
+    """
+    Read-only exact-search index with the subset of the ChromaDB collection API the
+    server uses (query, get, count). The matrix is memory-mapped, so several uvicorn
+    workers share the same pages through the OS page cache.
+    """
+
+    def __init__(self, embeddings: np.ndarray, ids: List[str], documents: List[str],
+                 metadatas: List[Dict]):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._sq_norms = None  # Computed on first full scan
+
+        # Precomputed row masks for the filters the API uses
+        self._masks: Dict[str, Dict] = {"doc_type": {}, "document": {}}
+        for field, masks in self._masks.items():
+            values = np.array([m.get(field, "") for m in metadatas])
+            for value in np.unique(values):
+                masks[value] = values == value
+        self._pages = np.array([m.get("page", -1) for m in metadatas])
+
+    @classmethod
+    def load(cls, index_dir: str = DEFAULT_INDEX_DIR, **kwargs) -> "MmapVectorIndex":
+        index_dir = Path(index_dir)
+        embeddings = np.load(index_dir / EMBEDDINGS_FILE, mmap_mode="r")
+        with open(index_dir / METADATA_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(embeddings, meta['ids'], meta['documents'], meta['metadatas'], **kwargs)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Row mask for a Chroma-style where filter (equality on doc_type/document/page, page ranges, $and)"""
+        if not where:
+            return None
+        if "$and" in where:
+            mask = np.ones(len(self.ids), dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._mask(clause)
+            return mask
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, value in where.items():
+            if field == "page" and isinstance(value, dict) and set(value) <= {"$gte", "$lte"}:
+                mask &= (self._pages >= value.get("$gte", -np.inf)) & (self._pages <= value.get("$lte", np.inf))
+                continue
+            if isinstance(value, dict):
+                if set(value) != {"$eq"}:
+                    raise ValueError(f"Unsupported filter operator for {field}: {value}")
+                value = value["$eq"]
+            if field == "page":
+                mask &= self._pages == value
+            elif field in self._masks:
+                mask &= self._masks[field].get(value, np.zeros(len(self.ids), dtype=bool))
+            else:
+                raise ValueError(f"Unsupported filter field: {field}")
+        return mask
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None) -> Dict:
+        """Exact squared-L2 top-k (Chroma's default distance), one BLAS product per call"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+        distances = (
+            self._sq_norms[None, :]
+            - 2.0 * (queries @ self.embeddings.T)
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+
+        mask = self._mask(where)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+        available = len(self.ids) if mask is None else int(mask.sum())
+        k = min(n_results, available)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in distances:
+            top = self._top_k(row, k)
+            self._append_rows(result, top, row[top])
+        return result
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k smallest distances, sorted"""
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(distances, k - 1)[:k]
+        return top[np.argsort(distances[top], kind="stable")]
+
+    def _append_rows(self, result: Dict, rows: np.ndarray, distances: np.ndarray):
+        result["ids"].append([self.ids[i] for i in rows])
+        result["documents"].append([self.documents[i] for i in rows])
+        result["metadatas"].append([self.metadatas[i] for i in rows])
+        result["distances"].append([float(max(d, 0.0)) for d in distances])
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None) -> Dict:
+        if ids is not None:
+            rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+        else:
+            mask = self._mask(where)
+            rows = list(range(len(self.ids))) if mask is None else np.flatnonzero(mask).tolist()
+        if limit is not None:
+            rows = rows[:limit]
+
+        include = include or ["documents", "metadatas"]
+        result = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[i] for i in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.embeddings[rows])
+        return result
+
+class QuantizedVectorIndex(MmapVectorIndex):
+    """
+    Two-pass search: approximate scores over the compact (int8/float16, optionally
+    truncated) matrix held in RAM, then exact squared-L2 rescoring of the top
+    candidates against the full-precision matrix, which stays memory-mapped on disk
+    and is only paged in for candidate rows.
+    """
+
+    BLOCK_ROWS = 4096  # Rows upcast to float32 at a time during the compact scan
+
+    def __init__(self, embeddings: np.ndarray, ids: List[str], documents: List[str],
+                 metadatas: List[Dict], compact: np.ndarray = None,
+                 scales: Optional[np.ndarray] = None, rescore_factor: int = 4):
+        super().__init__(embeddings, ids, documents, metadatas)
+        self.compact = compact
+        self.scales = scales
+        self.rescore_factor = rescore_factor
+
+    @classmethod
+    def load(cls, index_dir: str = DEFAULT_INDEX_DIR, rescore_factor: int = 4) -> "QuantizedVectorIndex":
+        index_dir = Path(index_dir)
+        if not (index_dir / COMPACT_FILE).exists():
+            raise FileNotFoundError(
+                f"No compact vectors in {index_dir} - run: python vector_index.py export --quantize int8"
+            )
+        compact = np.load(index_dir / COMPACT_FILE)
+        scales = np.load(index_dir / COMPACT_SCALES_FILE) if compact.dtype == np.int8 else None
+        return super().load(index_dir, compact=compact, scales=scales, rescore_factor=rescore_factor)
+
+    def resident_bytes(self) -> int:
+        return self.compact.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Inner products against the compact matrix (higher is closer for unit vectors)"""
+        dims = self.compact.shape[1]
+        queries = queries[:, :dims]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.BLOCK_ROWS):
+            block = self.compact[start:start + self.BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[None, :]
+        return scores
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None) -> Dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        scores = self._approximate_scores(queries)
+
+        mask = self._mask(where)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        available = len(self.ids) if mask is None else int(mask.sum())
+        k = min(n_results, available)
+        n_candidates = min(k * self.rescore_factor, available)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query, row in zip(queries, scores):
+            candidates = self._top_k(-row, n_candidates)
+            candidates.sort()  # Ascending rows read the mapped file sequentially
+            full = np.asarray(self.embeddings[candidates])
+            distances = np.sum((full - query) ** 2, axis=1)
+            top = self._top_k(distances, k)
+            self._append_rows(result, candidates[top], distances[top])
+        return result
+
+def recall_at_k(exact: MmapVectorIndex, approx: MmapVectorIndex, queries: int = 200,
+                k: int = 10, where: Optional[Dict] = None) -> float:
+    """Mean overlap of approx top-k with exact top-k, using stored vectors plus noise as queries"""
+    rng = np.random.default_rng(0)
+    rows = rng.choice(exact.count(), size=min(queries, exact.count()), replace=False)
+    sample = np.asarray(exact.embeddings[rows], dtype=np.float32)
+    sample = sample + rng.normal(0, 0.02, sample.shape).astype(np.float32)
+
+    truth = exact.query(sample, n_results=k, where=where)["ids"]
+    found = approx.query(sample, n_results=k, where=where)["ids"]
+    hits = [len(set(t) & set(f)) / max(len(t), 1) for t, f in zip(truth, found)]
+    return float(np.mean(hits))
+
+def benchmark(collection, index: MmapVectorIndex, queries: int = 200, n_results: int = 10,
+              include_chroma: bool = True):
+    """Compare query latency of ChromaDB and the mmap index using stored vectors as queries"""
+    rng = np.random.default_rng(0)
+    rows = rng.choice(index.count(), size=min(queries, index.count()), replace=False)
+    sample = [index.embeddings[i].tolist() for i in rows]
+
+    backends = [("chroma", collection)] if include_chroma else []
+    backends.append(("quantized" if isinstance(index, QuantizedVectorIndex) else "mmap", index))
+    for name, backend in backends:
+        for where in [None, {"doc_type": "core"}]:
+            timings = []
+            for q in sample:
+                start = time.perf_counter()
+                backend.query(query_embeddings=[q], n_results=n_results, where=where)
+                timings.append((time.perf_counter() - start) * 1000)
+            p50, p95 = np.percentile(timings, [50, 95])
+            label = f"where={where}" if where else "no filter"
+            print(f"  {name:<9} {label:<28} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+if __name__ == "__main__":
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Export, benchmark or evaluate the memory-mapped vector index")
+    parser.add_argument("command", choices=["export", "bench", "eval"])
+    parser.add_argument("--index-dir", default=os.getenv("VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR))
+    parser.add_argument("--queries", type=int, default=200, help="Sample queries for bench/eval")
+    parser.add_argument("--quantize", choices=["int8", "float16"],
+                        default=os.getenv("VECTOR_QUANTIZATION") or None,
+                        help="Also write a compact copy for VECTOR_BACKEND=quantized")
+    parser.add_argument("--compact-dimensions", type=int,
+                        default=int(os.getenv("VECTOR_COMPACT_DIMENSIONS", 0)),
+                        help="Truncate compact vectors to N dimensions (0 = keep all)")
+    parser.add_argument("--rescore-factor", type=int, default=int(os.getenv("VECTOR_RESCORE_FACTOR", 4)),
+                        help="Candidates rescored at full precision, as a multiple of k")
+    args = parser.parse_args()
+
+    if args.command == "eval":
+        # Recall of the two-pass search against exact full-precision search; no ChromaDB needed
+        exact = MmapVectorIndex.load(args.index_dir)
+        approx = QuantizedVectorIndex.load(args.index_dir, rescore_factor=args.rescore_factor)
+        full_bytes = exact.embeddings.nbytes
+        print(f"Compact {approx.compact.dtype} x {approx.compact.shape[1]} dims: "
+              f"{approx.resident_bytes() / 1e6:.1f} MB resident vs {full_bytes / 1e6:.1f} MB full "
+              f"({full_bytes / approx.resident_bytes():.1f}x smaller)")
+        for k in [5, 10]:
+            for where in [None, {"doc_type": "core"}]:
+                recall = recall_at_k(exact, approx, queries=args.queries, k=k, where=where)
+                label = f"where={where}" if where else "no filter"
+                print(f"  recall@{k:<3} {label:<28} {recall:.4f}")
+        raise SystemExit(0)
+
+    chroma_client = chromadb.PersistentClient(path="./chroma_db")
+    collection = chroma_client.get_collection(name="mpp_documents")
+
+    if args.command == "export":
+        count = export_collection(collection, args.index_dir, args.quantize, args.compact_dimensions)
+        print(f"[OK] Exported {count} vectors to {args.index_dir}"
+              + (f" (+ {args.quantize} compact copy)" if args.quantize else ""))
+    else:
+        print(f"Benchmarking {collection.count()} vectors:")
+        benchmark(collection, MmapVectorIndex.load(args.index_dir), queries=args.queries)
+        if (Path(args.index_dir) / COMPACT_FILE).exists():
+            quantized_index = QuantizedVectorIndex.load(args.index_dir, rescore_factor=args.rescore_factor)
+            benchmark(collection, quantized_index, queries=args.queries, include_chroma=False)
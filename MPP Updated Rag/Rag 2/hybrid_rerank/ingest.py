@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import sys
 from pathlib import Path
 from typing import Iterable, List
 
@@ -9,11 +10,48 @@ from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.embeddings import FakeEmbeddings
 
 
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+class StoredEmbeddings(Embeddings):
+    """Serve document embeddings from the MPP RAG embedding store; embed only new text."""
+
+    def __init__(self, embeddings: OpenAIEmbeddings, store) -> None:
+        self.embeddings = embeddings
+        self.store = store
+        # Same key as model_key() in embedding_store.py
+        dimensions = getattr(embeddings, "dimensions", None)
+        self.model = f"{embeddings.model}@{dimensions}" if dimensions else embeddings.model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.store.embed(self.model, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+def _open_embedding_store():
+    """Open the store shared with mpp-rag-api's ingest_pdfs.py, or None when it is off."""
+    api_dir = Path(os.getenv("MPP_RAG_API_DIR", REPO_ROOT / "Embedded MPP DOD" / "mpp-rag-api"))
+    store_dir = os.getenv("EMBEDDING_STORE_DIR", str(api_dir / "embedding_store"))
+    if not store_dir:
+        return None
+    if not (api_dir / "embedding_store.py").exists():
+        print(f"Warning: embedding_store.py not found in {api_dir}; set MPP_RAG_API_DIR. Embedding without the store.")
+        return None
+
+    sys.path.insert(0, str(api_dir))
+    from embedding_store import EmbeddingStore
+
+    return EmbeddingStore(store_dir, dtype=os.getenv("EMBEDDING_STORE_DTYPE", "float16"))
+
+
 def _default_doc_paths(root: Path) -> List[Path]:
     """Return the two expected Core PDFs when they exist."""
     candidates = [
@@ -83,6 +121,10 @@ def main() -> None:
     )
     if use_fake:
         print("Warning: Using FakeEmbeddings (non-semantic). Set HYBRID_FORCE_FAKE=0 and OPENAI_API_KEY for real embeddings.")
+    else:
+        store = _open_embedding_store()
+        if store is not None:
+            embeddings = StoredEmbeddings(embeddings, store)
 
     vectordb = Chroma.from_documents(
         documents=chunks,
@@ -91,6 +133,9 @@ def main() -> None:
     )
     vectordb.persist()
     print(f"Persisted vector index to {chroma_dir}")
+    if isinstance(embeddings, StoredEmbeddings):
+        stats = embeddings.store.stats()
+        print(f"Embedding store: {stats['hits']} chunks reused, {stats['misses']} embedded ({embeddings.store.path})")
 
     chunk_cache = storage_dir / "chunks.json"
     _persist_chunks(chunks, chunk_cache)